@@ -44,6 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, to measure everything else
+    "plots.middleware.MetricsMiddleware",
+    # Before any middleware reading or changing response bodies
+    "plots.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -85,9 +89,55 @@ DATABASES = {
         "PASSWORD": os.getenv("DATABASE_PASSWORD"),
         "HOST": os.getenv("DATABASE_HOST"),
         "PORT": os.getenv("DATABASE_PORT"),
+        # Persistent connections, reused by the requests of a worker for
+        # CONN_MAX_AGE seconds and checked before each request
+        "CONN_MAX_AGE": int(os.getenv("DATABASE_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas, as comma separated host[:port] in DATABASE_REPLICA_HOSTS, with
+# the name and credentials of the primary. They get "replica<n>" aliases and
+# serve the reads of the views opting in, see plots.routers
+REPLICA_DATABASES = []
+for index, replica in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICA_HOSTS", "").split(",")), start=1
+):
+    host, _, port = replica.strip().partition(":")
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASES.append(f"replica{index}")
+
+DATABASE_ROUTERS = ["plots.routers.ReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Caches must be shared by every process serving or changing plots (Redis:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://redis:6379/0), the in-memory default is for a
+# single process. WEB_CONCURRENCY is the number of gunicorn / uvicorn workers
+PLOTS_WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "gis_api"),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", 300)),
+    }
+}
+if CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -110,6 +160,16 @@ AUTH_PASSWORD_VALIDATORS = [
 # DRF settings
 #
 REST_FRAMEWORK = {
+    "PAGE_SIZE": int(os.getenv("PLOTS_PAGE_SIZE", 100)),
+    "DEFAULT_RENDERER_CLASSES": [
+        "plots.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+        "plots.authentication.CachedTokenAuthentication",
+    ],
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
     "TEST_REQUEST_RENDERER_CLASSES": [
         "rest_framework.renderers.MultiPartRenderer",
@@ -118,6 +178,118 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Plots settings
+#
+# Number of features validated and inserted per transaction by /plots/bulk/
+PLOTS_BULK_CHUNK_SIZE = int(os.getenv("PLOTS_BULK_CHUNK_SIZE", 1000))
+
+# Plot geometries received by the API: maximum number of vertices, and whether
+# invalid (self-intersecting...) polygons are repaired with ST_MakeValid
+# semantics instead of being rejected
+PLOTS_MAX_VERTICES = int(os.getenv("PLOTS_MAX_VERTICES", 100000))
+PLOTS_REPAIR_INVALID_GEOMETRIES = (
+    os.getenv("PLOTS_REPAIR_INVALID_GEOMETRIES", "false").lower() == "true"
+)
+
+# What plot creations and updates do with geometries overlapping existing
+# plots by more than PLOTS_OVERLAP_MIN_AREA square metres: "allow", "flag"
+# (report them in the response) or "reject". Overridden per request by ?overlap=
+PLOTS_OVERLAP_POLICY = os.getenv("PLOTS_OVERLAP_POLICY", "allow")
+PLOTS_OVERLAP_MIN_AREA = float(os.getenv("PLOTS_OVERLAP_MIN_AREA", 0))
+
+# Seconds during which the reads of an owner who changed plots go to the
+# primary database rather than to replicas (greater than the replication lag)
+PLOTS_REPLICA_PIN_SECONDS = int(os.getenv("PLOTS_REPLICA_PIN_SECONDS", 5))
+
+# Requests slower than this many seconds are logged ("plots.slow_requests"
+# logger) with the plan of their slowest query. Unset: no slow request log
+PLOTS_SLOW_REQUEST_SECONDS = (
+    float(os.getenv("PLOTS_SLOW_REQUEST_SECONDS"))
+    if os.getenv("PLOTS_SLOW_REQUEST_SECONDS")
+    else None
+)
+
+# Token authentication cache: tokens kept in each worker's memory, their
+# lifetime there and in the optional shared cache (alias, unset: none), in
+# seconds. A revoked token may stay usable that long in other workers
+PLOTS_AUTH_CACHE_SIZE = int(os.getenv("PLOTS_AUTH_CACHE_SIZE", 10000))
+PLOTS_AUTH_CACHE_TIMEOUT = int(os.getenv("PLOTS_AUTH_CACHE_TIMEOUT", 60))
+PLOTS_AUTH_CACHE = os.getenv("PLOTS_AUTH_CACHE") or None
+
+# Deletions are kept this many days in the change log of /plots/<username>/changes
+# (see the compact_plot_changes command); clients synced before must start over
+PLOTS_CHANGES_RETENTION_DAYS = int(os.getenv("PLOTS_CHANGES_RETENTION_DAYS", 30))
+
+# Features copied to the staging table per COPY statement, and plots inserted
+# per transaction, by file imports (/plots/imports/, import_plots command)
+PLOTS_IMPORT_CHUNK_SIZE = int(os.getenv("PLOTS_IMPORT_CHUNK_SIZE", 10000))
+
+# Workers running an import or export record a heartbeat this often; jobs
+# without a heartbeat for PLOTS_JOB_LEASE_SECONDS are taken back from their
+# (stopped) worker
+PLOTS_JOB_HEARTBEAT_SECONDS = int(os.getenv("PLOTS_JOB_HEARTBEAT_SECONDS", 30))
+PLOTS_JOB_LEASE_SECONDS = int(os.getenv("PLOTS_JOB_LEASE_SECONDS", 300))
+
+# Rows read per round trip, and GeoPackage rows written per SQLite statement,
+# by plot exports (/plots/exports/)
+PLOTS_EXPORT_CHUNK_SIZE = int(os.getenv("PLOTS_EXPORT_CHUNK_SIZE", 10000))
+
+# /plots/locate/: points per request, owners whose plots are indexed in each
+# worker's memory, owners with more plots than this are always looked up in
+# PostGIS rather than indexed, and seconds after which an index is reloaded
+# even without a write
+PLOTS_LOCATE_MAX_POINTS = int(os.getenv("PLOTS_LOCATE_MAX_POINTS", 100000))
+PLOTS_LOCATE_CACHED_OWNERS = int(os.getenv("PLOTS_LOCATE_CACHED_OWNERS", 100))
+PLOTS_LOCATE_MAX_INDEXED_PLOTS = int(
+    os.getenv("PLOTS_LOCATE_MAX_INDEXED_PLOTS", 200000)
+)
+PLOTS_LOCATE_INDEX_MAX_AGE = int(os.getenv("PLOTS_LOCATE_INDEX_MAX_AGE", 300))
+
+# Response compression: encodings offered, by order of preference (among
+# zstd, br, gzip), and size in bytes below which responses aren't compressed
+PLOTS_COMPRESSION_ENCODINGS = [
+    encoding.strip()
+    for encoding in os.getenv("PLOTS_COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+]
+PLOTS_COMPRESSION_MIN_SIZE = int(os.getenv("PLOTS_COMPRESSION_MIN_SIZE", 1024))
+
+# Upper bound for the ?page_size= parameter of /plots/<username>
+# (default page size is REST_FRAMEWORK["PAGE_SIZE"])
+PLOTS_MAX_PAGE_SIZE = int(os.getenv("PLOTS_MAX_PAGE_SIZE", 1000))
+
+# Rows fetched per round trip from the server-side cursor of streamed listings
+PLOTS_STREAM_CHUNK_SIZE = int(os.getenv("PLOTS_STREAM_CHUNK_SIZE", 2000))
+
+# Default number of decimals of ?format=twkb coordinates (about 10 cm)
+PLOTS_TWKB_PRECISION = int(os.getenv("PLOTS_TWKB_PRECISION", 6))
+
+# Cache alias and lifetime (seconds) of /plots/<username> responses
+PLOTS_LIST_CACHE = os.getenv("PLOTS_LIST_CACHE", "default")
+PLOTS_LIST_CACHE_TIMEOUT = int(os.getenv("PLOTS_LIST_CACHE_TIMEOUT", 300))
+
+# Vector tiles: cache alias, server side lifetime (seconds), highest cached zoom
+# level, zoom level of the tiles whose version covers the tiles they hold,
+# number of versions replaced per zoom level on a change before the whole zoom
+# level is invalidated, and client side max-age (seconds)
+PLOTS_TILE_CACHE = "default"
+PLOTS_TILE_CACHE_TIMEOUT = int(os.getenv("PLOTS_TILE_CACHE_TIMEOUT", 24 * 3600))
+PLOTS_TILE_MAX_CACHED_ZOOM = 18
+PLOTS_TILE_VERSION_ZOOM = 10
+PLOTS_TILE_INVALIDATION_LIMIT = 64
+PLOTS_TILE_MAX_AGE = int(os.getenv("PLOTS_TILE_MAX_AGE", 60))
+
+# Plot density (/plots/aggregate/): cache alias, lifetime (seconds), maximum
+# number of cells per request, resolution of the blocks whose version covers
+# the blocks they hold, and number of versions replaced per resolution on a
+# change before the whole resolution is invalidated
+PLOTS_AGGREGATE_CACHE = "default"
+PLOTS_AGGREGATE_CACHE_TIMEOUT = int(
+    os.getenv("PLOTS_AGGREGATE_CACHE_TIMEOUT", 24 * 3600)
+)
+PLOTS_AGGREGATE_MAX_CELLS = int(os.getenv("PLOTS_AGGREGATE_MAX_CELLS", 65536))
+PLOTS_AGGREGATE_VERSION_RESOLUTION = 12
+PLOTS_AGGREGATE_INVALIDATION_LIMIT = 64
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -135,6 +307,9 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files (plot imports) and plot exports
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", BASE_DIR / "media")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
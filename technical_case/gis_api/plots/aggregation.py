@@ -0,0 +1,289 @@
+"""
+Plot density for zoomed-out map views: plot counts, summed areas and
+centroids per grid cell (square or hexagonal) or per ST_ClusterDBSCAN cluster,
+computed by PostGIS and cached.
+
+Cells are those of a global grid: square cells of cell_size(resolution)
+degrees, or hexagons of that edge length (ST_HexagonGrid). Plots count in the
+cell holding their centroid. Results are cached by blocks of BLOCK_CELLS x
+BLOCK_CELLS cells, per resolution, grid and owner, so that views of
+neighbouring or overlapping areas share them, and only the blocks missing from
+the cache are computed, in one query.
+
+Block cache keys hold version tokens, replaced when plots in their extent
+change (see plots.signals), as for tiles: blocks share the token of the block
+of resolution PLOTS_AGGREGATE_VERSION_RESOLUTION holding them (their own below
+it), per owner, and resolutions where a change covers too many blocks get a
+new generation.
+
+Hexagons and clusters are computed per block: a hexagon across two blocks is
+the sum of both parts, clusters don't span blocks.
+"""
+import math
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router
+
+from rest_framework.exceptions import ValidationError
+
+from .caching import get_versions
+from .filters import parse_floats
+from .models import Plots
+
+GRIDS = ["square", "hex", "cluster"]
+MAX_RESOLUTION = 20
+BLOCK_CELLS = 16
+
+# Rows: block (bi, bj), cell key, plot count, summed area, summed centroid coordinates
+AGGREGATE_SQL = """
+WITH plots AS (
+    SELECT
+        centroid,
+        plot_area,
+        floor(ST_X(centroid) / %(block_size)s)::bigint AS bi,
+        floor(ST_Y(centroid) / %(block_size)s)::bigint AS bj
+    FROM (
+        SELECT ST_Centroid(plot_geometry) AS centroid, plot_area
+        FROM plots_plots
+        WHERE plot_geometry && ST_MakeEnvelope(
+            %(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 4326
+        ) {owner_filter}
+    ) AS plots
+    WHERE ST_X(centroid) >= %(xmin)s AND ST_X(centroid) < %(xmax)s
+        AND ST_Y(centroid) >= %(ymin)s AND ST_Y(centroid) < %(ymax)s
+), cells AS (
+    {cells}
+)
+SELECT
+    bi,
+    bj,
+    i,
+    j,
+    COUNT(*),
+    COALESCE(SUM(plot_area), 0),
+    SUM(ST_X(centroid)),
+    SUM(ST_Y(centroid))
+FROM cells
+GROUP BY bi, bj, i, j
+"""
+
+CELLS_SQL = {
+    "square": """
+        SELECT
+            plots.*,
+            floor(ST_X(centroid) / %(size)s)::bigint AS i,
+            floor(ST_Y(centroid) / %(size)s)::bigint AS j
+        FROM plots
+    """,
+    "hex": """
+        SELECT plots.*, hex.i, hex.j
+        FROM plots
+        CROSS JOIN LATERAL (
+            SELECT i, j FROM ST_HexagonGrid(%(size)s, plots.centroid) LIMIT 1
+        ) AS hex
+    """,
+    "cluster": """
+        SELECT
+            plots.*,
+            ST_ClusterDBSCAN(centroid, %(size)s, 1)
+                OVER (PARTITION BY bi, bj) AS i,
+            0 AS j
+        FROM plots
+    """,
+}
+
+
+def cache():
+    return caches[settings.PLOTS_AGGREGATE_CACHE]
+
+
+def cell_size(resolution):
+    """Size of the cells of a resolution, in degrees."""
+    return 360 / 2**resolution
+
+
+def parse_resolution(value):
+    if value is None or not value.isdigit() or int(value) > MAX_RESOLUTION:
+        raise ValidationError(
+            {"resolution": [f"Expected a resolution between 0 and {MAX_RESOLUTION}."]}
+        )
+    return int(value)
+
+
+def parse_grid(value):
+    if value is None:
+        return "square"
+    if value not in GRIDS:
+        raise ValidationError({"grid": [f"Expected one of {', '.join(GRIDS)}."]})
+    return value
+
+
+def parse_bbox(value):
+    if value is None:
+        raise ValidationError({"bbox": ["This parameter is required."]})
+    xmin, ymin, xmax, ymax = parse_floats("bbox", value, 4)
+    if xmin >= xmax or ymin >= ymax:
+        raise ValidationError({"bbox": ["Expected xmin,ymin,xmax,ymax."]})
+    return xmin, ymin, xmax, ymax
+
+
+def generation_key(level):
+    return f"plots:aggregate-generation:{level}"
+
+
+def version_key(level, block, owner):
+    return f"plots:aggregate-version:{level}:{block[0]}:{block[1]}:{owner or '*'}"
+
+
+def block_cache_key(resolution, grid, owner, block, tokens):
+    """Cache key of a block, with the version `tokens` of its level and extent."""
+    return (
+        f"plots:aggregate:{resolution}:{grid}:{block[0]}:{block[1]}:"
+        f"{owner or '*'}:{':'.join(tokens)}"
+    )
+
+
+def block_range(extent, resolution):
+    """
+    Blocks of a resolution holding the points of the given (xmin, ymin, xmax,
+    ymax) extent. Returns ((bi_min, bi_max), (bj_min, bj_max)), bounds included.
+    """
+    block_size = cell_size(resolution) * BLOCK_CELLS
+    return (
+        (math.floor(extent[0] / block_size), math.floor(extent[2] / block_size)),
+        (math.floor(extent[1] / block_size), math.floor(extent[3] / block_size)),
+    )
+
+
+def compute_blocks(blocks, resolution, grid, owner):
+    """{block: [(cell key, count, area, sum x, sum y), ...]} computed by PostGIS."""
+    size = cell_size(resolution)
+    block_size = size * BLOCK_CELLS
+    params = {
+        "size": size,
+        "block_size": block_size,
+        "xmin": min(bi for bi, _ in blocks) * block_size,
+        "ymin": min(bj for _, bj in blocks) * block_size,
+        "xmax": (max(bi for bi, _ in blocks) + 1) * block_size,
+        "ymax": (max(bj for _, bj in blocks) + 1) * block_size,
+        "owner": owner,
+    }
+    owner_filter = "AND plot_owner_id = %(owner)s" if owner else ""
+    with connections[router.db_for_read(Plots)].cursor() as cursor:
+        cursor.execute(
+            AGGREGATE_SQL.format(owner_filter=owner_filter, cells=CELLS_SQL[grid]),
+            params,
+        )
+        rows = cursor.fetchall()
+
+    results = {block: [] for block in blocks}
+    for bi, bj, i, j, count, area, sum_x, sum_y in rows:
+        # Blocks of the envelope that were cached already are left out
+        if (bi, bj) in results:
+            # Clusters are numbered per block
+            key = (bi, bj, i) if grid == "cluster" else (i, j)
+            results[bi, bj].append((key, count, area, sum_x, sum_y))
+    return results
+
+
+def aggregate(extent, resolution, grid="square", owner=None):
+    """
+    Density of the plots (of `owner`, or of anyone) in the blocks covering the
+    extent: a list of {"count", "area", "centroid"} dicts with their "cell"
+    [i, j] for square and hex grids.
+    """
+    (bi_min, bi_max), (bj_min, bj_max) = block_range(extent, resolution)
+    block_count = (bi_max - bi_min + 1) * (bj_max - bj_min + 1)
+    if block_count * BLOCK_CELLS**2 > settings.PLOTS_AGGREGATE_MAX_CELLS:
+        raise ValidationError(
+            {"resolution": ["Too many cells: zoom in, or lower the resolution."]}
+        )
+
+    # Blocks share the version tokens of the block of level holding them
+    level = min(resolution, settings.PLOTS_AGGREGATE_VERSION_RESOLUTION)
+    shift = resolution - level
+    version_keys = {
+        (bi, bj): version_key(level, (bi >> shift, bj >> shift), owner)
+        for bi in range(bi_min, bi_max + 1)
+        for bj in range(bj_min, bj_max + 1)
+    }
+    tokens = get_versions(
+        cache(), [generation_key(level), *sorted(set(version_keys.values()))]
+    )
+    keys = {
+        block: block_cache_key(
+            resolution,
+            grid,
+            owner,
+            block,
+            (tokens[generation_key(level)], tokens[version]),
+        )
+        for block, version in version_keys.items()
+    }
+    cached = cache().get_many(keys.values())
+    blocks = {block: cached[key] for block, key in keys.items() if key in cached}
+
+    missing = [block for block in keys if block not in blocks]
+    if missing:
+        computed = compute_blocks(missing, resolution, grid, owner)
+        cache().set_many(
+            {keys[block]: cells for block, cells in computed.items()},
+            settings.PLOTS_AGGREGATE_CACHE_TIMEOUT,
+        )
+        blocks.update(computed)
+
+    # Hexagons across blocks are summed
+    totals = {}
+    for cells in blocks.values():
+        for key, count, area, sum_x, sum_y in cells:
+            total = totals.setdefault(key, [0, 0.0, 0.0, 0.0])
+            total[0] += count
+            total[1] += area
+            total[2] += sum_x
+            total[3] += sum_y
+
+    results = []
+    for key, (count, area, sum_x, sum_y) in sorted(totals.items()):
+        result = {
+            "count": count,
+            "area": area,
+            "centroid": [sum_x / count, sum_y / count],
+        }
+        if grid != "cluster":
+            result = {"cell": list(key), **result}
+        results.append(result)
+    return results
+
+
+def invalidate(changes):
+    """Make the cached blocks holding any of the changed plots unreachable."""
+    extents = set()
+    owners = {None}
+    for change in changes:
+        extents.update(e for e in (change.extent, change.previous_extent) if e)
+        owners.update(o for o in (change.owner, change.previous_owner) if o)
+
+    versions = {}
+    for level in range(settings.PLOTS_AGGREGATE_VERSION_RESOLUTION + 1):
+        ranges = [block_range(extent, level) for extent in extents]
+        block_count = sum(
+            (bi_max - bi_min + 1) * (bj_max - bj_min + 1)
+            for (bi_min, bi_max), (bj_min, bj_max) in ranges
+        )
+
+        if block_count * len(owners) > settings.PLOTS_AGGREGATE_INVALIDATION_LIMIT:
+            versions[generation_key(level)] = uuid.uuid4().hex
+            continue
+
+        versions.update(
+            {
+                version_key(level, (bi, bj), owner): uuid.uuid4().hex
+                for (bi_min, bi_max), (bj_min, bj_max) in ranges
+                for bi in range(bi_min, bi_max + 1)
+                for bj in range(bj_min, bj_max + 1)
+                for owner in owners
+            }
+        )
+    cache().set_many(versions, None)
@@ -1,20 +1,65 @@
+import base64
+import json
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import GEOSGeometry
 
 from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.response import Response
-from rest_framework.authentication import (
-    SessionAuthentication,
-    BasicAuthentication,
-    TokenAuthentication,
-)
+from rest_framework.views import APIView
+from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
-from .models import Plots
+from . import aggregation, exports
+from .authentication import CachedTokenAuthentication
+from .batch import delete_plots, outcomes, update_plots
+from .bulk import ingest_features
+from .changes import changes_since, parse_since
+from .caching import CachedListMixin
+from .filters import PlotsSpatialFilter, parse_precision, parse_simplify_level
+from .functions import as_flatgeobuf
+from .locate import locate, parse_points
+from .models import (
+    GEOMETRY_FIELDS,
+    PlotExport,
+    PlotImport,
+    PlotOwnerStats,
+    Plots,
+    geometry_field_name,
+)
+from .overlaps import find_conflicts, parse_after, parse_min_area
+from .pagination import OwnerStatsCursorPagination, PlotsCursorPagination
+from .parsers import BinaryPointsParser, NDJSONParser
+from .renderers import (
+    FeatureStreamRenderer,
+    FlatGeobufRenderer,
+    GeoJSONRenderer,
+    MVTRenderer,
+    NDJSONRenderer,
+    TWKBRenderer,
+    WKBHexJSONRenderer,
+    WKBRenderer,
+)
+from .routers import TILES_PIN, ReplicaReadsMixin
+from .tiles import get_tile
 from .serializers import (
     CreatePlotsSerializer,
     AreaSerializer,
+    PlotBatchSerializer,
+    PlotBatchUpdateSerializer,
+    PlotExportSerializer,
+    PlotImportSerializer,
+    PlotOwnerStatsSerializer,
     UpdateDeletePlotsSerializer,
 )
 
@@ -27,26 +72,305 @@ class PlotCreate(generics.CreateAPIView):
 
     Polygon input Format : (-98.503358 29.335668, -98.503086 29.335668, -98.503086 29.335423, -98.50335800000001 29.335423, -98.503358 29.335668)
 
+    ?overlap=flag or reject reports or refuses plots overlapping existing ones
+    by more than ?min_overlap_area= square metres
     """
 
     serializer_class = CreatePlotsSerializer
 
 
-class PlotsListByUser(generics.ListAPIView):
+class PlotBulkCreate(generics.GenericAPIView):
+    """
+    /plots/bulk/
+
+    Endpoint for batched plot creation.
+    Accepts a GeoJSON FeatureCollection (application/json) or one GeoJSON Feature
+    per line (application/x-ndjson). Each feature carries plot_name and plot_owner
+    in its properties and a Polygon geometry.
+
+    ?overlap= and ?min_overlap_area= work as for single plots, the overlaps of
+    flagged plots being listed in their result.
+
+    Returns a per-item report: 201 when every plot was created, 207 otherwise.
+    """
+
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        if isinstance(data, dict):
+            if data.get("type") != "FeatureCollection":
+                return Response(
+                    {"detail": "Expected a GeoJSON FeatureCollection"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            data = data.get("features") or []
+
+        results = ingest_features(
+            data,
+            overlap=request.query_params.get("overlap"),
+            min_overlap_area=request.query_params.get("min_overlap_area"),
+        )
+        created = sum(1 for result in results if result["status"] == "created")
+
+        return Response(
+            {
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED
+            if created == len(results)
+            else status.HTTP_207_MULTI_STATUS,
+        )
+
+
+class PlotImportCreate(generics.CreateAPIView):
+    """
+    /plots/imports/
+
+    Endpoint to upload a plot file (GeoPackage, zipped Shapefile, GeoJSON...)
+    as multipart form data: "file", and optionally "name_field" (attribute of
+    the plot names, default plot_name) and "srid" (EPSG code of the coordinates,
+    when the file doesn't tell it). The plots are created for the authenticated
+    user by a background worker (process_plot_imports command).
+
+    Returns the import with 202 Accepted, its Location header pointing to its
+    progress.
+    """
+
+    authentication_classes = [
+        SessionAuthentication,
+        BasicAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+    serializer_class = PlotImportSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        plot_import = serializer.save(owner=request.user)
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={
+                "Location": request.build_absolute_uri(
+                    reverse("plots_import", args=[plot_import.id])
+                )
+            },
+        )
+
+
+class PlotImportDetail(generics.RetrieveAPIView):
+    """
+    /plots/imports/<id>
+
+    Endpoint returning the progress of an import of the authenticated user:
+    status (pending, copying, merging, done or failed), features_total,
+    features_read, plots_created, plots_rejected and the errors of the first
+    rejected features (or the reason of a failure).
+    """
+
+    authentication_classes = [
+        SessionAuthentication,
+        BasicAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    serializer_class = PlotImportSerializer
+
+    def get_queryset(self):
+        return PlotImport.objects.filter(owner=self.request.user)
+
+
+class PlotExportCreate(generics.CreateAPIView):
+    """
+    /plots/exports/
+
+    Endpoint to export every plot of the authenticated user to a file:
+    "format" is gpkg (GeoPackage), fgb (FlatGeobuf) or geojsonseq (GeoJSON
+    text sequence). The file is written by a background worker
+    (process_plot_exports command).
+
+    Returns the export, its Location header pointing to its progress: 202
+    Accepted while it is pending, 200 OK when a finished export of the current
+    plots is reused.
+    """
+
+    authentication_classes = [
+        SessionAuthentication,
+        BasicAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    serializer_class = PlotExportSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        export = exports.reusable(
+            request.user.username, serializer.validated_data["format"]
+        )
+        if export is None:
+            export = serializer.save(owner=request.user)
+        return Response(
+            self.get_serializer(export).data,
+            status=status.HTTP_200_OK
+            if export.status == "done"
+            else status.HTTP_202_ACCEPTED,
+            headers={
+                "Location": request.build_absolute_uri(
+                    reverse("plots_export", args=[export.id])
+                )
+            },
+        )
+
+
+class PlotExportDetail(generics.RetrieveAPIView):
+    """
+    /plots/exports/<id>
+
+    Endpoint returning the progress of an export of the authenticated user:
+    status (pending, running, done, failed or expired), plots_exported, and
+    once done the size, SHA-256 digest and download URL of the file.
+    """
+
+    authentication_classes = [
+        SessionAuthentication,
+        BasicAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    serializer_class = PlotExportSerializer
+
+    def get_queryset(self):
+        return PlotExport.objects.filter(owner=self.request.user)
+
+
+class PlotExportDownload(APIView):
+    """
+    /plots/exports/<id>/download
+
+    Endpoint returning the file of a finished export of the authenticated
+    user. A Range header (bytes=<first>-<last>) asks for part of it, answered
+    206 Partial Content, to resume an interrupted download; If-Range with the
+    ETag makes sure the parts come from the same file. The Repr-Digest header
+    holds the SHA-256 digest of the whole file.
+    """
+
+    authentication_classes = [
+        SessionAuthentication,
+        BasicAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        export = get_object_or_404(PlotExport, pk=pk, owner=request.user)
+        if export.status != "done":
+            return Response(
+                {"detail": f"The export is {export.status}."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        etag = f'"{export.sha256}"'
+        if_range = request.headers.get("If-Range")
+        try:
+            byte_range = (
+                exports.parse_range(request.headers.get("Range"), export.size)
+                if if_range is None or if_range == etag
+                else None
+            )
+        except exports.RangeNotSatisfiable:
+            return Response(
+                {"detail": "Range not satisfiable."},
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{export.size}"},
+            )
+
+        first, last = byte_range or (0, export.size - 1)
+        export_format = exports.FORMATS[export.format]
+        response = StreamingHttpResponse(
+            exports.read_range(export.file.open("rb"), first, last - first + 1),
+            status=status.HTTP_206_PARTIAL_CONTENT
+            if byte_range
+            else status.HTTP_200_OK,
+            content_type=export_format.media_type,
+        )
+        response["Content-Length"] = str(last - first + 1)
+        if byte_range:
+            response["Content-Range"] = f"bytes {first}-{last}/{export.size}"
+        response["Accept-Ranges"] = "bytes"
+        response["ETag"] = etag
+        response[
+            "Repr-Digest"
+        ] = f"sha-256=:{base64.b64encode(bytes.fromhex(export.sha256)).decode()}:"
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="{export.owner_id}-plots.{export_format.extension}"'
+        return response
+
+
+class PlotsListByUser(ReplicaReadsMixin, CachedListMixin, generics.ListAPIView):
     """
     /plots/<username>
 
     Endpoint to list all plots owned by user <username>
+    Results are paginated by keyset (?page_size=, ?cursor=), see Link header
+    and can be filtered with ?bbox=, ?intersects= and ?dwithin=
+
+    ?format=ndjson or ?format=geojson streams all plots as GeoJSON Features instead
+    ?simplify=1|2|3 returns simplified geometries (about 1 m, 10 m, 100 m tolerance)
+    ?format=wkb, twkb, wkb-hex or fgb (or the matching Accept header) returns
+    geometries encoded by PostGIS, see renderers
+
+    Responses are cached per user until one of their plots changes, and carry
+    an ETag: send it back in If-None-Match to get a 304 when nothing changed.
+
+    Served from a read replica when there is one, see plots.routers
     """
 
     serializer_class = AreaSerializer
+    pagination_class = PlotsCursorPagination
+    filter_backends = [PlotsSpatialFilter]
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES,
+        NDJSONRenderer,
+        GeoJSONRenderer,
+        WKBRenderer,
+        TWKBRenderer,
+        WKBHexJSONRenderer,
+        FlatGeobufRenderer,
+    ]
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
 
         queryset = queryset.order_by("id")
 
+        if isinstance(request.accepted_renderer, FeatureStreamRenderer):
+            return self.stream(queryset, request.accepted_renderer)
+
+        flatgeobuf = isinstance(request.accepted_renderer, FlatGeobufRenderer)
+        if flatgeobuf:
+            # Only ids are paginated here, PostGIS builds the file from them
+            queryset = queryset.only("id")
+
         page = self.paginate_queryset(queryset)
+        if not page:
+            # Only an empty result needs telling "no plots" from "no such user"
+            get_object_or_404(User, username=self.kwargs["username"])
+
+        if page is not None and flatgeobuf:
+            plots = Plots.objects.filter(
+                plot_owner=self.kwargs["username"], id__in=[plot.id for plot in page]
+            )
+            return self.get_paginated_response(
+                as_flatgeobuf(plots.order_by("id"), self.get_geometry_field())
+            )
+
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
@@ -54,10 +378,208 @@ class PlotsListByUser(generics.ListAPIView):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    def stream(self, queryset, renderer):
+        """
+        Stream every plot of the queryset, unpaginated, as GeoJSON Features.
+
+        Rows are read from a server-side cursor and geometries are encoded by
+        PostGIS, so memory use does not grow with the number of plots.
+        """
+        get_object_or_404(User, username=self.kwargs["username"])
+        # Rows are read once the view has returned: choose the database now
+        queryset = queryset.using(queryset.db)
+
+        request_precision = self.request.query_params.get("precision")
+        rows = (
+            queryset.annotate(
+                geojson=AsGeoJSON(
+                    self.get_geometry_field(),
+                    precision=parse_precision(request_precision, default=8),
+                )
+            )
+            .values_list("id", "plot_name", "plot_area", "geojson")
+            .iterator(chunk_size=settings.PLOTS_STREAM_CHUNK_SIZE)
+        )
+        features = (
+            '{"type":"Feature","id":%d,"geometry":%s,"properties":%s}'
+            % (
+                id,
+                geojson,
+                json.dumps({"plot_name": plot_name, "plot_area": plot_area}),
+            )
+            for id, plot_name, plot_area, geojson in rows
+        )
+
+        return StreamingHttpResponse(
+            renderer.stream(features),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+
+    def get_cache_owner(self):
+        return self.kwargs["username"]
+
+    def get_geometry_field(self):
+        """Geometry field to output, chosen with ?simplify=<level of detail>."""
+        return geometry_field_name(
+            parse_simplify_level(self.request.query_params.get("simplify"))
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["geometry_field"] = self.get_geometry_field()
+        context["precision"] = parse_precision(
+            self.request.query_params.get("precision"), default=None
+        )
+        return context
+
     def get_queryset(self):
         username = self.kwargs["username"]
-        get_object_or_404(User, username=username)
-        return Plots.objects.filter(plot_owner=username)
+        queryset = Plots.objects.filter(plot_owner=username)
+        geometry_field = self.get_geometry_field()
+
+        renderer = getattr(self.request, "accepted_renderer", None)
+        if hasattr(renderer, "geometry_expression"):
+            # Binary formats get their geometries encoded by PostGIS
+            precision = parse_precision(
+                self.request.query_params.get("precision"),
+                default=settings.PLOTS_TWKB_PRECISION,
+            )
+            return queryset.defer(*GEOMETRY_FIELDS).annotate(
+                encoded_geometry=renderer.geometry_expression(geometry_field, precision)
+            )
+
+        return queryset.defer(
+            *(field for field in GEOMETRY_FIELDS if field != geometry_field)
+        )
+
+
+class PlotOwnerStatsDetail(ReplicaReadsMixin, generics.RetrieveAPIView):
+    """
+    /plots/<username>/stats
+
+    Endpoint returning the number of plots of user <username>, their total
+    area (square metres) and their extent [xmin, ymin, xmax, ymax].
+    Read from a summary table kept up to date on every plot change.
+    """
+
+    serializer_class = PlotOwnerStatsSerializer
+
+    def get_object(self):
+        owner = get_object_or_404(
+            User.objects.select_related("plot_stats"),
+            username=self.kwargs["username"],
+        )
+        try:
+            return owner.plot_stats
+        except PlotOwnerStats.DoesNotExist:
+            # No plots (yet)
+            return PlotOwnerStats(owner=owner)
+
+
+class PlotOwnerStatsList(ReplicaReadsMixin, generics.ListAPIView):
+    """
+    /plots/stats/
+
+    Endpoint listing the statistics of every user having plots, ordered by
+    username and paginated by keyset (?page_size=, ?cursor=), see Link header
+    """
+
+    serializer_class = PlotOwnerStatsSerializer
+    pagination_class = OwnerStatsCursorPagination
+    queryset = PlotOwnerStats.objects.all()
+
+
+class PlotConflicts(APIView):
+    """
+    /plots/conflicts/
+
+    Endpoint reporting every pair of overlapping plots, overlapping by more than
+    ?min_overlap_area= square metres, ordered by plot ids.
+    Paginated with ?page_size= and ?after=<plot_id>,<other_plot_id>, see Link header
+    """
+
+    def get(self, request):
+        params = request.query_params
+        page_size = PlotsCursorPagination().get_page_size(request)
+        conflicts = find_conflicts(
+            parse_min_area(params.get("min_overlap_area")),
+            after=parse_after(params.get("after")),
+            limit=page_size + 1,
+        )
+
+        headers = None
+        if len(conflicts) > page_size:
+            conflicts = conflicts[:page_size]
+            last = conflicts[-1]
+            next_url = replace_query_param(
+                request.build_absolute_uri(),
+                "after",
+                f"{last['plot_id']},{last['other_plot_id']}",
+            )
+            headers = {"Link": f'<{next_url}>; rel="next"'}
+
+        return Response(conflicts, headers=headers)
+
+
+class PlotAggregate(ReplicaReadsMixin, APIView):
+    """
+    /plots/aggregate/?bbox=<xmin,ymin,xmax,ymax>&resolution=<0-20>
+
+    Endpoint giving the density of plots (of ?owner=<username>, or of anyone)
+    for zoomed-out maps: plot count, summed area and mean centroid per cell of
+    a ?grid=square (default) or hex grid of 360 / 2^resolution degree cells,
+    or per cluster of plots closer than that (?grid=cluster).
+
+    Computed by PostGIS and cached by blocks of cells until plots in them
+    change, see plots.aggregation
+    """
+
+    def get_replica_pins(self, request, kwargs):
+        # Any change may show, as on tiles
+        return [request.GET.get("owner"), TILES_PIN]
+
+    def get(self, request):
+        params = request.query_params
+        resolution = aggregation.parse_resolution(params.get("resolution"))
+        grid = aggregation.parse_grid(params.get("grid"))
+        cells = aggregation.aggregate(
+            aggregation.parse_bbox(params.get("bbox")),
+            resolution,
+            grid,
+            params.get("owner") or None,
+        )
+        return Response(
+            {
+                "grid": grid,
+                "cell_size": aggregation.cell_size(resolution),
+                "cells": cells,
+            }
+        )
+
+
+class PlotLocate(ReplicaReadsMixin, APIView):
+    """
+    /plots/locate/?owner=<username>
+
+    Endpoint giving the plots (of <username>, or of anyone) containing each
+    point of a batch, POSTed as JSON {"points": [[<lon>, <lat>], ...]} or as
+    application/octet-stream (little-endian float64 lon, lat pairs).
+    Returns {"plot_ids": [[<id>, ...], ...]}, in the order of the points.
+
+    Plots of an owner are looked up in an in-memory index once the owner was
+    looked up before, see plots.locate
+    """
+
+    parser_classes = [JSONParser, BinaryPointsParser]
+
+    def get_replica_pins(self, request, kwargs):
+        return [request.GET.get("owner")]
+
+    def post(self, request):
+        points = parse_points(request.data)
+        return Response(
+            {"plot_ids": locate(points, request.query_params.get("owner") or None)}
+        )
 
 
 class PlotUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
@@ -72,7 +594,7 @@ class PlotUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
     authentication_classes = [
         SessionAuthentication,
         BasicAuthentication,
-        TokenAuthentication,
+        CachedTokenAuthentication,
     ]
     permission_classes = [IsAuthenticated]
 
@@ -87,3 +609,154 @@ class PlotUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
 
         if self.request.user.is_authenticated:
             return Plots.objects.filter(plot_owner=username, id=id)
+
+    def perform_destroy(self, instance):
+        # Restricted to the owner, as the lookup: pruned to their partition
+        delete_plots(self.kwargs["username"], ids=[instance.id])
+
+
+class PlotBatchUpdateDelete(generics.GenericAPIView):
+    """
+    /plots/<username>/batch
+
+    Endpoint to rename (PATCH, with "plot_name") or DELETE many plots of
+    <username> at once, selected by "ids": [<id>, ...] or by "filter":
+    {"bbox" | "intersects" | "dwithin" | "plot_name" | "plot_name_prefix": ...}.
+    Authentication as <username> is required.
+
+    Plots are changed by a single UPDATE / DELETE restricted to the owner's
+    plots. Returns a per-id report: 200 when every id was found, 207 otherwise.
+    """
+
+    authentication_classes = [
+        SessionAuthentication,
+        BasicAuthentication,
+        CachedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_class(self):
+        if self.request.method == "PATCH":
+            return PlotBatchUpdateSerializer
+        return PlotBatchSerializer
+
+    def get_batch(self, request, username):
+        if request.user.username != username:
+            raise PermissionDenied()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def patch(self, request, username):
+        batch = self.get_batch(request, username)
+        ids = update_plots(
+            username,
+            {"plot_name": batch["plot_name"]},
+            batch.get("ids"),
+            batch.get("filter"),
+        )
+        return self.report(ids, batch, "updated")
+
+    def delete(self, request, username):
+        batch = self.get_batch(request, username)
+        ids = delete_plots(username, batch.get("ids"), batch.get("filter"))
+        return self.report(ids, batch, "deleted")
+
+    def report(self, changed_ids, batch, action):
+        results = outcomes(changed_ids, batch.get("ids", changed_ids), action)
+        not_found = len(results) - len(changed_ids)
+        return Response(
+            {action: len(changed_ids), "not_found": not_found, "results": results},
+            status=status.HTTP_207_MULTI_STATUS if not_found else status.HTTP_200_OK,
+        )
+
+
+class PlotChanges(ReplicaReadsMixin, APIView):
+    """
+    /plots/<username>/changes?since=<cursor>
+
+    Endpoint listing the plots of <username> created, updated or deleted since
+    <cursor> (0 or omitted: every existing plot), in the order of the changes,
+    ?page_size= at a time, for clients to sync without listing every plot again.
+
+    Returns {"cursor": <next since>, "changes": [{"seq", "action", "id", "plot"}]}
+    with only the last change of each plot, "plot" being serialized as in
+    /plots/<username> (?simplify= works the same), or null for deletions.
+    A Link header gives the next page when more changes follow.
+    Answers 410 Gone when changes since <cursor> were compacted away.
+    """
+
+    def get(self, request, username):
+        entries, cursor, has_more = changes_since(
+            username,
+            parse_since(request.query_params.get("since")),
+            PlotsCursorPagination().get_page_size(request),
+        )
+        if not entries:
+            get_object_or_404(User, username=username)
+
+        geometry_field = geometry_field_name(
+            parse_simplify_level(request.query_params.get("simplify"))
+        )
+        plots = Plots.objects.filter(
+            plot_owner=username,
+            id__in=[entry.plot_id for entry in entries if entry.action != "deleted"],
+        ).defer(*(field for field in GEOMETRY_FIELDS if field != geometry_field))
+        serialized = {
+            plot["id"]: plot
+            for plot in AreaSerializer(
+                plots, many=True, context={"geometry_field": geometry_field}
+            ).data
+        }
+
+        changes = []
+        for entry in entries:
+            plot = serialized.get(entry.plot_id)
+            if entry.action != "deleted" and plot is None:
+                # Deleted or given away since: a later entry tells it
+                continue
+            changes.append(
+                {
+                    "seq": entry.seq,
+                    "action": entry.action,
+                    "id": entry.plot_id,
+                    "plot": plot if entry.action != "deleted" else None,
+                }
+            )
+
+        headers = None
+        if has_more:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "since", cursor
+            )
+            headers = {"Link": f'<{next_url}>; rel="next"'}
+
+        return Response({"cursor": cursor, "changes": changes}, headers=headers)
+
+
+class PlotTile(ReplicaReadsMixin, APIView):
+    """
+    /tiles/<z>/<x>/<y>.pbf
+
+    Endpoint serving plots as Mapbox Vector Tiles (layer "plots"), built by PostGIS.
+    ?owner=<username> restricts the tile to the plots of one user.
+
+    Tiles are cached server side until plots in their extent change.
+    """
+
+    renderer_classes = [MVTRenderer]
+
+    def get_replica_pins(self, request, kwargs):
+        return [request.GET.get("owner"), TILES_PIN]
+
+    def get(self, request, z, x, y):
+        if z > 30 or not (0 <= x < 2**z and 0 <= y < 2**z):
+            raise NotFound()
+
+        tile = get_tile(z, x, y, request.query_params.get("owner"))
+
+        response = Response(
+            tile, status=status.HTTP_200_OK if tile else status.HTTP_204_NO_CONTENT
+        )
+        patch_cache_control(response, public=True, max_age=settings.PLOTS_TILE_MAX_AGE)
+        return response
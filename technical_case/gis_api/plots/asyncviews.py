@@ -0,0 +1,110 @@
+"""
+Async read endpoints, for ASGI deployments (uvicorn, daphne...).
+
+/async/plots/<username> and /async/plots/<username>/<id> return the same JSON
+as the DRF list endpoint, without a worker thread held for the whole request:
+the views are coroutines and query PostGIS with Django's async ORM.
+
+Pagination is by keyset with ?after=<id> (see Link header); ?page_size=,
+?simplify=, ?precision=, ?bbox=, ?intersects= and ?dwithin= work as on
+/plots/<username>.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import HttpResponse, HttpResponseNotAllowed
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from . import metrics
+from .filters import parse_precision, parse_simplify_level, spatial_filter
+from .models import GEOMETRY_FIELDS, Plots, geometry_field_name
+from .renderers import FastJSONRenderer
+from .serializers import AreaSerializer
+
+
+def json_response(data, status=200, headers=None):
+    with metrics.timer("renderer"):
+        content = FastJSONRenderer().render(data)
+    return HttpResponse(
+        content,
+        content_type="application/json",
+        status=status,
+        headers=headers,
+    )
+
+
+def parse_int(params, param, default, minimum):
+    value = params.get(param)
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < minimum:
+        raise ValidationError({param: [f"Expected an integer from {minimum}."]})
+    return int(value)
+
+
+def plots_queryset(request, username):
+    geometry_field = geometry_field_name(
+        parse_simplify_level(request.GET.get("simplify"))
+    )
+    queryset = Plots.objects.filter(plot_owner=username).defer(
+        *(field for field in GEOMETRY_FIELDS if field != geometry_field)
+    )
+    context = {
+        "geometry_field": geometry_field,
+        "precision": parse_precision(request.GET.get("precision"), default=None),
+    }
+    return queryset, context
+
+
+async def plots_list(request, username):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    try:
+        page_size = min(
+            parse_int(request.GET, "page_size", api_settings.PAGE_SIZE, 1),
+            settings.PLOTS_MAX_PAGE_SIZE,
+        )
+        after = parse_int(request.GET, "after", 0, 0)
+        queryset, context = plots_queryset(request, username)
+        queryset = spatial_filter(queryset, request.GET)
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+
+    page = [
+        plot
+        async for plot in queryset.filter(id__gt=after).order_by("id")[: page_size + 1]
+    ]
+    if not page and not await User.objects.filter(username=username).aexists():
+        return json_response({"detail": "Not found."}, status=404)
+
+    headers = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_url = replace_query_param(
+            request.build_absolute_uri(), "after", page[-1].id
+        )
+        headers = {"Link": f'<{next_url}>; rel="next"'}
+
+    return json_response(
+        AreaSerializer(page, many=True, context=context).data, headers=headers
+    )
+
+
+async def plot_detail(request, username, id):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    try:
+        queryset, context = plots_queryset(request, username)
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+
+    try:
+        plot = await queryset.aget(id=id)
+    except Plots.DoesNotExist:
+        return json_response({"detail": "Not found."}, status=404)
+
+    return json_response(AreaSerializer(plot, context=context).data)
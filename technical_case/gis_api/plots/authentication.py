@@ -0,0 +1,154 @@
+"""
+Token authentication with a cache of the token -> user mapping, so that
+authenticated requests don't query the token and its user every time.
+
+Tokens are looked up in two levels:
+    - an in-process LRU cache of PLOTS_AUTH_CACHE_SIZE tokens
+    - optionally, a Django cache shared by every worker (PLOTS_AUTH_CACHE alias)
+both keeping entries PLOTS_AUTH_CACHE_TIMEOUT seconds.
+
+Entries are dropped when a token is deleted (or rotated) and when its user is
+saved (deactivated, password changed...) or deleted, see plots.signals. The
+in-process caches of other workers can't be reached: they keep their entries
+until they expire, which bounds how long a revoked token stays usable there.
+Cache keys are hashes: tokens are not stored in clear in the shared cache.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework.authentication import TokenAuthentication
+
+
+class LRUCache:
+    """In-process LRU cache with expiring entries, safe to use from several threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (value, expiry time)
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, timeout, size):
+        if timeout <= 0 or size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def delete_matching(self, predicate):
+        with self.lock:
+            for key in [
+                key for key, (value, _) in self.entries.items() if predicate(value)
+            ]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_tokens = LRUCache()
+
+
+def shared_cache():
+    return caches[settings.PLOTS_AUTH_CACHE] if settings.PLOTS_AUTH_CACHE else None
+
+
+def cache_key(key):
+    return "plots:auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_token(key):
+    """Cached Token (with its user) of a token key, or None."""
+    cached_key = cache_key(key)
+    token = local_tokens.get(cached_key)
+    if token is None and shared_cache() is not None:
+        token = shared_cache().get(cached_key)
+        if token is not None:
+            local_tokens.set(
+                cached_key,
+                token,
+                settings.PLOTS_AUTH_CACHE_TIMEOUT,
+                settings.PLOTS_AUTH_CACHE_SIZE,
+            )
+    return token
+
+
+def remember_token(token):
+    cached_key = cache_key(token.key)
+    local_tokens.set(
+        cached_key,
+        token,
+        settings.PLOTS_AUTH_CACHE_TIMEOUT,
+        settings.PLOTS_AUTH_CACHE_SIZE,
+    )
+    if shared_cache() is not None:
+        shared_cache().set(cached_key, token, settings.PLOTS_AUTH_CACHE_TIMEOUT)
+
+
+def forget_tokens(keys):
+    """
+    Drop the given token keys from the caches, now and once the current
+    transaction commits (a concurrent request may cache them in between).
+    """
+    cached_keys = [cache_key(key) for key in keys]
+
+    def forget():
+        local_tokens.delete_many(cached_keys)
+        if shared_cache() is not None:
+            shared_cache().delete_many(cached_keys)
+
+    forget()
+    transaction.on_commit(forget)
+
+
+def forget_user(user_id, keys):
+    """Drop the tokens of a user (given their keys for the shared cache)."""
+    forget_tokens(keys)
+
+    def forget():
+        local_tokens.delete_matching(lambda token: token.user_id == user_id)
+
+    forget()
+    transaction.on_commit(forget)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication ("Authorization: Token <key>") reading tokens from the
+    authentication cache, and the database on cache misses only.
+    """
+
+    def authenticate_credentials(self, key):
+        token = get_token(key)
+        if token is not None:
+            # Cached instances are shared between requests: hand out copies
+            return (copy.copy(token.user), token)
+
+        user, token = super().authenticate_credentials(key)
+        remember_token(token)
+        return (user, token)
@@ -0,0 +1,116 @@
+"""
+Set-based updates and deletions of the plots of one owner, used by the
+/plots/<username>/batch endpoint.
+
+Plots are selected by id or by filters, and changed by a single UPDATE or
+DELETE statement restricted to the owner's plots, whose RETURNING clause gives
+the plots actually changed (and what plots_modified receivers need to know
+about them).
+"""
+from django.db import connections, router, transaction
+
+from .filters import spatial_filter
+from .models import Plots
+from .signals import PlotChange, plots_modified
+
+# Owner, extent and area of the changed plots
+RETURNING = (
+    "RETURNING id, plot_owner_id, ST_XMin(plot_geometry), ST_YMin(plot_geometry), "
+    "ST_XMax(plot_geometry), ST_YMax(plot_geometry), plot_area"
+)
+
+FILTERS = ["bbox", "intersects", "dwithin", "plot_name", "plot_name_prefix"]
+
+
+def select_plots(owner, ids=None, filters=None):
+    """Plots of `owner` with the given ids, or matching the given filters."""
+    queryset = Plots.objects.filter(plot_owner=owner)
+    if ids is not None:
+        return queryset.filter(id__in=ids)
+
+    queryset = spatial_filter(queryset, filters)
+    if "plot_name" in filters:
+        queryset = queryset.filter(plot_name=filters["plot_name"])
+    if "plot_name_prefix" in filters:
+        queryset = queryset.filter(plot_name__startswith=filters["plot_name_prefix"])
+    return queryset
+
+
+def execute(statement, params, owner, queryset):
+    """
+    Run an "UPDATE ... / DELETE ..." statement on the plots of `owner` in the
+    queryset. Returns the (id, owner, xmin, ymin, xmax, ymax, area) rows of
+    the changed plots.
+    """
+    using = router.db_for_write(Plots)
+    subquery, subquery_params = queryset.values("id").query.sql_with_params()
+    with connections[using].cursor() as cursor:
+        # The owner is enforced by the statement itself, not only by the subquery
+        cursor.execute(
+            f"{statement} WHERE plot_owner_id = %s AND id IN ({subquery}) {RETURNING}",
+            [*params, owner, *subquery_params],
+        )
+        return cursor.fetchall()
+
+
+def update_plots(owner, values, ids=None, filters=None):
+    """
+    Set the given field values (plot_name) on the selected plots of `owner`,
+    in one UPDATE. Returns the ids of the updated plots.
+    """
+    assignments = ", ".join(f"{field} = %s" for field in values)
+    with transaction.atomic(using=router.db_for_write(Plots)):
+        rows = execute(
+            f"UPDATE {Plots._meta.db_table} SET {assignments}",
+            list(values.values()),
+            owner,
+            select_plots(owner, ids, filters),
+        )
+        # Geometries, areas and owners are unchanged
+        plots_modified.send(
+            sender=Plots,
+            changes=[
+                PlotChange(
+                    "updated",
+                    id,
+                    owner,
+                    tuple(extent),
+                    owner,
+                    tuple(extent),
+                    area,
+                    area,
+                )
+                for id, _, *extent, area in rows
+            ],
+        )
+    return [row[0] for row in rows]
+
+
+def delete_plots(owner, ids=None, filters=None):
+    """
+    Delete the selected plots of `owner`, in one DELETE. Returns the ids of the
+    deleted plots.
+    """
+    with transaction.atomic(using=router.db_for_write(Plots)):
+        rows = execute(
+            f"DELETE FROM {Plots._meta.db_table}",
+            [],
+            owner,
+            select_plots(owner, ids, filters),
+        )
+        plots_modified.send(
+            sender=Plots,
+            changes=[
+                PlotChange("deleted", id, owner, tuple(extent), area=area)
+                for id, _, *extent, area in rows
+            ],
+        )
+    return [row[0] for row in rows]
+
+
+def outcomes(changed_ids, ids, status):
+    """Per-id results: `status` for the changed ids, "not_found" for the others."""
+    changed_ids = set(changed_ids)
+    return [
+        {"id": id, "status": status if id in changed_ids else "not_found"} for id in ids
+    ]
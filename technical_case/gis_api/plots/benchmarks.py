@@ -0,0 +1,347 @@
+"""
+Helpers shared by the benchmark management commands: synthetic plots,
+the API benchmark scenarios and timing statistics.
+"""
+import json
+import math
+import random
+import time
+from collections import namedtuple
+
+from django.contrib.gis.geos import Polygon
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from .models import Plots
+
+
+def polygon_coords(center_x, center_y, radius, vertices, jitter=0.3, rng=random):
+    """
+    Closed ring of a star-shaped polygon with `vertices` distinct vertices,
+    valid whatever the jitter since angles increase strictly.
+    """
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        distance = radius * (1 - jitter * rng.random())
+        ring.append(
+            (
+                center_x + distance * math.cos(angle),
+                center_y + distance * math.sin(angle),
+            )
+        )
+    ring.append(ring[0])
+    return ring
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(durations, elapsed=None):
+    """
+    Throughput and latency percentiles (milliseconds) of a list of durations.
+    Throughput is over `elapsed` seconds for concurrent calls, over the sum of
+    the durations otherwise.
+    """
+    if not durations:
+        return {"count": 0}
+    durations = sorted(durations)
+    elapsed = elapsed or sum(durations)
+    return {
+        "count": len(durations),
+        "per_second": len(durations) / elapsed if elapsed else None,
+        "p50_ms": percentile(durations, 0.50) * 1000,
+        "p95_ms": percentile(durations, 0.95) * 1000,
+        "p99_ms": percentile(durations, 0.99) * 1000,
+    }
+
+
+def measure(function, repeat):
+    """Call `function` `repeat` times and summarize the durations of the calls."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def generate_plots(
+    owners,
+    plots_per_owner,
+    vertices=(8, 64),
+    distribution="uniform",
+    bbox=(-5.0, 42.0, 8.0, 51.0),
+    plot_size=0.002,
+    seed=0,
+):
+    """
+    Yield unsaved Plots: `plots_per_owner` per owner, with a random number of
+    vertices in the `vertices` range and a radius up to `plot_size` degrees.
+
+    Plots are spread uniformly over `bbox`, or "clustered" around a random
+    point per owner (like the fields of a farm). The same seed always yields
+    the same plots.
+    """
+    rng = random.Random(seed)
+    xmin, ymin, xmax, ymax = bbox
+    spread = plot_size * math.sqrt(plots_per_owner) * 2
+
+    for owner in owners:
+        center = (rng.uniform(xmin, xmax), rng.uniform(ymin, ymax))
+        for index in range(plots_per_owner):
+            if distribution == "clustered":
+                x = min(max(rng.gauss(center[0], spread), xmin), xmax)
+                y = min(max(rng.gauss(center[1], spread), ymin), ymax)
+            else:
+                x, y = rng.uniform(xmin, xmax), rng.uniform(ymin, ymax)
+            ring = polygon_coords(
+                x,
+                y,
+                rng.uniform(plot_size / 4, plot_size),
+                rng.randint(*vertices),
+                rng=rng,
+            )
+            yield Plots(
+                plot_name=f"{owner}-{index}",
+                plot_geometry=Polygon(ring, srid=4326),
+                plot_owner_id=owner,
+            )
+
+
+def tile_of(lon, lat, z):
+    """(x, y) of the Web Mercator tile of zoom level z holding a point."""
+    lat = math.radians(max(-85.05, min(85.05, lat)))
+    x = int((lon + 180) / 360 * 2**z)
+    y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * 2**z)
+    return min(x, 2**z - 1), min(y, 2**z - 1)
+
+
+def feature(context, index):
+    ring = polygon_coords(*context["center"], 0.001, 16, rng=random.Random(index))
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+        "properties": {"plot_name": f"bench-{index}", "plot_owner": context["owner"]},
+    }
+
+
+def locate_points(context, index, count):
+    """Random points around the benchmark owner's plots."""
+    rng = random.Random(index)
+    xmin, ymin, xmax, ymax = map(float, context["bbox"].split(","))
+    return [[rng.uniform(xmin, xmax), rng.uniform(ymin, ymax)] for _ in range(count)]
+
+
+# One API request, repeated. `path` is formatted with the benchmark context
+# (owner, plot_id, tile, bbox...) and the request index `i`; `data` builds the
+# request body from them, sent as JSON or as multipart form data. Requests of
+# "write" scenarios are rolled back.
+Scenario = namedtuple(
+    "Scenario",
+    ["name", "url_name", "method", "path", "data", "write", "headers", "multipart"],
+    defaults=[None, False, {}, False],
+)
+
+SCENARIOS = [
+    Scenario(
+        "token_delivery",
+        "token_delivery",
+        "post",
+        "/token_delivery/",
+        lambda c, i: {"username": c["owner"], "password": c["password"]},
+    ),
+    Scenario(
+        "plot_create",
+        "plot_create",
+        "post",
+        "/plots/",
+        lambda c, i: {
+            "plot_name": f"bench-{i}",
+            "plot_geometry": feature(c, i)["geometry"],
+            "plot_owner": c["owner"],
+        },
+        write=True,
+    ),
+    Scenario(
+        "plots_bulk_create_100",
+        "plots_bulk_create",
+        "post",
+        "/plots/bulk/",
+        lambda c, i: {
+            "type": "FeatureCollection",
+            "features": [feature(c, i * 100 + n) for n in range(100)],
+        },
+        write=True,
+    ),
+    Scenario(
+        "plots_import_upload",
+        "plots_imports",
+        "post",
+        "/plots/imports/",
+        lambda c, i: {
+            "file": SimpleUploadedFile(
+                "plots.geojson",
+                json.dumps(
+                    {
+                        "type": "FeatureCollection",
+                        "features": [feature(c, i * 100 + n) for n in range(100)],
+                    }
+                ).encode(),
+            )
+        },
+        write=True,
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+        multipart=True,
+    ),
+    Scenario(
+        "plots_import",
+        "plots_import",
+        "get",
+        "/plots/imports/{import_id}",
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+    # Reuses the export of the benchmark context: the plots don't change
+    Scenario(
+        "plots_export_reused",
+        "plots_exports",
+        "post",
+        "/plots/exports/",
+        lambda c, i: {"format": "fgb"},
+        write=True,
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+    Scenario(
+        "plots_export",
+        "plots_export",
+        "get",
+        "/plots/exports/{export_id}",
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+    Scenario(
+        "plots_export_download",
+        "plots_export_download",
+        "get",
+        "/plots/exports/{export_id}/download",
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+    Scenario(
+        "plots_export_download_range",
+        "plots_export_download",
+        "get",
+        "/plots/exports/{export_id}/download",
+        headers={"HTTP_AUTHORIZATION": "Token {token}", "HTTP_RANGE": "bytes=0-65535"},
+    ),
+    # Owner index built by the first request, hot afterwards
+    Scenario(
+        "plots_locate_1000",
+        "plots_locate",
+        "post",
+        "/plots/locate/?owner={owner}",
+        lambda c, i: {"points": locate_points(c, i, 1000)},
+    ),
+    Scenario(
+        "plots_locate_all_1000",
+        "plots_locate",
+        "post",
+        "/plots/locate/",
+        lambda c, i: {"points": locate_points(c, i, 1000)},
+    ),
+    Scenario(
+        "plots_aggregate_cached",
+        "plots_aggregate",
+        "get",
+        "/plots/aggregate/?bbox=-5,42,8,51&resolution=8",
+    ),
+    Scenario(
+        "plots_aggregate_hex",
+        "plots_aggregate",
+        "get",
+        "/plots/aggregate/?bbox=-5,42,8,51&resolution=8&grid=hex&owner={owner}",
+    ),
+    Scenario("plots_conflicts", "plots_conflicts", "get", "/plots/conflicts/"),
+    Scenario("plots_stats", "plots_stats", "get", "/plots/stats/"),
+    Scenario("plots_owner_stats", "plots_owner_stats", "get", "/plots/{owner}/stats"),
+    Scenario("plots_changes", "plots_changes", "get", "/plots/{owner}/changes"),
+    Scenario("plots_list_cached", "plots_list", "get", "/plots/{owner}"),
+    Scenario("plots_list", "plots_list", "get", "/plots/{owner}?nocache={i}"),
+    Scenario(
+        "plots_list_bbox",
+        "plots_list",
+        "get",
+        "/plots/{owner}?bbox={bbox}&nocache={i}",
+    ),
+    Scenario(
+        "plots_list_simplified",
+        "plots_list",
+        "get",
+        "/plots/{owner}?simplify=3&nocache={i}",
+    ),
+    Scenario(
+        "plots_list_ndjson",
+        "plots_list",
+        "get",
+        "/plots/{owner}?format=ndjson&nocache={i}",
+    ),
+    Scenario(
+        "plots_list_twkb", "plots_list", "get", "/plots/{owner}?format=twkb&nocache={i}"
+    ),
+    Scenario("async_plots_list", "async_plots_list", "get", "/async/plots/{owner}"),
+    Scenario(
+        "async_plot_detail",
+        "async_plot_detail",
+        "get",
+        "/async/plots/{owner}/{plot_id}",
+    ),
+    Scenario("metrics", "metrics", "get", "/metrics"),
+    Scenario("plots_tile_cached", "plots_tile", "get", "/tiles/{tile}.pbf"),
+    # Above PLOTS_TILE_MAX_CACHED_ZOOM: always rendered
+    Scenario("plots_tile", "plots_tile", "get", "/tiles/{uncached_tile}.pbf"),
+    Scenario(
+        "plot_update",
+        "plots_updateDelete",
+        "patch",
+        "/plots/{owner}/{plot_id}",
+        lambda c, i: {"plot_name": f"bench-{i}"},
+        write=True,
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+    Scenario(
+        "plots_batch_update_bbox",
+        "plots_batch",
+        "patch",
+        "/plots/{owner}/batch",
+        lambda c, i: {"filter": {"bbox": c["bbox"]}, "plot_name": f"bench-{i}"},
+        write=True,
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+    Scenario(
+        "plots_batch_delete_bbox",
+        "plots_batch",
+        "delete",
+        "/plots/{owner}/batch",
+        lambda c, i: {"filter": {"bbox": c["bbox"]}},
+        write=True,
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+    Scenario(
+        "plot_delete",
+        "plots_updateDelete",
+        "delete",
+        "/plots/{owner}/{plot_id}",
+        write=True,
+        headers={"HTTP_AUTHORIZATION": "Token {token}"},
+    ),
+]
+
+
+def request_body(scenario, context, index):
+    if scenario.data is None:
+        return {}
+    if scenario.multipart:
+        return {"data": scenario.data(context, index)}
+    return {
+        "data": json.dumps(scenario.data(context, index)),
+        "content_type": "application/json",
+    }
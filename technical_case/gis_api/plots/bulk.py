@@ -0,0 +1,222 @@
+"""
+Batched plot ingestion used by the /plots/bulk/ endpoint.
+
+Features are validated and inserted chunk by chunk: one owner lookup query,
+one bulk INSERT and one set-based UPDATE of the derived fields (area,
+simplified geometries) per chunk, each chunk in its own transaction.
+
+The overlap policy (?overlap=, PLOTS_OVERLAP_POLICY) applies as for single
+plots: unless "allow", the plots of a chunk are checked in one query against
+the existing plots and the plots before them in the chunk, under the
+per-owner lock of plots.changes.
+"""
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, transaction
+
+from .changes import lock_owners
+from .geometry import GeometryError, parse_geometry
+from .models import Plots
+from .overlaps import (
+    find_chunk_overlaps,
+    overlaps_message,
+    parse_min_area,
+    parse_overlap_policy,
+)
+from .signals import PlotChange, plots_modified
+
+
+def iter_chunks(items, size):
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def feature_to_plot(feature):
+    """
+    Build an unsaved Plots instance from a GeoJSON Feature (dict or JSON text).
+
+    Raises ValueError with a {field: [messages]} dict when the feature is invalid.
+    Owner existence is checked per chunk by ingest_features.
+    """
+    if isinstance(feature, str):
+        try:
+            feature = json.loads(feature)
+        except ValueError as e:
+            raise ValueError({"non_field_errors": [f"Invalid JSON: {e}"]})
+
+    if not isinstance(feature, dict) or feature.get("type") != "Feature":
+        raise ValueError({"non_field_errors": ["Item is not a GeoJSON Feature."]})
+
+    errors = {}
+    properties = feature.get("properties") or {}
+
+    plot_name = properties.get("plot_name")
+    if not isinstance(plot_name, str) or not plot_name:
+        errors["plot_name"] = ["This field is required."]
+    elif len(plot_name) > 255:
+        errors["plot_name"] = ["Ensure this field has no more than 255 characters."]
+
+    plot_owner = properties.get("plot_owner")
+    if not isinstance(plot_owner, str) or not plot_owner:
+        errors["plot_owner"] = ["This field is required."]
+
+    try:
+        geometry = parse_geometry(feature.get("geometry"))
+    except GeometryError as e:
+        errors["plot_geometry"] = [str(e)]
+
+    if errors:
+        raise ValueError(errors)
+
+    return Plots(plot_name=plot_name, plot_geometry=geometry, plot_owner_id=plot_owner)
+
+
+def create_plots(plots):
+    """
+    Insert unsaved Plots instances in one transaction, with their derived
+    fields, and report them through plots_modified.
+    """
+    plots = list(plots)
+    with transaction.atomic():
+        Plots.objects.bulk_create(plots)
+        Plots.objects.filter(
+            pk__in=[plot.pk for plot in plots]
+        ).refresh_derived_fields()
+        plots_modified.send(
+            sender=Plots,
+            changes=[
+                PlotChange(
+                    "created", plot.pk, plot.plot_owner_id, plot.plot_geometry.extent
+                )
+                for plot in plots
+            ],
+        )
+
+
+def check_overlaps(plots, policy, min_area, offset=0):
+    """
+    Apply the overlap policy to the {position: plot} of a chunk. Rejected plots
+    are removed from `plots`. Returns {position: error message} of the
+    rejected plots and {position: overlaps} of the flagged ones, the earlier
+    plots of the chunk being given as ("earlier", <position>, <area>).
+    Features are named in messages by their index in the request, `offset`
+    being the index of the first feature of the chunk.
+    """
+    positions = list(plots)
+    overlaps = find_chunk_overlaps(
+        [plots[position].plot_geometry for position in positions], min_area
+    )
+    rejected, flagged = {}, {}
+    for index, position in enumerate(positions):
+        plot_overlaps = [
+            ("earlier", positions[overlap[1]], overlap[2])
+            if isinstance(overlap, tuple)
+            else overlap
+            for overlap in overlaps.get(index, [])
+        ]
+        if policy == "flag":
+            flagged[position] = plot_overlaps
+            continue
+        existing = [overlap for overlap in plot_overlaps if isinstance(overlap, dict)]
+        # Overlapping an earlier plot of the chunk counts once it is accepted
+        earlier = [
+            overlap[1]
+            for overlap in plot_overlaps
+            if isinstance(overlap, tuple) and overlap[1] not in rejected
+        ]
+        if existing:
+            rejected[position] = overlaps_message(existing)
+        elif earlier:
+            rejected[position] = (
+                "Overlaps features of this request: "
+                + ", ".join(str(offset + other) for other in earlier)
+                + "."
+            )
+    for position in rejected:
+        del plots[position]
+    return rejected, flagged
+
+
+def ingest_features(features, chunk_size=None, overlap=None, min_overlap_area=None):
+    """
+    Validate and insert an iterable of GeoJSON Features, following the
+    `overlap` policy and `min_overlap_area` (PLOTS_OVERLAP_POLICY and
+    PLOTS_OVERLAP_MIN_AREA by default).
+
+    Returns one result dict per input item, in input order.
+    """
+    chunk_size = chunk_size or settings.PLOTS_BULK_CHUNK_SIZE
+    policy = parse_overlap_policy(overlap)
+    min_area = parse_min_area(min_overlap_area)
+    results = []
+
+    for chunk in iter_chunks(features, chunk_size):
+        offset = len(results)
+        chunk_results = [None] * len(chunk)
+        plots = {}
+
+        for position, feature in enumerate(chunk):
+            try:
+                plots[position] = feature_to_plot(feature)
+            except ValueError as e:
+                chunk_results[position] = {"status": "error", "errors": e.args[0]}
+
+        known_owners = set(
+            User.objects.filter(
+                username__in={plot.plot_owner_id for plot in plots.values()}
+            ).values_list("username", flat=True)
+        )
+        for position, plot in list(plots.items()):
+            if plot.plot_owner_id not in known_owners:
+                del plots[position]
+                chunk_results[position] = {
+                    "status": "error",
+                    "errors": {"plot_owner": ["Unknown user."]},
+                }
+
+        checked = dict(plots)
+        flagged = {}
+        try:
+            with transaction.atomic():
+                if policy != "allow" and plots:
+                    lock_owners({plot.plot_owner_id for plot in plots.values()})
+                    rejected, flagged = check_overlaps(
+                        checked, policy, min_area, offset
+                    )
+                    for position, message in rejected.items():
+                        chunk_results[position] = {
+                            "status": "error",
+                            "errors": {"plot_geometry": [message]},
+                        }
+                create_plots(checked.values())
+        except DatabaseError:
+            for position in plots:
+                chunk_results[position] = {
+                    "status": "error",
+                    "errors": {
+                        "non_field_errors": ["Database error, chunk rolled back."]
+                    },
+                }
+        else:
+            for position, plot in checked.items():
+                chunk_results[position] = {"status": "created", "id": plot.id}
+            for position, plot_overlaps in flagged.items():
+                chunk_results[position]["overlaps"] = [
+                    {
+                        "id": checked[overlap[1]].id,
+                        "plot_owner": checked[overlap[1]].plot_owner_id,
+                        "overlap_area": overlap[2],
+                    }
+                    if isinstance(overlap, tuple)
+                    else overlap
+                    for overlap in plot_overlaps
+                ]
+
+        for position, result in enumerate(chunk_results):
+            results.append({"index": offset + position, **result})
+
+    return results
@@ -0,0 +1,151 @@
+"""
+Per-owner cache of plot list responses, with ETag / If-None-Match support.
+
+Every owner has a version token, replaced whenever one of their plots changes
+(see plots.signals). Cache keys and ETags derive from that token and from the
+request parameters, so a change makes every cached response of the owner
+unreachable at once and cached data is never served stale.
+
+The token is replaced again once the change is committed: responses cached
+in between, from data read before the commit, are unreachable too. Server
+processes must share the cache holding the tokens (see check_shared_caches()),
+which also holds the tile and aggregate caches and the replica pins.
+"""
+import hashlib
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from rest_framework import status
+from rest_framework.response import Response
+
+# Response headers stored along with cached contents
+CACHED_HEADERS = ["Content-Type", "Link"]
+
+
+def cache():
+    return caches[settings.PLOTS_LIST_CACHE]
+
+
+def version_key(owner):
+    return f"plots:version:{owner}"
+
+
+def owner_version(owner):
+    # A missing (or evicted) version gets a new random token, never an old one
+    return cache().get_or_set(version_key(owner), lambda: uuid.uuid4().hex, None)
+
+
+def bump_versions(owners):
+    """Invalidate every cached list response of the given owners."""
+    cache().set_many({version_key(owner): uuid.uuid4().hex for owner in owners}, None)
+
+
+def get_versions(versions_cache, keys):
+    """
+    {key: token} of the version tokens stored in `versions_cache` under `keys`,
+    in one query when none is missing. Missing ones get a new random token.
+    """
+    found = versions_cache.get_many(keys)
+    return {
+        key: (
+            found[key]
+            if key in found
+            else versions_cache.get_or_set(key, lambda: uuid.uuid4().hex, None)
+        )
+        for key in keys
+    }
+
+
+def local_caches():
+    """Aliases of the plot caches held in the memory of each process."""
+    aliases = {
+        settings.PLOTS_LIST_CACHE,
+        settings.PLOTS_TILE_CACHE,
+        settings.PLOTS_AGGREGATE_CACHE,
+    }
+    return [
+        alias for alias in sorted(aliases) if isinstance(caches[alias], LocMemCache)
+    ]
+
+
+def check_shared_caches():
+    """
+    Refuse per-process caches when several server processes (PLOTS_WORKERS)
+    run: a change would only invalidate the caches of the process making it.
+    """
+    aliases = local_caches()
+    if settings.PLOTS_WORKERS > 1 and aliases:
+        raise ImproperlyConfigured(
+            f"Caches {', '.join(aliases)} are local to each process while "
+            f"PLOTS_WORKERS={settings.PLOTS_WORKERS}: use a shared cache "
+            "backend (CACHE_BACKEND, CACHE_LOCATION), such as Redis."
+        )
+
+
+def list_cache_key(owner, request):
+    fingerprint = repr(
+        (
+            owner,
+            owner_version(owner),
+            sorted(request.query_params.lists()),
+            request.accepted_media_type,
+        )
+    )
+    return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+
+def store(key, response):
+    headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+    cache().set(
+        f"plots:list:{key}",
+        (response.content, headers),
+        settings.PLOTS_LIST_CACHE_TIMEOUT,
+    )
+
+
+class CachedListMixin:
+    """
+    Serve list responses from the cache when the owner's plots did not change,
+    and answer 304 Not Modified to clients already holding them.
+
+    Views define get_cache_owner().
+    """
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(self.get_cache_owner(), request)
+        etag = f'"{key}"'
+
+        # Weak comparison: compressed responses carry W/ ETags
+        if_none_match = [
+            tag.removeprefix("W/")
+            for tag in parse_etags(request.headers.get("If-None-Match", ""))
+        ]
+        if etag in if_none_match or "*" in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cached = cache().get(f"plots:list:{key}")
+            if cached is not None:
+                content, headers = cached
+                response = HttpResponse(content, headers=headers)
+            else:
+                response = super().list(request, *args, **kwargs)
+                # The browsable API embeds per-session data and can't be shared
+                if (
+                    isinstance(response, Response)
+                    and response.status_code == status.HTTP_200_OK
+                    and request.accepted_renderer.format != "api"
+                ):
+                    response.add_post_render_callback(partial(store, key))
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            patch_cache_control(response, no_cache=True)
+        return response
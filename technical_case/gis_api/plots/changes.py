@@ -0,0 +1,183 @@
+"""
+Change log of plots, for the incremental sync of clients
+(/plots/<username>/changes?since=<cursor>).
+
+Every plots_modified change is written as PlotLogEntry rows in the transaction
+of the change (see plots.signals), one per owner concerned: a plot given to
+another owner is "deleted" for the previous one and "created" for the new one.
+
+The entries of an owner have sequence numbers in commit order: writers take
+an advisory lock on every owner they write entries of before inserting them,
+and keep it until they commit, so a client that has read every entry of an
+owner up to a sequence number will never see a lower one appear. Writers of
+different owners don't wait for each other.
+
+compact() removes the entries superseded by a later entry of the same plot
+(always safe: the later entry tells the final state), and the deletion entries
+older than the retention period. Clients whose cursor is older than the last
+removed deletion are answered 410 Gone and must sync from the start (since=0,
+which lists every existing plot).
+"""
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import PlotLogEntry, PlotLogHorizon
+
+# First pg_advisory_xact_lock() key of the per-owner locks, the second one
+# being the hashtext() of an owner
+LOCK_KEY = 0x706C6F74
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = (
+        "Changes since this cursor were compacted, sync again with since=0."
+    )
+    default_code = "cursor_expired"
+
+
+def log_entries(changes):
+    """PlotLogEntry rows (unsaved) of plots_modified changes."""
+    entries = []
+    for change in changes:
+        if change.action == "updated" and change.previous_owner not in (
+            None,
+            change.owner,
+        ):
+            entries.append(
+                PlotLogEntry(
+                    owner=change.previous_owner,
+                    plot_id=change.plot_id,
+                    action="deleted",
+                )
+            )
+            entries.append(
+                PlotLogEntry(
+                    owner=change.owner, plot_id=change.plot_id, action="created"
+                )
+            )
+        else:
+            entries.append(
+                PlotLogEntry(
+                    owner=change.owner, plot_id=change.plot_id, action=change.action
+                )
+            )
+    return entries
+
+
+def lock_owners(owners, using=None):
+    """
+    Lock the plots of `owners` until the end of the transaction: other writers
+    of these owners (change log, plots.stats, overlap checks) wait for it to
+    commit. Locks are taken in a consistent order not to deadlock.
+    """
+    using = using or router.db_for_write(PlotLogEntry)
+    with connections[using].cursor() as cursor:
+        for owner in sorted(owners):
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, hashtext(%s))", [LOCK_KEY, owner]
+            )
+
+
+def record(changes):
+    """Write the change log entries of plots_modified changes."""
+    using = router.db_for_write(PlotLogEntry)
+    entries = log_entries(changes)
+    with transaction.atomic(using=using):
+        # Released at commit: sequence numbers of an owner are taken in
+        # commit order
+        lock_owners({entry.owner for entry in entries}, using)
+        PlotLogEntry.objects.using(using).bulk_create(entries)
+
+
+def parse_since(value):
+    if value is None:
+        return 0
+    if not value.isdigit():
+        raise ValidationError(
+            {"since": ["Expected a cursor returned by this endpoint."]}
+        )
+    return int(value)
+
+
+def horizon(using=None):
+    return (
+        PlotLogHorizon.objects.using(using).values_list("seq", flat=True).first() or 0
+    )
+
+
+def last_seq(owner, using=None):
+    """
+    Position of the change log of `owner`, which moves forward on every change
+    of their plots: equal positions mean unchanged plots. Deletions removed by
+    compaction are accounted for by the horizon.
+    """
+    seq = (
+        PlotLogEntry.objects.using(using)
+        .filter(owner=owner)
+        .aggregate(seq=Max("seq"))["seq"]
+    )
+    return max(seq or 0, horizon(using))
+
+
+def changes_since(owner, since, limit):
+    """
+    The next `limit` change log entries of `owner` after `since`, keeping the
+    last one of each plot, and whether more entries follow.
+    Returns (entries, cursor, has_more), cursor being the sequence number to
+    ask the following changes from.
+    """
+    if 0 < since < horizon():
+        raise CursorExpired()
+
+    page = list(
+        PlotLogEntry.objects.filter(owner=owner, seq__gt=since).order_by("seq")[
+            : limit + 1
+        ]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    latest = {entry.plot_id: entry for entry in page}
+    entries = [entry for entry in page if latest[entry.plot_id] is entry]
+    return entries, page[-1].seq if page else since, has_more
+
+
+def compact(retention_days):
+    """
+    Remove superseded entries, and deletion entries older than `retention_days`.
+    Returns the number of removed entries.
+    """
+    table = PlotLogEntry._meta.db_table
+    using = router.db_for_write(PlotLogEntry)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} AS entry WHERE EXISTS ("
+                f"SELECT 1 FROM {table} AS later WHERE later.plot_id = entry.plot_id "
+                "AND later.owner = entry.owner AND later.seq > entry.seq)"
+            )
+            superseded = cursor.rowcount
+            cursor.execute(
+                f"WITH removed AS (DELETE FROM {table} WHERE action = 'deleted' "
+                "AND changed_at < %s RETURNING seq) SELECT COUNT(*), MAX(seq) FROM removed",
+                [cutoff],
+            )
+            deleted, last_deleted_seq = cursor.fetchone()
+
+        if deleted:
+            horizon_row, _ = PlotLogHorizon.objects.using(using).get_or_create(pk=1)
+            PlotLogHorizon.objects.using(using).filter(pk=horizon_row.pk).update(
+                seq=Greatest("seq", last_deleted_seq)
+            )
+
+    return superseded + deleted
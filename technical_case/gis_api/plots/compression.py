@@ -0,0 +1,118 @@
+"""
+Response compression negotiated with the Accept-Encoding request header, see
+CompressionMiddleware.
+
+The encoding is the one the client prefers (q-values) among the
+PLOTS_COMPRESSION_ENCODINGS, ties going to the first listed: zstd and Brotli
+("br") give smaller plot lists than gzip for less CPU time. Bodies smaller
+than PLOTS_COMPRESSION_MIN_SIZE bytes are sent as they are, compressing them
+saving next to nothing. Streamed bodies are compressed chunk by chunk, each
+chunk being flushed so that clients receive plots as they are read.
+"""
+import zlib
+
+import brotli
+import zstandard
+from django.conf import settings
+
+# Fast levels, for responses compressed on every request
+LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+
+class GzipCompressor:
+    def __init__(self):
+        self.compressor = zlib.compressobj(LEVELS["gzip"], zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=LEVELS["br"])
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=LEVELS["zstd"]).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+COMPRESSORS = {"zstd": ZstdCompressor, "br": BrotliCompressor, "gzip": GzipCompressor}
+
+
+def accepted_encodings(header):
+    """{encoding: q-value} of an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(","):
+        encoding, *params = [part.strip() for part in item.split(";")]
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[encoding.lower()] = quality
+    return accepted
+
+
+def negotiate(header):
+    """The encoding to compress a response with, or None."""
+    accepted = accepted_encodings(header)
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), -index, encoding)
+        for index, encoding in enumerate(settings.PLOTS_COMPRESSION_ENCODINGS)
+        if encoding in COMPRESSORS
+    ]
+    quality, _, encoding = max(candidates, default=(0.0, 0, None))
+    return encoding if quality > 0 else None
+
+
+def compress(encoding, data):
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(encoding, chunks):
+    compressor = COMPRESSORS[encoding]()
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(encoding, chunks):
+    compressor = COMPRESSORS[encoding]()
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
@@ -0,0 +1,382 @@
+"""
+Export of every plot of an owner to a file (GeoPackage, FlatGeobuf or GeoJSON
+text sequence), for the /plots/exports/ endpoints, run by the
+process_plot_exports worker.
+
+run() reads the plots, PLOTS_EXPORT_CHUNK_SIZE rows per round trip, in a
+REPEATABLE READ transaction: the exported plots and the position of the owner's
+change log recorded with them (PlotExport.seq, see plots.changes.last_seq) come
+from the same snapshot. GeoPackage and GeoJSON text sequence files are written
+from a server-side cursor; FlatGeobuf chunks are built by PostGIS
+(ST_AsFlatGeobuf, without spatial index) and appended to the file.
+
+Files are kept in the default storage with their size and SHA-256 digest,
+and downloaded with HTTP Range requests (see parse_range()), so that an
+interrupted download resumes where it stopped.
+
+An export stays valid until the change log of its owner moves past its seq:
+submitting the same format again reuses it, or a pending export. A newer
+export of the same owner and format expires the previous one, whose file is
+deleted.
+
+Exports whose worker stopped are queued again by claim_next() (see
+plots.jobs): writing an export only changes its own row and file.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import struct
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+import orjson
+from django.conf import settings
+from django.contrib.gis.db.models import Extent
+from django.contrib.gis.db.models.functions import AsGeoJSON, AsWKB
+from django.core.files import File
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .bulk import iter_chunks
+from .changes import last_seq
+from .jobs import heartbeat, lease_expiry
+from .models import PlotExport, Plots
+from .routers import replica_reads
+
+logger = logging.getLogger(__name__)
+
+# Bytes read at once from export files
+BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+WGS84_WKT = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+    'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,'
+    'AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]'
+)
+
+# Minimal GeoPackage 1.3: the required metadata tables and one feature table
+GEOPACKAGE_SCHEMA = f"""
+PRAGMA application_id = 1196444487;
+PRAGMA user_version = 10300;
+CREATE TABLE gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL PRIMARY KEY,
+    organization TEXT NOT NULL,
+    organization_coordsys_id INTEGER NOT NULL,
+    definition TEXT NOT NULL,
+    description TEXT
+);
+INSERT INTO gpkg_spatial_ref_sys VALUES
+    ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', NULL),
+    ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', NULL),
+    ('WGS 84 geodetic', 4326, 'EPSG', 4326, '{WGS84_WKT}', NULL);
+CREATE TABLE gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY,
+    data_type TEXT NOT NULL,
+    identifier TEXT UNIQUE,
+    description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    min_x DOUBLE,
+    min_y DOUBLE,
+    max_x DOUBLE,
+    max_y DOUBLE,
+    srs_id INTEGER REFERENCES gpkg_spatial_ref_sys(srs_id)
+);
+CREATE TABLE gpkg_geometry_columns (
+    table_name TEXT NOT NULL REFERENCES gpkg_contents(table_name),
+    column_name TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL REFERENCES gpkg_spatial_ref_sys(srs_id),
+    z TINYINT NOT NULL,
+    m TINYINT NOT NULL,
+    PRIMARY KEY (table_name, column_name)
+);
+CREATE TABLE plots (
+    fid INTEGER PRIMARY KEY AUTOINCREMENT,
+    geom POLYGON,
+    plot_name TEXT,
+    plot_area DOUBLE
+);
+"""
+
+# GeoPackage geometry header: magic, version 0, flags (little-endian, no
+# envelope), SRID
+GEOPACKAGE_HEADER = struct.pack("<2sBBi", b"GP", 0, 1, 4326)
+
+# The FlatGeobuf magic bytes, followed by the size of the header
+FLATGEOBUF_PREAMBLE = 12
+
+
+class RangeNotSatisfiable(Exception):
+    """The Range header asks for bytes past the end of the file."""
+
+
+def write_geojsonseq(queryset, path):
+    """GeoJSON text sequence (RFC 8142): one Feature per record."""
+    rows = (
+        queryset.annotate(geojson=AsGeoJSON("plot_geometry", precision=8))
+        .values_list("id", "plot_name", "plot_area", "geojson")
+        .iterator(chunk_size=settings.PLOTS_EXPORT_CHUNK_SIZE)
+    )
+    count = 0
+    with open(path, "wb") as file:
+        for id, plot_name, plot_area, geojson in rows:
+            feature = {
+                "type": "Feature",
+                "id": id,
+                "geometry": orjson.Fragment(geojson),
+                "properties": {"plot_name": plot_name, "plot_area": plot_area},
+            }
+            file.write(b"\x1e" + orjson.dumps(feature) + b"\n")
+            count += 1
+    return count
+
+
+def write_geopackage(queryset, path):
+    """GeoPackage with a "plots" feature table."""
+    extent = queryset.aggregate(extent=Extent("plot_geometry"))["extent"]
+    rows = (
+        queryset.annotate(wkb=AsWKB("plot_geometry"))
+        .values_list("id", "plot_name", "plot_area", "wkb")
+        .iterator(chunk_size=settings.PLOTS_EXPORT_CHUNK_SIZE)
+    )
+    count = 0
+    database = sqlite3.connect(path)
+    try:
+        database.executescript(GEOPACKAGE_SCHEMA)
+        database.execute(
+            "INSERT INTO gpkg_contents (table_name, data_type, identifier, "
+            "min_x, min_y, max_x, max_y, srs_id) "
+            "VALUES ('plots', 'features', 'plots', ?, ?, ?, ?, 4326)",
+            extent or (None, None, None, None),
+        )
+        database.execute(
+            "INSERT INTO gpkg_geometry_columns "
+            "VALUES ('plots', 'geom', 'POLYGON', 4326, 0, 0)"
+        )
+        for chunk in iter_chunks(rows, settings.PLOTS_EXPORT_CHUNK_SIZE):
+            database.executemany(
+                "INSERT INTO plots (fid, geom, plot_name, plot_area) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (id, GEOPACKAGE_HEADER + bytes(wkb), plot_name, plot_area)
+                    for id, plot_name, plot_area, wkb in chunk
+                ],
+            )
+            count += len(chunk)
+        database.commit()
+    finally:
+        database.close()
+    return count
+
+
+def write_flatgeobuf(queryset, path):
+    """
+    FlatGeobuf without spatial index: the first chunk built by PostGIS is
+    written whole, the next ones without their magic bytes and header.
+    Owners without plots get an empty file, as with ?format=fgb.
+    """
+    rows = queryset.annotate(geom=F("plot_geometry")).values(
+        "id", "plot_name", "plot_area", "geom"
+    )
+    count = 0
+    last_id = 0
+    with open(path, "wb") as file, connections[queryset.db].cursor() as cursor:
+        while True:
+            chunk = rows.filter(id__gt=last_id)[: settings.PLOTS_EXPORT_CHUNK_SIZE]
+            sql, params = chunk.query.sql_with_params()
+            cursor.execute(
+                "SELECT ST_AsFlatGeobuf(plots, false, 'geom'), COUNT(*), "
+                f"MAX(plots.id) FROM ({sql}) AS plots",
+                params,
+            )
+            data, rows_count, last_id = cursor.fetchone()
+            if not rows_count:
+                return count
+            data = bytes(data)
+            if count:
+                (header_size,) = struct.unpack_from("<I", data, 8)
+                data = data[FLATGEOBUF_PREAMBLE + header_size :]
+            file.write(data)
+            count += rows_count
+
+
+# Media type, file extension and writer of every export format
+ExportFormat = namedtuple("ExportFormat", ["media_type", "extension", "write"])
+
+FORMATS = {
+    "gpkg": ExportFormat("application/geopackage+sqlite3", "gpkg", write_geopackage),
+    "fgb": ExportFormat("application/flatgeobuf", "fgb", write_flatgeobuf),
+    "geojsonseq": ExportFormat(
+        "application/geo+json-seq", "geojsons", write_geojsonseq
+    ),
+}
+
+
+@contextmanager
+def snapshot(using):
+    """Read-only transaction whose queries all see the same data."""
+    connection = connections[using]
+    # SET TRANSACTION must come first: not possible in an outer transaction
+    # (tests), which gives the same guarantees as long as it is read only
+    outer = connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if not outer:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+                )
+        yield
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def reusable(owner, format):
+    """
+    A pending export of the owner, or a finished one of their current plots,
+    in the given format, or None.
+    """
+    return (
+        PlotExport.objects.filter(owner=owner, format=format)
+        .filter(Q(status="pending") | Q(status="done", seq=last_seq(owner)))
+        .order_by("-id")
+        .first()
+    )
+
+
+def expire_previous(export):
+    """Delete the files of the exports made obsolete by `export`."""
+    previous = PlotExport.objects.filter(
+        owner=export.owner_id,
+        format=export.format,
+        status="done",
+        seq__lte=export.seq,
+    ).exclude(pk=export.pk)
+    for obsolete in previous:
+        obsolete.file.delete(save=False)
+        obsolete.status = "expired"
+        obsolete.save(update_fields=["file", "status"])
+
+
+def run(export):
+    """
+    Write the file of every plot of export.owner, recording the progress in
+    export. Failed exports are marked "failed" with their reason in errors.
+    """
+    export.started_at = export.heartbeat_at = timezone.now()
+    export.status = "running"
+    export.save(update_fields=["started_at", "heartbeat_at", "status"])
+    export_format = FORMATS[export.format]
+
+    job = PlotExport.objects.filter(pk=export.pk)
+    try:
+        with heartbeat(job), tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"plots.{export_format.extension}")
+            # Replicas unless the owner changed plots right before
+            with replica_reads(export.owner_id):
+                using = router.db_for_read(Plots)
+                with snapshot(using):
+                    export.seq = last_seq(export.owner_id, using=using)
+                    export.plots_exported = export_format.write(
+                        Plots.objects.using(using)
+                        .filter(plot_owner=export.owner_id)
+                        .order_by("id"),
+                        path,
+                    )
+
+            export.size = os.path.getsize(path)
+            export.sha256 = file_digest(path)
+            with open(path, "rb") as file:
+                export.file.save(
+                    f"plots-{export.pk}.{export_format.extension}",
+                    File(file),
+                    save=False,
+                )
+    except Exception as e:
+        logger.exception("Export %s failed", export.pk)
+        export.status = "failed"
+        export.errors = [{"detail": str(e)}]
+    else:
+        export.status = "done"
+
+    export.finished_at = timezone.now()
+    export.save()
+    if export.status == "done":
+        expire_previous(export)
+    return export
+
+
+def run_pk(pk):
+    """run() for the process pool of the worker, given the export id."""
+    return run(PlotExport.objects.get(pk=pk)).status
+
+
+def claim_next():
+    """
+    Mark the oldest pending export as running and return it, or None, after
+    queuing again the exports of stopped workers.
+    """
+    stale = PlotExport.objects.filter(status="running", heartbeat_at__lt=lease_expiry())
+    stale.update(status="pending", heartbeat_at=None)
+    with transaction.atomic():
+        export = (
+            PlotExport.objects.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("id")
+            .first()
+        )
+        if export is not None:
+            export.status = "running"
+            export.heartbeat_at = timezone.now()
+            export.save(update_fields=["status", "heartbeat_at"])
+    return export
+
+
+def parse_range(header, size):
+    """
+    (first, last) byte positions asked by a Range header, or None for the whole
+    file: no header, several ranges or syntax not understood (which RFC 9110
+    allows to ignore). Raises RangeNotSatisfiable for ranges past the end.
+    """
+    match = RANGE_RE.match(header.replace(" ", "")) if header else None
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+
+    if not first:
+        # The last `last` bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable()
+    return first, min(int(last), size - 1) if last else size - 1
+
+
+def read_range(file, first, length):
+    """Chunks of `length` bytes of a file from position `first`, then closes it."""
+    with file:
+        file.seek(first)
+        while length > 0:
+            data = file.read(min(BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
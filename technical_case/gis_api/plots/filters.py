@@ -0,0 +1,117 @@
+import math
+
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry, Point, Polygon
+from django.db.models import F, Value
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .functions import GeodesicDWithin
+from .models import SIMPLIFY_TOLERANCES
+
+# Shortest length of a degree of latitude / longitude at the equator, in metres
+METRES_PER_LATITUDE_DEGREE = 110_574
+METRES_PER_LONGITUDE_DEGREE = 111_320
+
+
+def parse_floats(param, value, count):
+    try:
+        numbers = [float(number) for number in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(map(math.isfinite, numbers)):
+        raise ValidationError({param: [f"Expected {count} comma separated numbers."]})
+    return numbers
+
+
+def parse_simplify_level(value):
+    """Level of detail asked with ?simplify=, 0 meaning the original geometry."""
+    if value is None:
+        return 0
+    if value not in {str(level) for level in [0, *SIMPLIFY_TOLERANCES]}:
+        raise ValidationError(
+            {
+                "simplify": [
+                    f"Expected a level between 0 and {max(SIMPLIFY_TOLERANCES)}."
+                ]
+            }
+        )
+    return int(value)
+
+
+def parse_precision(value, default):
+    """Number of decimals of output coordinates asked with ?precision=."""
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) > 15:
+        raise ValidationError(
+            {"precision": ["Expected a number of decimals up to 15."]}
+        )
+    return int(value)
+
+
+def degrees_covering(metres, latitude):
+    """
+    Planar distance in degrees that is guaranteed to cover `metres` on the
+    ground around `latitude`. Used as an index-friendly prefilter.
+    """
+    latitude_degrees = metres / METRES_PER_LATITUDE_DEGREE
+    farthest_latitude = min(abs(latitude) + latitude_degrees, 89.9)
+    longitude_degrees = metres / (
+        METRES_PER_LONGITUDE_DEGREE * math.cos(math.radians(farthest_latitude))
+    )
+    return max(latitude_degrees, longitude_degrees) * 1.01
+
+
+def spatial_filter(queryset, params):
+    """
+    Apply the bbox / intersects / dwithin query parameters to a Plots queryset.
+
+    Every filter is an index-assisted predicate on plot_geometry
+    (&& / ST_Intersects / ST_DWithin), evaluated by PostGIS.
+    """
+    if "bbox" in params:
+        xmin, ymin, xmax, ymax = parse_floats("bbox", params["bbox"], 4)
+        if xmin > xmax or ymin > ymax:
+            raise ValidationError({"bbox": ["Expected xmin,ymin,xmax,ymax."]})
+        bbox = Polygon.from_bbox((xmin, ymin, xmax, ymax))
+        bbox.srid = 4326
+        queryset = queryset.filter(plot_geometry__intersects=bbox)
+
+    if "intersects" in params:
+        try:
+            geometry = GEOSGeometry(params["intersects"])
+        # GeoJSON is read by OGR, raising GDALException when malformed
+        except (GDALException, GEOSException, ValueError):
+            raise ValidationError({"intersects": ["Invalid GeoJSON or WKT geometry."]})
+        geometry.srid = geometry.srid or 4326
+        queryset = queryset.filter(plot_geometry__intersects=geometry)
+
+    if "dwithin" in params:
+        lon, lat, metres = parse_floats("dwithin", params["dwithin"], 3)
+        if not (-180 <= lon <= 180 and -90 <= lat <= 90) or metres < 0:
+            raise ValidationError({"dwithin": ["Expected lon,lat,metres."]})
+        point = Point(lon, lat, srid=4326)
+        queryset = queryset.filter(
+            plot_geometry__dwithin=(point, degrees_covering(metres, lat))
+        ).filter(
+            GeodesicDWithin(
+                F("plot_geometry"),
+                Value(point, output_field=GeometryField(srid=4326)),
+                metres,
+            )
+        )
+
+    return queryset
+
+
+class PlotsSpatialFilter(BaseFilterBackend):
+    """
+    Filters plot listings with ?bbox=xmin,ymin,xmax,ymax,
+    ?intersects=<GeoJSON or WKT geometry> and ?dwithin=lon,lat,metres.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return spatial_filter(queryset, request.query_params)
@@ -0,0 +1,73 @@
+from django.contrib.gis.db.models import GeographyField
+from django.db import connections
+from django.db.models import BinaryField, BooleanField, F, FloatField, Func, TextField
+from django.db.models.functions import Cast
+
+
+class GeodesicArea(Func):
+    """
+    Area of a SRID 4326 geometry on the spheroid, in square metres
+    (PostGIS ST_Area on the geography cast).
+    """
+
+    function = "ST_Area"
+    template = "%(function)s(%(expressions)s::geography)"
+    output_field = FloatField()
+
+
+class GeodesicDWithin(Func):
+    """
+    True when two SRID 4326 geometries are within `distance` metres of each
+    other on the spheroid (PostGIS ST_DWithin on the geography casts).
+
+    The geography cast cannot use the geometry GiST index: combine it with a
+    coarser index-assisted predicate.
+    """
+
+    function = "ST_DWithin"
+    output_field = BooleanField()
+
+    def __init__(self, geometry, other, distance, **extra):
+        super().__init__(
+            Cast(geometry, GeographyField()),
+            Cast(other, GeographyField()),
+            distance,
+            **extra,
+        )
+
+
+class AsTWKB(Func):
+    """
+    Tiny WKB encoding of a geometry (PostGIS ST_AsTWKB): coordinates are
+    quantized to `precision` decimals and delta-encoded as varints.
+    """
+
+    function = "ST_AsTWKB"
+    output_field = BinaryField()
+
+    def __init__(self, geometry, precision, **extra):
+        super().__init__(geometry, precision, **extra)
+
+
+class AsHexWKB(Func):
+    """WKB encoding of a geometry as an hexadecimal string, built by PostgreSQL."""
+
+    function = "ST_AsBinary"
+    template = "encode(%(function)s(%(expressions)s), 'hex')"
+    output_field = TextField()
+
+
+def as_flatgeobuf(queryset, geometry_field):
+    """
+    FlatGeobuf file of the plots of a queryset, built by PostGIS
+    (ST_AsFlatGeobuf) in a single query.
+    """
+    rows = queryset.annotate(geom=F(geometry_field)).values(
+        "id", "plot_name", "plot_area", "geom"
+    )
+    sql, params = rows.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f"SELECT ST_AsFlatGeobuf(plots, true, 'geom') FROM ({sql}) AS plots", params
+        )
+        return bytes(cursor.fetchone()[0] or b"")
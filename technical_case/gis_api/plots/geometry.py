@@ -0,0 +1,179 @@
+"""
+Parsing and validation of the plot geometries received by the API.
+
+A geometry may be sent as:
+    - a GeoJSON Polygon, as an object or as text
+    - WKT or EWKT: "POLYGON ((0 0, 1 0, 1 1, 0 0))"
+    - hexadecimal or base64 (E)WKB
+    - a bare ring list, the historical input format: "(0 0, 1 0, 1 1, 0 0)"
+
+The format is detected from the value itself, which is then parsed once: by
+GEOS for text and binary formats, straight from the coordinate lists for
+GeoJSON.
+"""
+import base64
+import binascii
+import json
+import re
+import string
+
+from django.conf import settings
+from django.contrib.gis.geos import (
+    GEOSException,
+    GEOSGeometry,
+    GeometryCollection,
+    LinearRing,
+    Polygon,
+)
+
+from . import metrics
+
+HEX_DIGITS = frozenset(string.hexdigits)
+BASE64_PATTERN = re.compile(r"^[A-Za-z0-9+/\s]+={0,2}$")
+
+
+class GeometryError(ValueError):
+    """Raised with a message telling what is wrong with an input geometry."""
+
+
+def detect_format(value):
+    """Return "geojson", "wkt", "ring", "hexwkb" or "base64wkb"."""
+    if isinstance(value, dict):
+        return "geojson"
+    if not isinstance(value, str):
+        raise GeometryError("Expected a GeoJSON object or a string.")
+
+    value = value.strip()
+    if value.startswith("{"):
+        return "geojson"
+    if value.startswith("("):
+        return "ring"
+    if value and len(value) % 2 == 0 and set(value) <= HEX_DIGITS:
+        return "hexwkb"
+    # Unlike the binary encodings, (E)WKT always has parentheses
+    if "(" in value:
+        return "wkt"
+    if BASE64_PATTERN.match(value):
+        return "base64wkb"
+    raise GeometryError("Unrecognized geometry format.")
+
+
+def polygon_from_geojson(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as e:
+            raise GeometryError(f"Invalid GeoJSON: {e}.")
+
+    if not isinstance(value, dict) or value.get("type") != "Polygon":
+        raise GeometryError("GeoJSON geometry must be a Polygon.")
+
+    rings = value.get("coordinates")
+    if not isinstance(rings, list) or not rings:
+        raise GeometryError("GeoJSON Polygon must have at least one ring.")
+
+    vertex_count = 0
+    for index, ring in enumerate(rings):
+        if not isinstance(ring, list) or len(ring) < 4:
+            raise GeometryError(f"Ring {index} must have at least 4 positions.")
+        if ring[0] != ring[-1]:
+            raise GeometryError(
+                f"Ring {index} is not closed: first and last positions differ."
+            )
+        vertex_count += len(ring)
+    check_vertex_count(vertex_count)
+
+    try:
+        return Polygon(*(LinearRing(ring) for ring in rings), srid=4326)
+    except (GEOSException, TypeError, ValueError, IndexError):
+        raise GeometryError("GeoJSON positions must be [longitude, latitude] pairs.")
+
+
+def geometry_from_text_or_wkb(value, geometry_format):
+    if geometry_format == "ring":
+        value = f"POLYGON ({value})"
+    elif geometry_format == "base64wkb":
+        try:
+            value = memoryview(base64.b64decode(value, validate=False))
+        except binascii.Error:
+            raise GeometryError("Invalid base64 WKB.")
+
+    try:
+        return GEOSGeometry(value)
+    except (GEOSException, ValueError) as e:
+        if "closed" in str(e):
+            raise GeometryError(
+                "Polygon rings must be closed: first and last points differ."
+            )
+        raise GeometryError(f"Invalid {geometry_format.upper()} geometry.")
+
+
+def check_vertex_count(vertex_count):
+    if vertex_count > settings.PLOTS_MAX_VERTICES:
+        raise GeometryError(
+            f"Polygon has {vertex_count} vertices, "
+            f"more than the {settings.PLOTS_MAX_VERTICES} allowed."
+        )
+
+
+def repaired_polygon(geometry):
+    """
+    make_valid the geometry, dropping collapsed (spike) parts. Return None when
+    the result isn't a single Polygon, e.g. a "bow-tie" split in two or a ring
+    of collinear points collapsed into a LineString.
+    """
+    geometry = geometry.make_valid()
+    if geometry.geom_type == "Polygon":
+        return geometry
+    # Iterating a LineString or a Point yields coordinates, not geometries
+    if not isinstance(geometry, GeometryCollection):
+        return None
+    polygons = [part for part in geometry if part.geom_type == "Polygon"]
+    if len(polygons) == 1:
+        return polygons[0]
+    return None
+
+
+def parse_geometry(value, repair=None):
+    """
+    Parse and validate a plot geometry, returning a SRID 4326 Polygon.
+
+    Invalid (self-intersecting...) polygons are rejected, or repaired when
+    `repair` (default: PLOTS_REPAIR_INVALID_GEOMETRIES) is true and the
+    repaired geometry is still a single Polygon.
+
+    Raises GeometryError.
+    """
+    geometry_format = detect_format(value)
+    if geometry_format == "geojson":
+        geometry = polygon_from_geojson(value)
+    else:
+        geometry = geometry_from_text_or_wkb(value, geometry_format)
+        if geometry.geom_type != "Polygon":
+            raise GeometryError(
+                f"Geometry must be a Polygon, not a {geometry.geom_type}."
+            )
+        check_vertex_count(geometry.num_points)
+
+    if geometry.srid not in (None, 4326):
+        raise GeometryError(f"Geometry SRID must be 4326, not {geometry.srid}.")
+    geometry.srid = 4326
+
+    if geometry.empty:
+        raise GeometryError("Polygon is empty.")
+
+    if not geometry.valid:
+        if repair is None:
+            repair = settings.PLOTS_REPAIR_INVALID_GEOMETRIES
+        reason = geometry.valid_reason
+        if not repair:
+            raise GeometryError(f"Invalid polygon: {reason}.")
+        geometry = repaired_polygon(geometry)
+        if geometry is None:
+            raise GeometryError(
+                f"Invalid polygon ({reason}) that can't be repaired into a single Polygon."
+            )
+        geometry.srid = 4326
+
+    metrics.add_vertices(geometry.num_points)
+    return geometry
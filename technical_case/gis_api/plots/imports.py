@@ -0,0 +1,461 @@
+"""
+Import of plot files (GeoPackage, zipped Shapefile or GeoJSON) through a
+staging table, for the /plots/imports/ endpoint (run by the
+process_plot_imports worker) and the import_plots command.
+
+Only these formats are opened: other GDAL formats (VRT...) may reference
+files of the server or remote URLs, whose content would be imported. Files
+are checked by extension and content before GDAL opens them, and by the
+driver that opened them.
+
+run() imports the first layer of a file in three steps:
+    1. features are read one at a time with GDAL and written, as WKB in the
+       coordinates of the file, to a temporary staging table with COPY,
+       PLOTS_IMPORT_CHUNK_SIZE rows per COPY statement
+    2. set-based UPDATEs of the staging table reproject the geometries to SRID
+       4326, repair them (PLOTS_REPAIR_INVALID_GEOMETRIES) and validate them
+       with the rules of the API (plots.geometry)
+    3. valid rows are inserted into Plots with their derived fields by
+       INSERT ... SELECT, PLOTS_IMPORT_CHUNK_SIZE rows per transaction, each
+       chunk reported through plots_modified
+
+The PlotImport row tells the progress of every step. With the "reject"
+PLOTS_OVERLAP_POLICY, the staged features of each chunk overlapping existing
+plots, or earlier features of the file, are rejected before the chunk is
+merged, under the per-owner lock of plots.changes. Overlaps are not reported
+under the "flag" policy: /plots/conflicts/ lists them.
+
+Imports whose worker stopped are taken back by claim_next() (see plots.jobs):
+queued again while copying, as nothing was imported yet, failed while
+merging, as chunks may have been.
+"""
+import logging
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.gis.gdal import DataSource, GDALException
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .bulk import iter_chunks
+from .changes import lock_owners
+from .jobs import heartbeat, lease_expiry
+from .models import SIMPLIFY_TOLERANCES, PlotImport, Plots, geometry_field_name
+from .signals import PlotChange, plots_modified
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "plots_import_staging"
+
+# Rejected features reported in PlotImport.errors
+MAX_REPORTED_ERRORS = 100
+
+# Accepted files: extension -> GDAL driver, and first bytes of the file (after
+# white space for GeoJSON)
+FILE_TYPES = {
+    ".gpkg": ("GPKG", b"SQLite format 3\x00"),
+    ".zip": ("ESRI Shapefile", b"PK\x03\x04"),
+    ".geojson": ("GeoJSON", b"{"),
+    ".json": ("GeoJSON", b"{"),
+}
+
+# Files a zipped Shapefile may hold
+SHAPEFILE_EXTENSIONS = {".shp", ".shx", ".dbf", ".prj", ".cpg", ".qix"}
+
+
+class PlotImportError(Exception):
+    """The file can't be imported at all."""
+
+
+def errors_case():
+    """SQL CASE expression of the errors of a staged row, as JSON, or NULL."""
+    checks = [
+        (
+            "plot_name",
+            "plot_name IS NULL OR plot_name = ''",
+            "'This field is required.'",
+        ),
+        (
+            "plot_name",
+            "length(plot_name) > 255",
+            "'Ensure this field has no more than 255 characters.'",
+        ),
+        ("plot_geometry", "geometry IS NULL", "'This field is required.'"),
+        (
+            "plot_geometry",
+            "GeometryType(geometry) <> 'POLYGON'",
+            "'Geometry must be a Polygon, not a ' "
+            "|| substring(ST_GeometryType(geometry) from 4) || '.'",
+        ),
+        ("plot_geometry", "ST_IsEmpty(geometry)", "'Polygon is empty.'"),
+        (
+            "plot_geometry",
+            f"ST_NPoints(geometry) > {settings.PLOTS_MAX_VERTICES}",
+            "'Polygon has ' || ST_NPoints(geometry) || ' vertices, more than the "
+            f"{settings.PLOTS_MAX_VERTICES} allowed.'",
+        ),
+        (
+            "plot_geometry",
+            "NOT ST_IsValid(geometry)",
+            "'Invalid polygon: ' || ST_IsValidReason(geometry) || '.'"
+            if not settings.PLOTS_REPAIR_INVALID_GEOMETRIES
+            else "'Invalid polygon (' || ST_IsValidReason(geometry) "
+            "|| ') that can''t be repaired into a single Polygon.'",
+        ),
+    ]
+    cases = " ".join(
+        f"WHEN {condition} THEN "
+        f"jsonb_build_object('{field}', jsonb_build_array({message}))"
+        for field, condition, message in checks
+    )
+    return f"CASE {cases} END"
+
+
+def file_type(name):
+    """(GDAL driver, first bytes) of an accepted file name, or PlotImportError."""
+    extension = Path(name).suffix.lower()
+    if extension not in FILE_TYPES:
+        raise PlotImportError(
+            f"Unsupported file type {extension or '(none)'}: expected "
+            f"{', '.join(FILE_TYPES)}."
+        )
+    return FILE_TYPES[extension]
+
+
+def check_file(path):
+    """The GDAL driver expected to read the file, or PlotImportError."""
+    driver, magic = file_type(path)
+    with open(path, "rb") as file:
+        start = file.read(1024)
+    if driver == "GeoJSON":
+        start = start.removeprefix(b"\xef\xbb\xbf").lstrip()
+    if not start.startswith(magic):
+        raise PlotImportError(f"Not a {driver} file.")
+
+    if driver == "ESRI Shapefile":
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = [name for name in archive.namelist() if not name.endswith("/")]
+        except zipfile.BadZipFile as e:
+            raise PlotImportError(f"Unreadable file: {e}")
+        extensions = {Path(name).suffix.lower() for name in names}
+        if ".shp" not in extensions or not extensions <= SHAPEFILE_EXTENSIONS:
+            raise PlotImportError(
+                "Zip archives must hold a Shapefile (.shp, .shx, .dbf, .prj...) "
+                "and nothing else."
+            )
+    return driver
+
+
+def open_layer(path):
+    """First layer of a vector file (.zip archives are read without extracting)."""
+    driver = check_file(path)
+    if driver == "ESRI Shapefile":
+        path = f"/vsizip/{path}"
+    try:
+        data_source = DataSource(str(path))
+        if data_source.driver.name != driver:
+            raise PlotImportError(f"Not a {driver} file.")
+        return data_source[0]
+    except (GDALException, IndexError) as e:
+        raise PlotImportError(f"Unreadable file: {e}")
+
+
+def reprojection(layer, srid):
+    """
+    SQL expression (and its params) giving the staged geometry in SRID 4326,
+    from `srid`, or else from the coordinate system of the layer.
+    """
+    if srid is None and layer.srs is not None:
+        srid = layer.srs.srid
+        if srid is None:
+            # Not an EPSG coordinate system: PROJ reprojects from its definition
+            return "ST_Transform(geometry, %s, 4326)", [layer.srs.proj]
+    if srid is None:
+        raise PlotImportError(
+            "The file doesn't tell its coordinate system: give its EPSG code (srid)."
+        )
+    if srid == 4326:
+        return "ST_SetSRID(geometry, 4326)", []
+    return "ST_Transform(ST_SetSRID(geometry, %s), 4326)", [srid]
+
+
+def copy_text(value):
+    """A value in the COPY text format."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def staged_rows(layer, name_field):
+    """COPY text lines (index, plot_name, WKB geometry) of the layer features."""
+    for index, feature in enumerate(layer):
+        try:
+            geometry = feature.geom.hex.decode()
+        except GDALException:
+            # Feature without geometry
+            geometry = None
+        yield (
+            f"{index}\t{copy_text(feature.get(name_field))}\t{copy_text(geometry)}\n"
+        ).encode()
+
+
+class CopyStream:
+    """Read-only file object over an iterator of lines, for cursor.copy_expert()."""
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.buffer = bytearray()
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+def save_progress(plot_import, progress, *fields):
+    plot_import.save(update_fields=list(fields))
+    if progress is not None:
+        progress(plot_import)
+
+
+def copy_features(cursor, plot_import, layer, progress):
+    """Step 1: COPY the features to the staging table."""
+    cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {STAGING_TABLE} (feature_index integer PRIMARY KEY, "
+        "plot_name text, geometry geometry, errors jsonb)"
+    )
+
+    lines = staged_rows(layer, plot_import.name_field)
+    for chunk in iter_chunks(lines, settings.PLOTS_IMPORT_CHUNK_SIZE):
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (feature_index, plot_name, geometry) FROM STDIN",
+            CopyStream(chunk),
+        )
+        plot_import.features_read += len(chunk)
+        save_progress(plot_import, progress, "features_read")
+
+
+def validate_features(cursor, layer, srid):
+    """Step 2: reproject, repair and validate the staged geometries."""
+    expression, params = reprojection(layer, srid)
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} SET geometry = ST_Force2D({expression}) "
+        "WHERE geometry IS NOT NULL",
+        params,
+    )
+    # Single part multipolygons, as most formats store every polygon as one
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} SET geometry = ST_GeometryN(geometry, 1) "
+        "WHERE GeometryType(geometry) = 'MULTIPOLYGON' "
+        "AND ST_NumGeometries(geometry) = 1"
+    )
+    if settings.PLOTS_REPAIR_INVALID_GEOMETRIES:
+        # Only repairs giving a single Polygon, collapsed parts dropped
+        cursor.execute(
+            f"UPDATE {STAGING_TABLE} SET geometry = ST_GeometryN(repaired, 1) "
+            "FROM (SELECT feature_index, ST_CollectionExtract(ST_MakeValid(geometry), 3) "
+            f"AS repaired FROM {STAGING_TABLE} WHERE GeometryType(geometry) = 'POLYGON' "
+            "AND NOT ST_IsValid(geometry)) AS repair "
+            f"WHERE {STAGING_TABLE}.feature_index = repair.feature_index "
+            "AND ST_NumGeometries(repaired) = 1"
+        )
+    cursor.execute(f"UPDATE {STAGING_TABLE} SET errors = {errors_case()}")
+
+
+def reject_overlaps(cursor, plot_import, start, end):
+    """Reject the valid staged rows of a chunk overlapping other plots."""
+    lock_owners([plot_import.owner_id], cursor.db.alias)
+    overlap = (
+        "ST_Intersects({0}, feature.geometry) AND "
+        "ST_Area(ST_Intersection({0}, feature.geometry)::geography) > %s"
+    )
+    cursor.execute(
+        f"UPDATE {STAGING_TABLE} AS feature SET errors = jsonb_build_object("
+        "'plot_geometry', jsonb_build_array(%s::text)) "
+        "WHERE feature.errors IS NULL "
+        "AND feature.feature_index >= %s AND feature.feature_index < %s AND ("
+        f"EXISTS (SELECT 1 FROM {Plots._meta.db_table} AS plot "
+        f"WHERE {overlap.format('plot.plot_geometry')}) "
+        f"OR EXISTS (SELECT 1 FROM {STAGING_TABLE} AS earlier "
+        "WHERE earlier.errors IS NULL AND earlier.feature_index >= %s "
+        "AND earlier.feature_index < feature.feature_index "
+        f"AND {overlap.format('earlier.geometry')})) "
+        "RETURNING feature_index, errors",
+        [
+            "Overlaps existing plots or earlier features of the file.",
+            start,
+            end,
+            settings.PLOTS_OVERLAP_MIN_AREA,
+            start,
+            settings.PLOTS_OVERLAP_MIN_AREA,
+        ],
+    )
+    rejected = sorted(cursor.fetchall())
+    plot_import.plots_rejected += len(rejected)
+    plot_import.errors += [
+        {"index": index, "errors": errors}
+        for index, errors in rejected[
+            : max(MAX_REPORTED_ERRORS - len(plot_import.errors), 0)
+        ]
+    ]
+
+
+def merge_plots(cursor, plot_import, progress):
+    """Step 3: insert the valid staged rows into Plots, chunk by chunk."""
+    simplified_fields = ", ".join(
+        geometry_field_name(level) for level in SIMPLIFY_TOLERANCES
+    )
+    simplified = ", ".join(
+        "ST_SimplifyPreserveTopology(geometry, %s)" for _ in SIMPLIFY_TOLERANCES
+    )
+    if settings.PLOTS_OVERLAP_POLICY == "reject":
+        cursor.execute(f"CREATE INDEX ON {STAGING_TABLE} USING gist (geometry)")
+    for start in range(0, plot_import.features_read, settings.PLOTS_IMPORT_CHUNK_SIZE):
+        end = start + settings.PLOTS_IMPORT_CHUNK_SIZE
+        with transaction.atomic(using=cursor.db.alias):
+            if settings.PLOTS_OVERLAP_POLICY == "reject":
+                reject_overlaps(cursor, plot_import, start, end)
+            cursor.execute(
+                f"INSERT INTO {Plots._meta.db_table} (plot_name, plot_owner_id, "
+                f"plot_geometry, plot_area, {simplified_fields}) "
+                f"SELECT plot_name, %s, geometry, ST_Area(geometry::geography), "
+                f"{simplified} FROM {STAGING_TABLE} "
+                "WHERE errors IS NULL AND feature_index >= %s AND feature_index < %s "
+                "ORDER BY feature_index "
+                "RETURNING id, ST_XMin(plot_geometry), ST_YMin(plot_geometry), "
+                "ST_XMax(plot_geometry), ST_YMax(plot_geometry), plot_area",
+                [
+                    plot_import.owner_id,
+                    *SIMPLIFY_TOLERANCES.values(),
+                    start,
+                    end,
+                ],
+            )
+            rows = cursor.fetchall()
+            plots_modified.send(
+                sender=Plots,
+                changes=[
+                    PlotChange(
+                        "created", id, plot_import.owner_id, tuple(extent), area=area
+                    )
+                    for id, *extent, area in rows
+                ],
+            )
+        plot_import.plots_created += len(rows)
+        save_progress(
+            plot_import, progress, "plots_created", "plots_rejected", "errors"
+        )
+
+
+def run(plot_import, path, progress=None):
+    """
+    Import the plots of the file at `path` for plot_import.owner, recording
+    the progress in plot_import and calling progress(plot_import) after every
+    chunk. Failed imports are marked "failed" with their reason in errors.
+    """
+    using = router.db_for_write(Plots)
+    plot_import.started_at = plot_import.heartbeat_at = timezone.now()
+    plot_import.status = "copying"
+    save_progress(plot_import, progress, "started_at", "heartbeat_at", "status")
+
+    try:
+        with heartbeat(PlotImport.objects.filter(pk=plot_import.pk)):
+            layer = open_layer(path)
+            if plot_import.name_field not in layer.fields:
+                raise PlotImportError(
+                    f'No "{plot_import.name_field}" field in the file '
+                    f"(fields: {', '.join(layer.fields)})."
+                )
+            plot_import.features_total = len(layer)
+            save_progress(plot_import, progress, "features_total")
+
+            with connections[using].cursor() as cursor:
+                copy_features(cursor, plot_import, layer, progress)
+                validate_features(cursor, layer, plot_import.srid)
+
+                plot_import.status = "merging"
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {STAGING_TABLE} WHERE errors IS NOT NULL"
+                )
+                plot_import.plots_rejected = cursor.fetchone()[0]
+                cursor.execute(
+                    f"SELECT feature_index, errors FROM {STAGING_TABLE} WHERE errors IS NOT NULL "
+                    "ORDER BY feature_index LIMIT %s",
+                    [MAX_REPORTED_ERRORS],
+                )
+                plot_import.errors = [
+                    {"index": index, "errors": errors}
+                    for index, errors in cursor.fetchall()
+                ]
+                save_progress(
+                    plot_import, progress, "status", "plots_rejected", "errors"
+                )
+
+                merge_plots(cursor, plot_import, progress)
+                cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+    except Exception as e:
+        if not isinstance(e, PlotImportError):
+            logger.exception("Import %s of %s failed", plot_import.pk, path)
+        # Chunks merged before a failure stay imported, see plots_created
+        plot_import.status = "failed"
+        plot_import.errors = [{"detail": str(e)}]
+    else:
+        plot_import.status = "done"
+
+    plot_import.finished_at = timezone.now()
+    save_progress(plot_import, progress, "status", "errors", "finished_at")
+    return plot_import
+
+
+def take_back_stale():
+    """Queue again or fail the imports whose worker stopped."""
+    stale = PlotImport.objects.filter(heartbeat_at__lt=lease_expiry())
+    stale.filter(status="copying").update(
+        status="pending", features_read=0, heartbeat_at=None
+    )
+    stale.filter(status="merging").update(
+        status="failed",
+        errors=[
+            {
+                "detail": "The worker running the import stopped, after "
+                "importing the plots counted in plots_created."
+            }
+        ],
+        finished_at=timezone.now(),
+    )
+
+
+def claim_next():
+    """
+    Mark the oldest pending import as started and return it, or None, after
+    taking back the imports of stopped workers.
+    """
+    take_back_stale()
+    with transaction.atomic():
+        plot_import = (
+            PlotImport.objects.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("id")
+            .first()
+        )
+        if plot_import is not None:
+            plot_import.status = "copying"
+            plot_import.heartbeat_at = timezone.now()
+            plot_import.save(update_fields=["status", "heartbeat_at"])
+    return plot_import
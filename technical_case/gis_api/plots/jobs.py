@@ -0,0 +1,49 @@
+"""
+Leases of the background jobs run by workers (plots.imports, plots.exports).
+
+While a worker runs a job, a thread sets its heartbeat_at every
+PLOTS_JOB_HEARTBEAT_SECONDS (heartbeat()), whatever the job is busy with: a
+long SQL statement or file write doesn't stop it. Jobs whose heartbeat is
+older than PLOTS_JOB_LEASE_SECONDS lost their worker (killed, restarted, out
+of memory...) and are taken back by the next worker claiming a job.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def lease_expiry():
+    """Jobs whose heartbeat is older than this lost their worker."""
+    return timezone.now() - timedelta(seconds=settings.PLOTS_JOB_LEASE_SECONDS)
+
+
+@contextmanager
+def heartbeat(queryset):
+    """Set heartbeat_at of the job of `queryset` while the block runs."""
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(settings.PLOTS_JOB_HEARTBEAT_SECONDS):
+                try:
+                    queryset.update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    logger.exception("Heartbeat of %s failed", queryset.model)
+        finally:
+            # Connections of this thread
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
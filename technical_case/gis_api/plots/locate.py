@@ -0,0 +1,231 @@
+"""
+Point in plot lookups: which plots contain each point of a batch of
+(longitude, latitude) points, for /plots/locate/ and for Python callers:
+
+    from plots.locate import locate
+    locate([(2.35, 48.85), (-1.55, 47.21)], owner="user1")  # [[12], []]
+
+Points on a plot boundary are in the plot, as with PostGIS ST_Intersects.
+
+Lookups restricted to an owner are answered from an in-memory index of
+their plots once the owner is looked up again: an STRtree of their prepared
+geometries, loaded from Plots and kept for the PLOTS_LOCATE_CACHED_OWNERS
+most recently used owners of each process. Indexes record the owner's cache
+version token (plots.caching) they were loaded at: plot writes replace it in
+the cache shared by every process, so an index is reloaded after a write
+wherever it is held, and hot lookups only read the token, never the database.
+Indexes are also reloaded once older than PLOTS_LOCATE_INDEX_MAX_AGE seconds,
+which bounds their staleness should a write not reach the shared cache (a
+process using a local cache, a cache outage...).
+
+The first lookup of an owner, lookups across every owner, and owners having
+more than PLOTS_LOCATE_MAX_INDEXED_PLOTS plots, are answered by PostGIS.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsWKB
+from django.db import connections, router, transaction
+
+from rest_framework.exceptions import ValidationError
+
+from . import caching
+from .models import Plots
+
+LOCATE_SQL = """
+    SELECT point.index - 1, plot.id
+    FROM unnest(%s::float8[], %s::float8[]) WITH ORDINALITY AS point(lon, lat, index)
+    JOIN plots_plots AS plot
+        ON ST_Intersects(
+            plot.plot_geometry, ST_SetSRID(ST_MakePoint(point.lon, point.lat), 4326)
+        )
+    {owner_filter}
+    ORDER BY point.index, plot.id
+"""
+
+
+class OwnerIndex:
+    """
+    STRtree of the prepared geometries of the plots of one owner, or nothing
+    (tree is None) for owners with too many plots to be indexed.
+    """
+
+    def __init__(self, version, ids=None, geometries=None):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.tree = None
+        if ids is not None:
+            self.ids = np.asarray(ids, dtype=np.int64)
+            self.geometries = np.asarray(geometries, dtype=object)
+            shapely.prepare(self.geometries)
+            self.tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def load(cls, owner):
+        # Read before the plots: a write while loading makes the index stale
+        version = caching.owner_version(owner)
+        plots = Plots.objects.filter(plot_owner=owner)
+        if plots.count() > settings.PLOTS_LOCATE_MAX_INDEXED_PLOTS:
+            return cls(version)
+        rows = list(plots.annotate(wkb=AsWKB("plot_geometry")).values_list("id", "wkb"))
+        ids = [id for id, _ in rows]
+        geometries = shapely.from_wkb([bytes(wkb) for _, wkb in rows])
+        return cls(version, ids, geometries)
+
+    def locate(self, points):
+        """Ids of the plots containing each point of a (n, 2) array."""
+        point_indices, plot_indices = self.tree.query(shapely.points(points))
+        # Bounding box candidates, checked against the prepared geometries
+        hits = shapely.intersects_xy(
+            self.geometries[plot_indices],
+            points[point_indices, 0],
+            points[point_indices, 1],
+        )
+        point_indices, plot_ids = point_indices[hits], self.ids[plot_indices[hits]]
+        order = np.lexsort((plot_ids, point_indices))
+        return group(len(points), point_indices[order], plot_ids[order])
+
+
+class IndexCache:
+    """Per-process LRU cache of owner indexes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # owner -> OwnerIndex, or None once looked up without an index
+        self.indexes = OrderedDict()
+
+    def get(self, owner):
+        """
+        Fresh index of `owner`, loading it when they were looked up before.
+        None when the lookup must be answered by PostGIS.
+        """
+        with self.lock:
+            seen = owner in self.indexes
+            index = self.indexes.get(owner)
+            if seen:
+                self.indexes.move_to_end(owner)
+
+        if (
+            index is None
+            or index.version != caching.owner_version(owner)
+            or time.monotonic() - index.loaded_at > settings.PLOTS_LOCATE_INDEX_MAX_AGE
+        ):
+            if not seen:
+                self.set(owner, None)
+                return None
+            index = OwnerIndex.load(owner)
+            self.set(owner, index)
+        return index if index.tree is not None else None
+
+    def set(self, owner, index):
+        with self.lock:
+            self.indexes[owner] = index
+            self.indexes.move_to_end(owner)
+            while len(self.indexes) > settings.PLOTS_LOCATE_CACHED_OWNERS:
+                self.indexes.popitem(last=False)
+
+    def invalidate(self, owners):
+        """
+        Free the indexes of owners whose plots changed, now and once the
+        current transaction commits (a concurrent lookup may load them in between).
+        """
+
+        def drop():
+            with self.lock:
+                for owner in owners:
+                    if self.indexes.get(owner) is not None:
+                        # Still looked up before: reloaded on the next lookup
+                        self.indexes[owner] = None
+
+        drop()
+        transaction.on_commit(drop)
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+
+
+indexes = IndexCache()
+
+
+def parse_points(data):
+    """
+    (n, 2) array of the points of a request: {"points": [[lon, lat], ...]} or
+    the array of BinaryPointsParser.
+    """
+    if not isinstance(data, np.ndarray):
+        if not isinstance(data, dict) or "points" not in data:
+            raise ValidationError({"points": ["This field is required."]})
+        try:
+            points = np.asarray(data["points"], dtype=np.float64)
+        except (TypeError, ValueError):
+            points = None
+        if points is not None and not points.size:
+            points = points.reshape(0, 2)
+        if points is None or points.ndim != 2 or points.shape[1] != 2:
+            raise ValidationError(
+                {"points": ["Expected a list of [longitude, latitude] pairs."]}
+            )
+        data = points
+
+    if len(data) > settings.PLOTS_LOCATE_MAX_POINTS:
+        raise ValidationError(
+            {
+                "points": [
+                    f"Ensure there are no more than {settings.PLOTS_LOCATE_MAX_POINTS} "
+                    "points."
+                ]
+            }
+        )
+    if not (
+        np.isfinite(data).all()
+        and (np.abs(data[:, 0]) <= 180).all()
+        and (np.abs(data[:, 1]) <= 90).all()
+    ):
+        raise ValidationError(
+            {"points": ["Expected longitudes and latitudes in degrees (SRID 4326)."]}
+        )
+    return data
+
+
+def group(count, point_indices, plot_ids):
+    """Lists of plot ids per point, from (point index, plot id) pairs."""
+    results = [[] for _ in range(count)]
+    for point_index, plot_id in zip(
+        np.asarray(point_indices).tolist(), np.asarray(plot_ids).tolist()
+    ):
+        results[point_index].append(plot_id)
+    return results
+
+
+def locate_in_database(points, owner=None):
+    """Ids of the plots containing each point, queried from PostGIS."""
+    params = [points[:, 0].tolist(), points[:, 1].tolist()]
+    owner_filter = ""
+    if owner is not None:
+        owner_filter = "WHERE plot.plot_owner_id = %s"
+        params.append(owner)
+
+    with connections[router.db_for_read(Plots)].cursor() as cursor:
+        cursor.execute(LOCATE_SQL.format(owner_filter=owner_filter), params)
+        rows = cursor.fetchall()
+    return group(len(points), [row[0] for row in rows], [row[1] for row in rows])
+
+
+def locate(points, owner=None):
+    """
+    Ids of the plots (of `owner`, or of anyone) containing each point of a
+    sequence of (longitude, latitude) pairs, as a list of lists.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if not len(points):
+        return []
+
+    index = indexes.get(owner) if owner is not None else None
+    if index is not None:
+        return index.locate(points)
+    return locate_in_database(points, owner)
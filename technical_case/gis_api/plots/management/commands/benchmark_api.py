@@ -0,0 +1,192 @@
+import json
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from plots.benchmarks import SCENARIOS, request_body, summarize, tile_of
+from plots import exports
+from plots.models import PlotExport, PlotImport, PlotOwnerStats, Plots
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint in process against the data seeded by "
+        "generate_plots. Prints JSON: requests per second, p50/p95/p99 latency, "
+        "SQL queries and response size of each scenario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Per scenario")
+        parser.add_argument("--prefix", default="bench")
+        parser.add_argument("--password", default="bench_password")
+        parser.add_argument(
+            "--scenarios",
+            nargs="+",
+            help="Names of the scenarios to run (default: all)",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument(
+            "--compare",
+            help="Previous JSON report: adds the ratios of throughput and p99 latency",
+        )
+
+    def handle(self, *args, **options):
+        context = self.get_context(options["prefix"], options["password"])
+        scenarios = [
+            scenario
+            for scenario in SCENARIOS
+            if not options["scenarios"] or scenario.name in options["scenarios"]
+        ]
+
+        client = Client()
+        # Uploaded files (imports) and exported files are not kept
+        media_root = tempfile.TemporaryDirectory()
+        with media_root, override_settings(MEDIA_ROOT=media_root.name):
+            export = exports.run(
+                PlotExport.objects.create(owner_id=context["owner"], format="fgb")
+            )
+            context["export_id"] = export.id
+            results = [
+                self.run(client, scenario, context, options["requests"])
+                for scenario in scenarios
+            ]
+            export.delete()
+
+        report = {
+            "commit": self.get_commit(),
+            "dataset": {
+                "users": PlotOwnerStats.objects.count(),
+                "plots": Plots.objects.count(),
+                "owner": context["owner"],
+                "owner_plots": context["owner_plots"],
+            },
+            "requests": options["requests"],
+            "scenarios": results,
+        }
+        if options["compare"]:
+            with open(options["compare"]) as baseline:
+                report["comparison"] = self.compare(json.load(baseline), report)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_context(self, prefix, password):
+        """Owner, plot, tiles... the scenario requests are about."""
+        plot = (
+            Plots.objects.filter(plot_owner__startswith=prefix)
+            .order_by("plot_owner", "id")
+            .first()
+        )
+        if plot is None:
+            raise CommandError(f"No {prefix}* plots, run generate_plots first.")
+
+        owner = User.objects.get(username=plot.plot_owner_id)
+        center = plot.plot_geometry.centroid.coords
+        tile_x, tile_y = tile_of(*center, 12)
+        uncached_zoom = settings.PLOTS_TILE_MAX_CACHED_ZOOM + 1
+        uncached_x, uncached_y = tile_of(*center, uncached_zoom)
+        return {
+            "owner": owner.username,
+            "owner_plots": Plots.objects.filter(plot_owner=owner).count(),
+            "password": password,
+            "token": Token.objects.get_or_create(user=owner)[0].key,
+            "plot_id": plot.id,
+            "import_id": (
+                PlotImport.objects.filter(owner=owner).first()
+                or PlotImport.objects.create(owner=owner, status="done")
+            ).id,
+            "center": center,
+            "bbox": "{},{},{},{}".format(*plot.plot_geometry.buffer(0.05).extent),
+            "tile": f"12/{tile_x}/{tile_y}",
+            "uncached_tile": f"{uncached_zoom}/{uncached_x}/{uncached_y}",
+        }
+
+    @staticmethod
+    def get_commit():
+        try:
+            return (
+                subprocess.run(
+                    ["git", "rev-parse", "HEAD"], capture_output=True, text=True
+                ).stdout.strip()
+                or None
+            )
+        except OSError:
+            return None
+
+    def run(self, client, scenario, context, requests):
+        durations, queries, sizes, statuses = [], [], [], Counter()
+        headers = {
+            name: value.format(**context) for name, value in scenario.headers.items()
+        }
+
+        for index in range(requests):
+            path = scenario.path.format(i=index, **context)
+            body = request_body(scenario, context, index)
+            with ExitStack() as stack:
+                if scenario.write:
+                    # Leave the dataset as it was for the next requests / runs
+                    stack.enter_context(transaction.atomic())
+                    transaction.set_rollback(True)
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connections[alias]))
+                    for alias in connections
+                ]
+
+                start = time.perf_counter()
+                response = getattr(client, scenario.method)(path, **body, **headers)
+                content = (
+                    b"".join(response.streaming_content)
+                    if response.streaming
+                    else response.content
+                )
+                durations.append(time.perf_counter() - start)
+
+            queries.append(sum(len(capture) for capture in captured))
+            sizes.append(len(content))
+            statuses[response.status_code] += 1
+
+        return {
+            "name": scenario.name,
+            "url_name": scenario.url_name,
+            "method": scenario.method.upper(),
+            "statuses": dict(statuses),
+            "errors": sum(count for status, count in statuses.items() if status >= 400),
+            "queries": sum(queries) / requests,
+            "max_queries": max(queries),
+            "bytes": sum(sizes) / requests,
+            **summarize(durations),
+        }
+
+    @staticmethod
+    def compare(baseline, report):
+        previous = {scenario["name"]: scenario for scenario in baseline["scenarios"]}
+        return {
+            "baseline_commit": baseline.get("commit"),
+            "scenarios": {
+                scenario["name"]: {
+                    "per_second_ratio": scenario["per_second"]
+                    / previous[scenario["name"]]["per_second"],
+                    "p99_ratio": scenario["p99_ms"]
+                    / previous[scenario["name"]]["p99_ms"],
+                    "queries_delta": scenario["queries"]
+                    - previous[scenario["name"]]["queries"],
+                }
+                for scenario in report["scenarios"]
+                if scenario["name"] in previous
+            },
+        }
@@ -0,0 +1,49 @@
+import base64
+import json
+
+from django.contrib.gis.geos import Polygon
+from django.core.management.base import BaseCommand
+
+from plots.benchmarks import measure, polygon_coords
+from plots.geometry import parse_geometry
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark of plot geometry parsing and validation, for every "
+        "input format, on typical and very large polygons. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--vertices",
+            type=int,
+            nargs="+",
+            default=[16, 10000],
+            help="Polygon sizes to benchmark (default: 16 and 10000 vertices)",
+        )
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        results = []
+        for vertices in options["vertices"]:
+            ring = polygon_coords(0.5, 45.0, 0.01, vertices)
+            polygon = Polygon(ring, srid=4326)
+            inputs = {
+                "geojson_object": {"type": "Polygon", "coordinates": [ring]},
+                "geojson_text": json.dumps({"type": "Polygon", "coordinates": [ring]}),
+                "wkt": polygon.wkt,
+                "ring": polygon.wkt[len("POLYGON ") :],
+                "hexwkb": polygon.hexewkb.decode(),
+                "base64wkb": base64.b64encode(bytes(polygon.ewkb)).decode(),
+            }
+            for geometry_format, value in inputs.items():
+                results.append(
+                    {
+                        "format": geometry_format,
+                        "vertices": vertices,
+                        **measure(lambda: parse_geometry(value), options["repeat"]),
+                    }
+                )
+
+        self.stdout.write(json.dumps(results, indent=2))
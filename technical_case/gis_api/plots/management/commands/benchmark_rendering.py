@@ -0,0 +1,82 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from plots import compression
+from plots.benchmarks import generate_plots, measure
+from plots.renderers import FastJSONRenderer
+from plots.serializers import AreaSerializer
+
+
+class StockAreaSerializer(AreaSerializer):
+    """AreaSerializer going through DRF's field by field representation."""
+
+    class Meta(AreaSerializer.Meta):
+        list_serializer_class = serializers.ListSerializer
+
+    def to_representation(self, instance):
+        return serializers.ModelSerializer.to_representation(self, instance)
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark of plot list rendering: DRF serializer and JSONRenderer "
+        "against the fast list serializer and orjson renderer, then compression "
+        "of the result with every encoding. Needs no database. Prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plots", type=int, default=10000)
+        parser.add_argument(
+            "--vertices",
+            type=int,
+            nargs=2,
+            default=[8, 64],
+            metavar=("MIN", "MAX"),
+            help="Range of the number of vertices of each plot",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        plots = list(
+            generate_plots(["bench"], options["plots"], vertices=options["vertices"])
+        )
+        for index, plot in enumerate(plots, start=1):
+            plot.id = index
+            plot.plot_area = 0.0
+
+        repeat = options["repeat"]
+        results = []
+        for name, serializer_class, renderer in [
+            ("drf", StockAreaSerializer, JSONRenderer()),
+            ("fast", AreaSerializer, FastJSONRenderer()),
+        ]:
+            data = serializer_class(plots, many=True).data
+            content = renderer.render(data)
+            results.append(
+                {
+                    "renderer": name,
+                    "plots": len(plots),
+                    "bytes": len(content),
+                    "serialize": measure(
+                        lambda: serializer_class(plots, many=True).data, repeat
+                    ),
+                    "render": measure(lambda: renderer.render(data), repeat),
+                }
+            )
+
+        for encoding in compression.COMPRESSORS:
+            results.append(
+                {
+                    "encoding": encoding,
+                    "bytes": len(compression.compress(encoding, content)),
+                    "compress": measure(
+                        lambda: compression.compress(encoding, content), repeat
+                    ),
+                }
+            )
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from plots.changes import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact the plot change log: remove entries superseded by a later "
+        "change of the same plot, and deletions older than the retention period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=settings.PLOTS_CHANGES_RETENTION_DAYS,
+            help="Days deletions are kept (default: PLOTS_CHANGES_RETENTION_DAYS)",
+        )
+
+    def handle(self, *args, **options):
+        count = compact(options["retention_days"])
+        self.stdout.write(f"Removed {count} change log entries.")
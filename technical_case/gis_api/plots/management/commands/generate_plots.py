@@ -0,0 +1,89 @@
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from plots.benchmarks import generate_plots
+from plots.bulk import create_plots, iter_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the database with synthetic users and plots, for benchmarks. "
+        "Users are named <prefix><n> and share the same password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--plots", type=int, default=1000, help="Plots per user")
+        parser.add_argument(
+            "--vertices",
+            type=int,
+            nargs=2,
+            default=[8, 64],
+            metavar=("MIN", "MAX"),
+            help="Range of the number of vertices of each plot",
+        )
+        parser.add_argument(
+            "--distribution", choices=["uniform", "clustered"], default="clustered"
+        )
+        parser.add_argument(
+            "--bbox",
+            type=float,
+            nargs=4,
+            default=[-5.0, 42.0, 8.0, 51.0],
+            metavar=("XMIN", "YMIN", "XMAX", "YMAX"),
+        )
+        parser.add_argument(
+            "--plot-size",
+            type=float,
+            default=0.002,
+            help="Largest plot radius, in degrees",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="bench")
+        parser.add_argument("--password", default="bench_password")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the <prefix><n> users, and their plots, first",
+        )
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if (
+            options["vertices"][0] < 3
+            or options["vertices"][0] > options["vertices"][1]
+        ):
+            raise CommandError("Expected 3 <= MIN <= MAX vertices.")
+
+        if options["clear"]:
+            User.objects.filter(username__regex=rf"^{re.escape(prefix)}\d+$").delete()
+
+        usernames = [f"{prefix}{n:04d}" for n in range(options["users"])]
+        if User.objects.filter(username__in=usernames).exists():
+            raise CommandError("Users already exist, use --clear to replace them.")
+
+        password = make_password(options["password"])
+        User.objects.bulk_create(
+            [User(username=username, password=password) for username in usernames]
+        )
+
+        plots = generate_plots(
+            usernames,
+            options["plots"],
+            vertices=options["vertices"],
+            distribution=options["distribution"],
+            bbox=options["bbox"],
+            plot_size=options["plot_size"],
+            seed=options["seed"],
+        )
+        count = 0
+        for chunk in iter_chunks(plots, options["chunk_size"]):
+            create_plots(chunk)
+            count += len(chunk)
+            self.stdout.write(f"{count} plots created", ending="\r")
+
+        self.stdout.write(f"Created {len(usernames)} users and {count} plots.")
@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from plots.imports import run
+from plots.models import PlotImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the plots of a GeoPackage, zipped Shapefile or GeoJSON file "
+        "for a user, reporting the progress."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import")
+        parser.add_argument("--owner", required=True, help="Username of the owner")
+        parser.add_argument(
+            "--name-field",
+            default="plot_name",
+            help="Attribute holding the plot names (default: plot_name)",
+        )
+        parser.add_argument(
+            "--srid",
+            type=int,
+            help="EPSG code of the coordinates, for files that don't tell it",
+        )
+
+    def handle(self, *args, **options):
+        if not User.objects.filter(username=options["owner"]).exists():
+            raise CommandError(f"Unknown user {options['owner']}.")
+
+        plot_import = PlotImport.objects.create(
+            owner_id=options["owner"],
+            name_field=options["name_field"],
+            srid=options["srid"],
+        )
+        plot_import = run(plot_import, options["path"], progress=self.progress)
+
+        if plot_import.status == "failed":
+            raise CommandError(plot_import.errors[0]["detail"])
+        self.stdout.write(
+            f"Imported {plot_import.plots_created} plots, "
+            f"rejected {plot_import.plots_rejected} features "
+            f"(import {plot_import.id})."
+        )
+        for error in plot_import.errors:
+            self.stdout.write(f"  feature {error['index']}: {error['errors']}")
+
+    def progress(self, plot_import):
+        self.stderr.write(
+            f"{plot_import.status}: {plot_import.features_read}/"
+            f"{plot_import.features_total or '?'} features read, "
+            f"{plot_import.plots_created} plots created"
+        )
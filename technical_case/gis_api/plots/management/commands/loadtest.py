@@ -0,0 +1,65 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand
+
+from plots.benchmarks import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "HTTP load test of running API servers: sends GET requests to each URL "
+        "with a fixed number of concurrent clients and prints throughput and "
+        "latency percentiles as JSON. Compare deployments (e.g. WSGI and ASGI "
+        "with the same number of workers) by passing one URL for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+")
+        parser.add_argument(
+            "--concurrency", type=int, default=32, help="Concurrent clients"
+        )
+        parser.add_argument(
+            "--requests", type=int, default=1000, help="Requests per URL"
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=30, help="Request timeout (seconds)"
+        )
+
+    def handle(self, *args, **options):
+        results = [
+            self.run(
+                url, options["concurrency"], options["requests"], options["timeout"]
+            )
+            for url in options["urls"]
+        ]
+        self.stdout.write(json.dumps(results, indent=2))
+
+    @staticmethod
+    def fetch(url, timeout):
+        start = time.perf_counter()
+        try:
+            with urlopen(url, timeout=timeout) as response:
+                response.read()
+        except (URLError, OSError):
+            return None
+        return time.perf_counter() - start
+
+    def run(self, url, concurrency, requests, timeout):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            durations = list(
+                executor.map(lambda _: self.fetch(url, timeout), range(requests))
+            )
+        elapsed = time.perf_counter() - start
+
+        succeeded = [duration for duration in durations if duration is not None]
+        return {
+            "url": url,
+            "concurrency": concurrency,
+            "errors": len(durations) - len(succeeded),
+            **summarize(succeeded, elapsed),
+        }
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from plots.partitioning import PartitioningError, partition
+
+
+class Command(BaseCommand):
+    help = (
+        "Partition the plots table by HASH of the owner, copying the existing "
+        "plots. The table is locked while it runs: plan a maintenance window."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            default=16,
+            help="Number of partitions (default: 16)",
+        )
+        parser.add_argument(
+            "--keep-old",
+            action="store_true",
+            help=(
+                "Keep the previous table as plots_plots_unpartitioned (drop it "
+                "once checked: its foreign key still prevents deleting users)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        try:
+            count = partition(options["partitions"], keep_old=options["keep_old"])
+        except PartitioningError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Copied {count} plots into {options['partitions']} partitions."
+        )
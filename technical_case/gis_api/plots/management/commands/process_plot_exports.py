@@ -0,0 +1,76 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+
+from plots.exports import claim_next, run, run_pk
+
+
+class Command(BaseCommand):
+    help = (
+        "Background worker writing the files of the exports submitted to "
+        "/plots/exports/, oldest first, in a pool of processes. Several workers "
+        "can run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the pending exports, then exit",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=2.0,
+            help="Seconds between checks for new exports (default: 2)",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=2,
+            help="Exports written at once, each in its own process "
+            "(default: 2, 0: one at a time in this process)",
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] == 0:
+            while (export := self.next_export(options)) is not None:
+                self.report(export.id, run(export).status)
+            return
+
+        # Spawned rather than forked: processes must not share the database
+        # connections of this one
+        with ProcessPoolExecutor(
+            max_workers=options["processes"],
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as pool:
+            running = {}
+            while True:
+                while len(running) < options["processes"]:
+                    export = self.next_export(options, block=not running)
+                    if export is None:
+                        break
+                    running[pool.submit(run_pk, export.id)] = export.id
+
+                if not running:
+                    return
+                # Checking for new exports every --poll seconds
+                done, _ = wait(running, options["poll"], FIRST_COMPLETED)
+                for future in done:
+                    self.report(running.pop(future), future.result())
+
+    def next_export(self, options, block=True):
+        """The next pending export, waiting for one unless --once or not `block`."""
+        while (export := claim_next()) is None:
+            if options["once"] or not block:
+                return None
+            time.sleep(options["poll"])
+        self.stdout.write(f"Exporting the plots of {export.owner_id} ({export.id})")
+        return export
+
+    def report(self, id, status):
+        self.stdout.write(f"Export {id} {status}")
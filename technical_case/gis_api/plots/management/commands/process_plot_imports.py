@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from plots.caching import local_caches
+from plots.imports import claim_next, run
+
+
+class Command(BaseCommand):
+    help = (
+        "Background worker importing the files uploaded to /plots/imports/, "
+        "oldest first. Several workers can run at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the pending imports, then exit",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=2.0,
+            help="Seconds between checks for new imports (default: 2)",
+        )
+
+    def handle(self, *args, **options):
+        if local_caches():
+            self.stderr.write(
+                "Warning: the plot caches are local to each process, API "
+                "processes will serve stale lists and tiles after imports."
+            )
+
+        while True:
+            plot_import = claim_next()
+            if plot_import is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+
+            self.stdout.write(f"Importing {plot_import.file.name} ({plot_import.id})")
+            run(plot_import, plot_import.file.path)
+            plot_import.file.delete(save=False)
+            self.stdout.write(
+                f"Import {plot_import.id} {plot_import.status}: "
+                f"{plot_import.plots_created} plots created, "
+                f"{plot_import.plots_rejected} features rejected"
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from plots.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-owner plot statistics (count, total area, extent) "
+        "from the plots table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "owners",
+            nargs="*",
+            help="Usernames whose statistics to rebuild (default: every owner)",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild(options["owners"] or None)
+        self.stdout.write(f"Rebuilt the plot statistics of {count} owners.")
@@ -0,0 +1,293 @@
+"""
+Per-endpoint performance metrics, exposed in the Prometheus text format on
+/metrics.
+
+MetricsMiddleware opens a RequestMetrics for every request, kept in a context
+variable so that code running for the request (in the same thread, or in the
+threads of the async ORM) can add to it:
+    - SQL queries and their time, through a wrapper installed on every database
+      connection (see plots.signals)
+    - serializer and renderer time, with timer()
+    - geometry vertices parsed or serialized, with add_vertices()
+
+Histograms live in the memory of each worker process: with several workers,
+every process must be scraped (or a single worker run).
+
+Requests slower than PLOTS_SLOW_REQUEST_SECONDS are logged to the
+"plots.slow_requests" logger with the plan of their slowest query.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("plots.slow_requests")
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500]
+SIZE_BUCKETS = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+VERTICES_BUCKETS = [0, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+_current = ContextVar("plots_request_metrics", default=None)
+
+
+class Histogram:
+    """Prometheus histogram with labels, safe to observe from several threads."""
+
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labels = labels
+        self.lock = threading.Lock()
+        # label values -> [count per bucket (+Inf last), sum]
+        self.series = {}
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.setdefault(
+                label_values, [[0] * (len(self.buckets) + 1), 0.0]
+            )
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = sorted(
+                (labels, list(counts), total)
+                for labels, (counts, total) in self.series.items()
+            )
+        for label_values, counts, total in series:
+            labels = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.labels, label_values)
+            )
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines)
+
+
+REQUEST_DURATION = Histogram(
+    "plots_request_duration_seconds",
+    "Time to build the response of a request.",
+    DURATION_BUCKETS,
+    ["view", "method", "status"],
+)
+DB_QUERIES = Histogram(
+    "plots_db_queries", "SQL queries per request.", COUNT_BUCKETS, ["view"]
+)
+DB_DURATION = Histogram(
+    "plots_db_duration_seconds",
+    "Time spent in SQL queries per request.",
+    DURATION_BUCKETS,
+    ["view"],
+)
+SERIALIZER_DURATION = Histogram(
+    "plots_serializer_duration_seconds",
+    "Time spent in DRF serializers per request.",
+    DURATION_BUCKETS,
+    ["view"],
+)
+RENDERER_DURATION = Histogram(
+    "plots_renderer_duration_seconds",
+    "Time spent rendering the response body per request.",
+    DURATION_BUCKETS,
+    ["view"],
+)
+RESPONSE_SIZE = Histogram(
+    "plots_response_size_bytes",
+    "Size of the response body (streamed responses included).",
+    SIZE_BUCKETS,
+    ["view"],
+)
+GEOMETRY_VERTICES = Histogram(
+    "plots_geometry_vertices",
+    "Geometry vertices parsed or serialized by the API per request.",
+    VERTICES_BUCKETS,
+    ["view"],
+)
+
+HISTOGRAMS = [
+    REQUEST_DURATION,
+    DB_QUERIES,
+    DB_DURATION,
+    SERIALIZER_DURATION,
+    RENDERER_DURATION,
+    RESPONSE_SIZE,
+    GEOMETRY_VERTICES,
+]
+
+
+def render():
+    """Every metric, in the Prometheus text exposition format."""
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+
+
+class RequestMetrics:
+    def __init__(self, request):
+        self.request = request
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.renderer_time = 0.0
+        self.vertices = 0
+        # (duration, alias, sql, params) of the slowest query
+        self.slowest_query = None
+
+    @property
+    def view(self):
+        match = getattr(self.request, "resolver_match", None)
+        return (match and match.url_name) or "unmatched"
+
+    def render_started(self):
+        self.render_start = time.perf_counter()
+
+    def render_finished(self):
+        self.renderer_time += time.perf_counter() - self.render_start
+
+    def record_query(self, alias, sql, params, duration):
+        self.queries += 1
+        self.db_time += duration
+        if self.slowest_query is None or duration > self.slowest_query[0]:
+            self.slowest_query = (duration, alias, sql, params)
+
+    def finish(self, response):
+        """
+        Record the request, once its response is built. Returns True when it
+        is slow enough to be logged with log_slow_request().
+        """
+        duration = time.perf_counter() - self.start
+        view = self.view
+        REQUEST_DURATION.observe(
+            duration, view, self.request.method, str(response.status_code)
+        )
+        DB_QUERIES.observe(self.queries, view)
+        DB_DURATION.observe(self.db_time, view)
+        SERIALIZER_DURATION.observe(self.serializer_time, view)
+        RENDERER_DURATION.observe(self.renderer_time, view)
+        GEOMETRY_VERTICES.observe(self.vertices, view)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view)
+        elif not getattr(response, "is_async", False):
+            response.streaming_content = self.count_streamed(
+                response.streaming_content, view
+            )
+
+        self.duration = duration
+        threshold = settings.PLOTS_SLOW_REQUEST_SECONDS
+        return threshold is not None and duration >= threshold
+
+    @staticmethod
+    def count_streamed(content, view):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            RESPONSE_SIZE.observe(size, view)
+
+    def log_slow_request(self):
+        """Log the request with the plan of its slowest query (runs EXPLAIN)."""
+        plan = None
+        if self.slowest_query is not None:
+            _, alias, sql, params = self.slowest_query
+            plan = explain(alias, sql, params)
+        logger.warning(
+            "Slow request %s %s (%s): %.3fs, %d queries in %.3fs, "
+            "serializer %.3fs, renderer %.3fs\nSlowest query: %s\n%s",
+            self.request.method,
+            self.request.get_full_path(),
+            self.view,
+            self.duration,
+            self.queries,
+            self.db_time,
+            self.serializer_time,
+            self.renderer_time,
+            self.slowest_query[2] if self.slowest_query else None,
+            plan or "",
+        )
+
+
+def explain(alias, sql, params):
+    """Query plan of a SELECT statement (EXPLAIN doesn't run it), or None."""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+    except Exception as e:
+        return f"(EXPLAIN failed: {e})"
+
+
+@contextmanager
+def request_metrics(request):
+    metrics = RequestMetrics(request)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """RequestMetrics of the request being served, or None."""
+    return _current.get()
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the "<name>_time" of the request."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(
+            metrics,
+            f"{name}_time",
+            getattr(metrics, f"{name}_time") + time.perf_counter() - start,
+        )
+
+
+def add_vertices(count):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.vertices += count
+
+
+class QueryRecorder:
+    """Database execute wrapper adding every query to the request metrics."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        metrics = _current.get()
+        if metrics is None:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.record_query(self.alias, sql, params, time.perf_counter() - start)
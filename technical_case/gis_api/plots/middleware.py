@@ -0,0 +1,110 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from . import compression, metrics
+
+
+class MetricsMiddleware:
+    """
+    Records the performance metrics of every request, see plots.metrics.
+    Works in sync and async mode, so that async views stay async under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with metrics.request_metrics(request) as request_metrics:
+            response = self.get_response(request)
+            if request_metrics.finish(response):
+                request_metrics.log_slow_request()
+        return response
+
+    async def __acall__(self, request):
+        with metrics.request_metrics(request) as request_metrics:
+            response = await self.get_response(request)
+            if request_metrics.finish(response):
+                await sync_to_async(request_metrics.log_slow_request)()
+        return response
+
+    def process_template_response(self, request, response):
+        # As the first middleware, called last: right before DRF responses
+        # are rendered
+        request_metrics = metrics.current()
+        if request_metrics is not None:
+            request_metrics.render_started()
+            response.add_post_render_callback(
+                lambda response: request_metrics.render_finished()
+            )
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with zstd, Brotli or gzip as negotiated with the
+    client, see plots.compression. Works in sync and async mode.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        # Byte ranges are of the uncompressed file (export downloads)
+        if (
+            response.has_header("Content-Encoding")
+            or response.has_header("Accept-Ranges")
+            or (
+                not response.streaming
+                and len(response.content) < settings.PLOTS_COMPRESSION_MIN_SIZE
+            )
+        ):
+            return response
+
+        patch_vary_headers(response, ["Accept-Encoding"])
+        encoding = compression.negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            stream = (
+                compression.acompress_stream
+                if response.is_async
+                else compression.compress_stream
+            )
+            response.streaming_content = stream(encoding, response.streaming_content)
+            del response["Content-Length"]
+        else:
+            content = compression.compress(encoding, response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        # Strong ETags promise identical bytes, compressed bodies differ
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = f"W/{etag}"
+        response["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plots', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plots',
+            name='plot_area',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql='UPDATE plots_plots SET plot_area = ST_Area(plot_geometry::geography)',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plots', '0002_plots_plot_area'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plots',
+            index=models.Index(fields=['plot_owner', 'id'], name='plots_owner_id_idx'),
+        ),
+    ]
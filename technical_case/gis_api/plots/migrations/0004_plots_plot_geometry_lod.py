@@ -0,0 +1,38 @@
+# Generated by Django 4.2.2 on 2026-10-18 14:26
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plots', '0003_plots_owner_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plots',
+            name='plot_geometry_lod1',
+            field=django.contrib.gis.db.models.fields.PolygonField(editable=False, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='plots',
+            name='plot_geometry_lod2',
+            field=django.contrib.gis.db.models.fields.PolygonField(editable=False, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='plots',
+            name='plot_geometry_lod3',
+            field=django.contrib.gis.db.models.fields.PolygonField(editable=False, null=True, srid=4326),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'UPDATE plots_plots SET '
+                'plot_geometry_lod1 = ST_SimplifyPreserveTopology(plot_geometry, 0.00001), '
+                'plot_geometry_lod2 = ST_SimplifyPreserveTopology(plot_geometry, 0.0001), '
+                'plot_geometry_lod3 = ST_SimplifyPreserveTopology(plot_geometry, 0.001)'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
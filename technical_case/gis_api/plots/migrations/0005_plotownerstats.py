@@ -0,0 +1,39 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('plots', '0004_plots_plot_geometry_lod'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlotOwnerStats',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='plot_stats', serialize=False, to=settings.AUTH_USER_MODEL, to_field='username')),
+                ('plot_count', models.IntegerField(default=0)),
+                ('total_area', models.FloatField(default=0)),
+                ('xmin', models.FloatField(null=True)),
+                ('ymin', models.FloatField(null=True)),
+                ('xmax', models.FloatField(null=True)),
+                ('ymax', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=(
+                'INSERT INTO plots_plotownerstats '
+                '(owner_id, plot_count, total_area, xmin, ymin, xmax, ymax) '
+                'SELECT plot_owner_id, COUNT(*), COALESCE(SUM(plot_area), 0), '
+                'ST_XMin(ST_Extent(plot_geometry)), ST_YMin(ST_Extent(plot_geometry)), '
+                'ST_XMax(ST_Extent(plot_geometry)), ST_YMax(ST_Extent(plot_geometry)) '
+                'FROM plots_plots GROUP BY plot_owner_id'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plots', '0005_plotownerstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlotLogEntry',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=150)),
+                ('plot_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'created'), ('updated', 'updated'), ('deleted', 'deleted')], max_length=7)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'seq'], name='plots_log_owner_seq_idx'), models.Index(fields=['plot_id', 'seq'], name='plots_log_plot_seq_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlotLogHorizon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=(
+                'INSERT INTO plots_plotlogentry (owner, plot_id, action, changed_at) '
+                "SELECT plot_owner_id, id, 'created', NOW() FROM plots_plots ORDER BY id"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
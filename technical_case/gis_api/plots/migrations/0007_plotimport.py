@@ -0,0 +1,35 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('plots', '0006_plotlogentry_plotloghorizon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlotImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(blank=True, upload_to='imports/')),
+                ('name_field', models.CharField(default='plot_name', max_length=255)),
+                ('srid', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('copying', 'copying'), ('merging', 'merging'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=7)),
+                ('features_total', models.IntegerField(null=True)),
+                ('features_read', models.IntegerField(default=0)),
+                ('plots_created', models.IntegerField(default=0)),
+                ('plots_rejected', models.IntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, to_field='username')),
+            ],
+        ),
+    ]
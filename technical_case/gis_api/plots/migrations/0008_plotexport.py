@@ -0,0 +1,37 @@
+# Generated by Django 4.2.2 on 2026-10-18 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('plots', '0007_plotimport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlotExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('gpkg', 'gpkg'), ('fgb', 'fgb'), ('geojsonseq', 'geojsonseq')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed'), ('expired', 'expired')], default='pending', max_length=7)),
+                ('seq', models.BigIntegerField(null=True)),
+                ('plots_exported', models.IntegerField(default=0)),
+                ('file', models.FileField(blank=True, upload_to='exports/')),
+                ('size', models.BigIntegerField(null=True)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('errors', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, to_field='username')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'format', 'status'], name='plots_export_owner_idx')],
+            },
+        ),
+    ]
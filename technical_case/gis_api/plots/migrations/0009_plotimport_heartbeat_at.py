@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plots', '0008_plotexport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plotimport',
+            name='heartbeat_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plots', '0009_plotimport_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plotexport',
+            name='heartbeat_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
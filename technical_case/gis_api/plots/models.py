@@ -1,8 +1,288 @@
 from django.contrib.gis.db import models
+from django.contrib.gis.db.models.functions import SimplifyPreserveTopology
+from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_save, pre_save
+
+from .functions import GeodesicArea
+
+# Tolerance (degrees) of each level of detail of plot geometries, from the
+# finest (about 1 m) to the coarsest (about 100 m). Level 0 is plot_geometry.
+SIMPLIFY_TOLERANCES = {1: 0.00001, 2: 0.0001, 3: 0.001}
+
+
+def geometry_field_name(level):
+    """Name of the Plots field holding the geometry simplified at `level`."""
+    return f"plot_geometry_lod{level}" if level else "plot_geometry"
+
+
+GEOMETRY_FIELDS = [geometry_field_name(level) for level in [0, *SIMPLIFY_TOLERANCES]]
+
+
+class PlotsQuerySet(models.QuerySet):
+    def refresh_derived_fields(self):
+        """
+        Recompute the stored area and simplified geometries of every plot in
+        the queryset, in a single UPDATE. Used by write paths that bypass
+        Plots.save().
+        """
+        return self.update(
+            plot_area=GeodesicArea("plot_geometry"),
+            **{
+                geometry_field_name(level): SimplifyPreserveTopology(
+                    "plot_geometry", tolerance
+                )
+                for level, tolerance in SIMPLIFY_TOLERANCES.items()
+            },
+        )
 
 
 class Plots(models.Model):
     plot_name = models.CharField(max_length=255, null=False)
     plot_geometry = models.PolygonField(null=False)
     plot_owner = models.ForeignKey(User, on_delete=models.CASCADE, to_field="username")
+    # Geodesic area in square metres, kept in sync with plot_geometry
+    plot_area = models.FloatField(null=True, editable=False)
+    # plot_geometry simplified with SIMPLIFY_TOLERANCES, kept in sync with it
+    plot_geometry_lod1 = models.PolygonField(null=True, editable=False)
+    plot_geometry_lod2 = models.PolygonField(null=True, editable=False)
+    plot_geometry_lod3 = models.PolygonField(null=True, editable=False)
+
+    objects = PlotsQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["plot_owner", "id"], name="plots_owner_id_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def remember_loaded_values(self):
+        """Record the current owner, geometry and area as the ones stored in DB."""
+        self._loaded_values = {
+            "plot_owner_id": self.plot_owner_id,
+            "plot_geometry": self.plot_geometry,
+            "plot_area": self.plot_area,
+        }
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        # post_save receivers (change log...) write in the same transaction
+        with transaction.atomic(using=using):
+            self.compute_derived_fields(using)
+            if kwargs.get("force_insert") or not self.update_stored(
+                using, kwargs.get("update_fields")
+            ):
+                super().save(*args, **kwargs)
+
+    def update_stored(self, using, update_fields=None):
+        """
+        UPDATE the stored plot restricted to its stored owner, which is pruned
+        to the owner's partition when the table is partitioned
+        (plots.partitioning), sending pre_save and post_save as Model.save().
+        Returns False when the plot isn't stored under that owner, for
+        Model.save() to save it.
+        """
+        owner = getattr(self, "_loaded_values", {}).get("plot_owner_id")
+        if self._state.adding or owner is None or owner is DEFERRED:
+            return False
+
+        if update_fields is not None:
+            update_fields = frozenset(update_fields)
+        deferred = self.get_deferred_fields()
+        fields = [
+            field
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname not in deferred
+            and (
+                update_fields is None
+                or field.name in update_fields
+                or field.attname in update_fields
+            )
+        ]
+        pre_save.send(
+            sender=type(self),
+            instance=self,
+            raw=False,
+            using=using,
+            update_fields=update_fields,
+        )
+        updated = (
+            type(self)
+            ._base_manager.using(using)
+            .filter(pk=self.pk, plot_owner_id=owner)
+            .update(**{field.attname: getattr(self, field.attname) for field in fields})
+        )
+        if not updated:
+            return False
+
+        self._state.db = using
+        post_save.send(
+            sender=type(self),
+            instance=self,
+            created=False,
+            update_fields=update_fields,
+            raw=False,
+            using=using,
+        )
+        return True
+
+    def compute_derived_fields(self, using):
+        """Compute plot_area and the simplified geometries in one query."""
+        connection = connections[using]
+        geometry = self._meta.get_field("plot_geometry").get_db_prep_value(
+            self.plot_geometry, connection
+        )
+        simplified = ", ".join(
+            "ST_SimplifyPreserveTopology(plot.geometry, %s)"
+            for _ in SIMPLIFY_TOLERANCES
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT ST_Area(plot.geometry::geography), {simplified} "
+                "FROM (SELECT %s::geometry AS geometry) AS plot",
+                [*SIMPLIFY_TOLERANCES.values(), geometry],
+            )
+            area, *simplified_geometries = cursor.fetchone()
+
+        self.plot_area = area
+        for level, value in zip(SIMPLIFY_TOLERANCES, simplified_geometries):
+            setattr(self, geometry_field_name(level), GEOSGeometry(value))
+
+
+class PlotOwnerStats(models.Model):
+    """
+    Summary of the plots of one owner: count, total area (square metres) and
+    extent. Maintained incrementally by plots.stats on every plot change, so
+    reading it doesn't depend on the number of plots.
+    """
+
+    owner = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        to_field="username",
+        primary_key=True,
+        related_name="plot_stats",
+    )
+    plot_count = models.IntegerField(default=0)
+    total_area = models.FloatField(default=0)
+    # Extent of every plot geometry of the owner, null when they have no plot
+    xmin = models.FloatField(null=True)
+    ymin = models.FloatField(null=True)
+    xmax = models.FloatField(null=True)
+    ymax = models.FloatField(null=True)
+
+    @property
+    def extent(self):
+        if self.xmin is None:
+            return None
+        return (self.xmin, self.ymin, self.xmax, self.ymax)
+
+
+class PlotLogEntry(models.Model):
+    """
+    One plot creation, update or deletion, seen from the plot owner: written by
+    plots.changes in the transaction of the change, in commit order.
+
+    Plot ids and owners are not foreign keys: entries of deleted plots (and
+    users) remain, to tell clients about the deletion.
+    """
+
+    ACTIONS = ["created", "updated", "deleted"]
+
+    seq = models.BigAutoField(primary_key=True)
+    owner = models.CharField(max_length=150)
+    plot_id = models.BigIntegerField()
+    action = models.CharField(max_length=7, choices=[(a, a) for a in ACTIONS])
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "seq"], name="plots_log_owner_seq_idx"),
+            models.Index(fields=["plot_id", "seq"], name="plots_log_plot_seq_idx"),
+        ]
+
+
+class PlotLogHorizon(models.Model):
+    """
+    Single row: highest sequence number of the deletion entries removed by
+    compaction. Clients synced before it may have missed deletions.
+    """
+
+    seq = models.BigIntegerField(default=0)
+
+
+class PlotImport(models.Model):
+    """
+    A plot file (GeoPackage, zipped Shapefile, GeoJSON...) imported by
+    plots.imports, and the progress of its import.
+    """
+
+    STATUSES = ["pending", "copying", "merging", "done", "failed"]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, to_field="username")
+    file = models.FileField(upload_to="imports/", blank=True)
+    # Attribute of the features holding the plot names
+    name_field = models.CharField(max_length=255, default="plot_name")
+    # EPSG code of the coordinates, for files that don't tell it
+    srid = models.IntegerField(null=True, blank=True)
+    status = models.CharField(
+        max_length=7, choices=[(s, s) for s in STATUSES], default="pending"
+    )
+    features_total = models.IntegerField(null=True)
+    features_read = models.IntegerField(default=0)
+    plots_created = models.IntegerField(default=0)
+    plots_rejected = models.IntegerField(default=0)
+    # The first rejected features, as {"index": ..., "errors": {...}}, or the
+    # reason of a failed import
+    errors = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    # Last sign of life of the worker running the import, see plots.jobs
+    heartbeat_at = models.DateTimeField(null=True)
+
+
+class PlotExport(models.Model):
+    """
+    A file of every plot of an owner, written by plots.exports, and the progress
+    of its export.
+    """
+
+    FORMATS = ["gpkg", "fgb", "geojsonseq"]
+    STATUSES = ["pending", "running", "done", "failed", "expired"]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, to_field="username")
+    format = models.CharField(max_length=10, choices=[(f, f) for f in FORMATS])
+    status = models.CharField(
+        max_length=7, choices=[(s, s) for s in STATUSES], default="pending"
+    )
+    # Position of the owner's change log when the plots were read, see
+    # plots.changes.last_seq()
+    seq = models.BigIntegerField(null=True)
+    plots_exported = models.IntegerField(default=0)
+    file = models.FileField(upload_to="exports/", blank=True)
+    size = models.BigIntegerField(null=True)
+    # SHA-256 digest of the file, hexadecimal
+    sha256 = models.CharField(max_length=64, blank=True)
+    # The reason of a failed export
+    errors = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    # Last sign of life of the worker writing the export, see plots.jobs
+    heartbeat_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["owner", "format", "status"], name="plots_export_owner_idx"
+            ),
+        ]
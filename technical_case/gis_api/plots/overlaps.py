@@ -0,0 +1,205 @@
+"""
+Detection of overlapping plots.
+
+Both checks only compare plots whose bounding boxes intersect, found with the
+GiST index on plot_geometry (&& / ST_Intersects), so their cost grows with
+the number of candidate pairs rather than with the square of the number of
+plots. Overlap areas are geodesic, in square metres: plots sharing an edge or
+a corner don't overlap.
+"""
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Intersection
+from django.db import connection
+
+from rest_framework.exceptions import ValidationError
+
+from .functions import GeodesicArea
+from .models import Plots
+
+OVERLAP_POLICIES = ["allow", "flag", "reject"]
+
+# Plots are scanned in id order, each one joined with the plots its bounding
+# box intersects: the LIMIT stops the scan once a page of pairs is found, so
+# the overlap area is only computed for the candidate pairs of that page.
+CONFLICTS_SQL = """
+SELECT plot.id, plot.plot_owner_id, other.id, other.plot_owner_id, other.overlap_area
+FROM plots_plots AS plot
+CROSS JOIN LATERAL (
+    SELECT
+        candidate.id,
+        candidate.plot_owner_id,
+        ST_Area(
+            ST_Intersection(plot.plot_geometry, candidate.plot_geometry)::geography
+        ) AS overlap_area
+    FROM plots_plots AS candidate
+    WHERE candidate.id > plot.id
+        AND (plot.id, candidate.id) > (%(after_id)s, %(after_other_id)s)
+        AND ST_Intersects(plot.plot_geometry, candidate.plot_geometry)
+) AS other
+WHERE plot.id >= %(after_id)s
+    AND other.overlap_area > %(min_area)s
+ORDER BY plot.id, other.id
+LIMIT %(limit)s
+"""
+
+
+# Overlaps of a chunk of new geometries (bulk creation) with the existing
+# plots (other_id set) and with the geometries before them in the chunk
+# (earlier set), geometries being sent as hexadecimal EWKB
+CHUNK_OVERLAPS_SQL = """
+WITH chunk AS (
+    SELECT position, geometry::geometry AS geometry
+    FROM unnest(%(positions)s::integer[], %(geometries)s::text[])
+        AS chunk(position, geometry)
+)
+SELECT * FROM (
+    SELECT
+        chunk.position,
+        plot.id AS other_id,
+        plot.plot_owner_id,
+        NULL::integer AS earlier,
+        ST_Area(ST_Intersection(chunk.geometry, plot.plot_geometry)::geography)
+            AS overlap_area
+    FROM chunk
+    JOIN plots_plots AS plot ON ST_Intersects(chunk.geometry, plot.plot_geometry)
+    UNION ALL
+    SELECT
+        chunk.position,
+        NULL,
+        NULL,
+        earlier.position,
+        ST_Area(ST_Intersection(chunk.geometry, earlier.geometry)::geography)
+    FROM chunk
+    JOIN chunk AS earlier
+        ON earlier.position < chunk.position
+        AND ST_Intersects(chunk.geometry, earlier.geometry)
+) AS overlaps
+WHERE overlap_area > %(min_area)s
+ORDER BY position, other_id, earlier
+"""
+
+
+def parse_overlap_policy(value):
+    """Overlap policy asked with ?overlap=, PLOTS_OVERLAP_POLICY by default."""
+    if value is None:
+        return settings.PLOTS_OVERLAP_POLICY
+    if value not in OVERLAP_POLICIES:
+        raise ValidationError(
+            {"overlap": [f"Expected one of {', '.join(OVERLAP_POLICIES)}."]}
+        )
+    return value
+
+
+def parse_min_area(value):
+    """Overlap area threshold (m²) asked with ?min_overlap_area=."""
+    if value is None:
+        return settings.PLOTS_OVERLAP_MIN_AREA
+    try:
+        min_area = float(value)
+    except ValueError:
+        min_area = -1
+    if not 0 <= min_area < float("inf"):
+        raise ValidationError(
+            {"min_overlap_area": ["Expected a positive area in square metres."]}
+        )
+    return min_area
+
+
+def parse_after(value):
+    """Last pair of the previous page of conflicts, asked with ?after=<id>,<id>."""
+    if value is None:
+        return (0, 0)
+    try:
+        plot_id, other_plot_id = (int(number) for number in value.split(","))
+    except ValueError:
+        raise ValidationError({"after": ["Expected two comma separated plot ids."]})
+    return (plot_id, other_plot_id)
+
+
+def find_overlaps(geometry, min_area, exclude_id=None):
+    """
+    Plots overlapping `geometry` by more than `min_area` square metres, as
+    {"id", "plot_owner", "overlap_area"} dicts ordered by id.
+    """
+    queryset = Plots.objects.filter(plot_geometry__intersects=geometry)
+    if exclude_id is not None:
+        queryset = queryset.exclude(pk=exclude_id)
+    return list(
+        queryset.annotate(
+            overlap_area=GeodesicArea(Intersection("plot_geometry", geometry))
+        )
+        .filter(overlap_area__gt=min_area)
+        .order_by("id")
+        .values("id", "plot_owner", "overlap_area")
+    )
+
+
+def find_chunk_overlaps(geometries, min_area):
+    """
+    Overlaps by more than `min_area` square metres of a list of new geometries,
+    in one query. Returns {index in the list: [overlap, ...]}, an overlap being
+    an existing plot as a {"id", "plot_owner", "overlap_area"} dict, or a
+    ("earlier", <index>, <overlap area>) tuple for an earlier geometry of the
+    list.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            CHUNK_OVERLAPS_SQL,
+            {
+                "positions": list(range(len(geometries))),
+                "geometries": [geometry.hexewkb.decode() for geometry in geometries],
+                "min_area": min_area,
+            },
+        )
+        overlaps = {}
+        for position, other_id, other_owner, earlier, area in cursor.fetchall():
+            overlaps.setdefault(position, []).append(
+                ("earlier", earlier, area)
+                if earlier is not None
+                else {"id": other_id, "plot_owner": other_owner, "overlap_area": area}
+            )
+        return overlaps
+
+
+def overlaps_message(overlaps):
+    """Error message of a geometry rejected for the given overlapped plots."""
+    return (
+        "Overlaps existing plots: "
+        + ", ".join(
+            f"{overlap['id']} ({overlap['overlap_area']:.1f} m²)"
+            for overlap in overlaps
+        )
+        + "."
+    )
+
+
+def find_conflicts(min_area, after=(0, 0), limit=100):
+    """
+    Pairs of overlapping plots, as {"plot_id", "plot_owner", "other_plot_id",
+    "other_plot_owner", "overlap_area"} dicts, each pair once (plot_id <
+    other_plot_id), ordered by (plot_id, other_plot_id) and starting after
+    the `after` pair.
+
+    A spatial self-join: plots are read in id order and matched against the
+    index for the plots their bounding box intersects, until a page is full.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            CONFLICTS_SQL,
+            {
+                "after_id": after[0],
+                "after_other_id": after[1],
+                "min_area": min_area,
+                "limit": limit,
+            },
+        )
+        return [
+            {
+                "plot_id": plot_id,
+                "plot_owner": plot_owner,
+                "other_plot_id": other_plot_id,
+                "other_plot_owner": other_plot_owner,
+                "overlap_area": overlap_area,
+            }
+            for plot_id, plot_owner, other_plot_id, other_plot_owner, overlap_area in cursor.fetchall()
+        ]
@@ -0,0 +1,39 @@
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class PlotsCursorPagination(CursorPagination):
+    """
+    Keyset pagination for plot listings.
+
+    Pages are fetched with "WHERE plot_owner = ... AND id > <cursor> ORDER BY id
+    LIMIT n", served by the (plot_owner, id) index, so deep pages cost the same
+    as the first one.
+
+    The response body stays a plain JSON list, as before pagination existed.
+    Navigation links are sent in the Link header (RFC 8288).
+    """
+
+    ordering = "id"
+    page_size_query_param = "page_size"
+    max_page_size = settings.PLOTS_MAX_PAGE_SIZE
+
+    def get_paginated_response(self, data):
+        links = [
+            f'<{url}>; rel="{rel}"'
+            for rel, url in (
+                ("next", self.get_next_link()),
+                ("prev", self.get_previous_link()),
+            )
+            if url is not None
+        ]
+        headers = {"Link": ", ".join(links)} if links else None
+        return Response(data, headers=headers)
+
+
+class OwnerStatsCursorPagination(PlotsCursorPagination):
+    """Keyset pagination of per-owner statistics, by username."""
+
+    ordering = "owner"
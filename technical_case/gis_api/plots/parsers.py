@@ -0,0 +1,46 @@
+import numpy as np
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline delimited JSON (one GeoJSON Feature per line).
+
+    Lines are yielded lazily, undecoded, while the view consumes them: large
+    uploads are never held in memory and a malformed line only fails its own
+    item instead of the whole request.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", "utf-8")
+        return self.iter_lines(stream, encoding)
+
+    @staticmethod
+    def iter_lines(stream, encoding):
+        if stream is None:
+            return
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line.decode(encoding)
+
+
+class BinaryPointsParser(BaseParser):
+    """
+    Parses a buffer of points: (longitude, latitude) pairs of little-endian
+    float64, into an (n, 2) numpy array, without a Python object per point.
+    """
+
+    media_type = "application/octet-stream"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = stream.read() if stream is not None else b""
+        if len(body) % 16:
+            raise ParseError(
+                "Expected (longitude, latitude) pairs of little-endian float64."
+            )
+        return np.frombuffer(body, dtype="<f8").reshape(-1, 2)
@@ -0,0 +1,138 @@
+"""
+Optional hash partitioning of the Plots table by owner, for deployments with
+hundreds of millions of plots (see the partition_plots command).
+
+partition() turns the plots_plots table into a table partitioned by
+HASH (plot_owner_id), in one transaction holding an exclusive lock on the
+table, so it is meant for a maintenance window:
+    1. the table is renamed, along with its indexes, to <table>_unpartitioned
+    2. a partitioned table with the same columns and `partitions` partitions
+       takes its name, ids being taken from a new sequence starting after the
+       highest existing id
+    3. rows are copied, then the indexes and foreign keys are created again
+       (indexes after the copy, which is faster than maintaining them)
+    4. the previous table is dropped, unless it is kept
+
+PostgreSQL requires the primary key of a partitioned table to hold the
+partition key: it becomes (id, plot_owner_id), ids staying unique through
+the sequence. Queries restricted to one owner (plot_owner_id = ...), which
+every per-owner endpoint makes, are pruned to the partition of the owner.
+"""
+from django.db import connections, router, transaction
+
+from .models import Plots
+
+UNPARTITIONED_SUFFIX = "_unpartitioned"
+
+
+class PartitioningError(Exception):
+    """The table can't be partitioned."""
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", [table]
+    )
+    return cursor.fetchone()[0]
+
+
+def partition_name(table, remainder):
+    return f"{table}_p{remainder}"
+
+
+def partition(partitions, keep_old=False):
+    """
+    Partition the Plots table by owner into `partitions` partitions.
+    Returns the number of plots copied.
+    """
+    if partitions < 2:
+        raise PartitioningError("At least 2 partitions are needed.")
+
+    using = router.db_for_write(Plots)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = Plots._meta.db_table
+    old_table = f"{table}{UNPARTITIONED_SUFFIX}"
+    sequence = f"{table}_partitioned_id_seq"
+
+    with transaction.atomic(using=using):
+        # Tables with pending deferred constraint checks can't be altered
+        connection.check_constraints()
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+            if is_partitioned(cursor, table):
+                raise PartitioningError(f"{table} is already partitioned.")
+
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes "
+                "WHERE schemaname = current_schema() AND tablename = %s",
+                [table],
+            )
+            indexes = cursor.fetchall()
+            cursor.execute(
+                "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype IN ('p', 'f')",
+                [table],
+            )
+            constraints = cursor.fetchall()
+            primary_key = next(name for name, kind, _ in constraints if kind == "p")
+
+            # 1. Index names are unique per schema: free them for the new table
+            cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+            for name, _ in indexes:
+                new_name = name[: 63 - len(UNPARTITIONED_SUFFIX)] + UNPARTITIONED_SUFFIX
+                cursor.execute(f"ALTER INDEX {quote(name)} RENAME TO {quote(new_name)}")
+
+            # 2.
+            cursor.execute(
+                f"CREATE TABLE {quote(table)} (LIKE {quote(old_table)} "
+                "INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+                "PARTITION BY HASH (plot_owner_id)"
+            )
+            for remainder in range(partitions):
+                cursor.execute(
+                    f"CREATE TABLE {quote(partition_name(table, remainder))} "
+                    f"PARTITION OF {quote(table)} "
+                    "FOR VALUES WITH (MODULUS %s, REMAINDER %s)",
+                    [partitions, remainder],
+                )
+            cursor.execute(
+                f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id"
+            )
+            cursor.execute(
+                f"SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) "
+                f"FROM {quote(old_table)}",
+                [sequence],
+            )
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ALTER COLUMN id "
+                "SET DEFAULT nextval(%s::regclass)",
+                [sequence],
+            )
+
+            # 3.
+            cursor.execute(
+                f"INSERT INTO {quote(table)} SELECT * FROM {quote(old_table)}"
+            )
+            count = cursor.rowcount
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} "
+                "PRIMARY KEY (id, plot_owner_id)"
+            )
+            for name, definition in indexes:
+                # Definitions name the table, now the partitioned one
+                if name != primary_key:
+                    cursor.execute(definition)
+            for name, kind, definition in constraints:
+                if kind == "f":
+                    cursor.execute(
+                        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+                        f"{definition}"
+                    )
+
+            # 4.
+            if not keep_old:
+                cursor.execute(f"DROP TABLE {quote(old_table)}")
+            cursor.execute(f"ANALYZE {quote(table)}")
+
+    return count
@@ -0,0 +1,181 @@
+import json
+import struct
+
+import orjson
+from django.contrib.gis.db.models.functions import AsWKB
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .functions import AsHexWKB, AsTWKB
+
+# Size of the chunks written by streamed responses, in characters
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def buffered(chunks, size=STREAM_BUFFER_SIZE):
+    """Group small string chunks into larger ones before they are written out."""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson, several times faster on the nested
+    coordinate lists of plot geometries. Output is the same compact UTF-8
+    JSON; indented output (?indent= or Accept: ...; indent=) is left to
+    JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Types orjson doesn't know (Decimal, lazy strings...) as DRF encodes
+        # them, and the integer keys of ListField and DictField errors
+        return orjson.dumps(
+            data, default=JSONEncoder().default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+class MVTRenderer(BaseRenderer):
+    """
+    Renders Mapbox Vector Tile bytes as built by PostGIS.
+    Error responses have an empty body, their status code telling what went wrong.
+    """
+
+    media_type = "application/vnd.mapbox-vector-tile"
+    format = "pbf"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, memoryview)):
+            return bytes(data)
+        return b""
+
+
+class FeatureStreamRenderer(BaseRenderer):
+    """
+    Base class of the renderers streaming GeoJSON Features.
+
+    Views hand the features as JSON strings to stream(), which yields the
+    response body chunk by chunk. render() is only used for non streamed
+    data such as errors.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
+
+    def stream(self, features):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(FeatureStreamRenderer):
+    """One GeoJSON Feature per line."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def stream(self, features):
+        return buffered(feature + "\n" for feature in features)
+
+
+class GeoJSONRenderer(FeatureStreamRenderer):
+    """A GeoJSON FeatureCollection, written feature by feature."""
+
+    media_type = "application/geo+json"
+    format = "geojson"
+
+    def stream(self, features):
+        def chunks():
+            yield '{"type":"FeatureCollection","features":['
+            separator = ""
+            for feature in features:
+                yield separator + feature
+                separator = ","
+            yield "]}"
+
+        return buffered(chunks())
+
+
+class WKBRenderer(BaseRenderer):
+    """
+    Plots as a binary sequence of records, one per plot, little endian:
+    plot id (int64), geometry size in bytes (uint32), geometry (WKB).
+
+    Geometries are encoded by PostGIS: views annotate their queryset with
+    geometry_expression() and skip building Python geometries.
+    Error responses have an empty body.
+    """
+
+    media_type = "application/vnd.plots.wkb"
+    format = "wkb"
+    charset = None
+    render_style = "binary"
+
+    record_header = struct.Struct("<qI")
+
+    def geometry_expression(self, geometry_field, precision):
+        return AsWKB(geometry_field)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, list):
+            return b""
+        records = []
+        for plot in data:
+            geometry = bytes(plot["plot_geometry"])
+            records.append(self.record_header.pack(plot["id"], len(geometry)))
+            records.append(geometry)
+        return b"".join(records)
+
+
+class TWKBRenderer(WKBRenderer):
+    """
+    Same records as WKBRenderer, geometries being Tiny WKB: coordinates
+    quantized to ?precision= decimals and delta-encoded, several times
+    smaller than WKB.
+    """
+
+    media_type = "application/vnd.plots.twkb"
+    format = "twkb"
+
+    def geometry_expression(self, geometry_field, precision):
+        return AsTWKB(geometry_field, precision)
+
+
+class WKBHexJSONRenderer(FastJSONRenderer):
+    """The usual JSON plot list, geometries being hexadecimal WKB strings."""
+
+    media_type = "application/vnd.plots.wkb-hex+json"
+    format = "wkb-hex"
+
+    def geometry_expression(self, geometry_field, precision):
+        return AsHexWKB(geometry_field)
+
+
+class FlatGeobufRenderer(BaseRenderer):
+    """
+    Renders FlatGeobuf files as built by PostGIS.
+    Error responses have an empty body.
+    """
+
+    media_type = "application/flatgeobuf"
+    format = "fgb"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, memoryview)):
+            return bytes(data)
+        return b""
@@ -0,0 +1,92 @@
+"""
+Database routing between the primary database and its read replicas.
+
+Writes, and reads by default, go to the "default" (primary) database. Read
+endpoints that can tolerate replication lag (plot listings, statistics,
+tiles) opt in with `replica_reads()`: their reads then go to one of the
+REPLICA_DATABASES, picked at random.
+
+Read your writes: every plot change pins its owner, and tiles, to the
+primary for PLOTS_REPLICA_PIN_SECONDS (see plots.signals), longer than the
+expected replication lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Pin shared by every tile, as any change may show on cached tiles
+TILES_PIN = "*tiles*"
+
+_read_database = ContextVar("plots_read_database", default=None)
+
+
+def cache():
+    return caches[settings.PLOTS_LIST_CACHE]
+
+
+def pin_key(name):
+    return f"plots:primary-pin:{name}"
+
+
+def pin_to_primary(names):
+    """Send the reads of the given owners (or TILES_PIN) to the primary for a while."""
+    if settings.REPLICA_DATABASES:
+        cache().set_many(
+            {pin_key(name): True for name in names},
+            settings.PLOTS_REPLICA_PIN_SECONDS,
+        )
+
+
+def choose_read_database(pins):
+    """A replica alias, or None (primary) when one of the pins is active."""
+    if not settings.REPLICA_DATABASES:
+        return None
+    if cache().get_many([pin_key(name) for name in pins if name]):
+        return None
+    return random.choice(settings.REPLICA_DATABASES)
+
+
+@contextmanager
+def replica_reads(*pins):
+    """
+    Route the reads made in the block to a replica, unless one of `pins`
+    (owners, TILES_PIN) changed recently.
+    """
+    token = _read_database.set(choose_read_database(pins))
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class ReplicaReadsMixin:
+    """
+    Serves the reads of a DRF view from a replica, see replica_reads().
+    Views may override get_replica_pins().
+    """
+
+    def get_replica_pins(self, request, kwargs):
+        return [kwargs.get("username")]
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(*self.get_replica_pins(request, kwargs)):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """Replicas are read-only copies of "default", filled by replication."""
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -3,45 +3,299 @@ from rest_framework.response import Response
 from rest_framework import generics, status
 
 from django.contrib.gis.geos import GEOSGeometry
+from django.db import transaction
+from django.urls import reverse
 
-from .models import Plots
+from . import metrics
+from .batch import FILTERS
+from .changes import lock_owners
+from .geometry import GeometryError, parse_geometry
+from .imports import PlotImportError, file_type
+from .models import PlotExport, PlotImport, PlotOwnerStats, Plots
+from .overlaps import (
+    find_overlaps,
+    overlaps_message,
+    parse_min_area,
+    parse_overlap_policy,
+)
 
 
-class CreatePlotsSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Plots
-        fields = ["plot_name", "plot_geometry", "plot_owner"]
+class MeasuredSerializerMixin:
+    """Adds the time spent (de)serializing to the request metrics."""
+
+    def run_validation(self, *args, **kwargs):
+        with metrics.timer("serializer"):
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, instance):
+        with metrics.timer("serializer"):
+            return super().to_representation(instance)
+
+
+class PlotGeometryValidationMixin:
+    """
+    Parses plot_geometry from GeoJSON, (E)WKT, hex or base64 (E)WKB or a
+    bare ring list, and rejects invalid polygons with a precise message.
+    """
 
-    def create(self, validated_data):
+    def validate_plot_geometry(self, value):
         try:
-            validated_data["plot_geometry"] = GEOSGeometry(
-                "POLYGON (" + validated_data["plot_geometry"] + ")"
-            )
-            return Plots.objects.create(**validated_data)
+            return parse_geometry(value)
+        except GeometryError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class PlotOverlapCheckMixin:
+    """
+    Checks plot_geometry against the existing plots following ?overlap=allow,
+    flag or reject and ?min_overlap_area= (square metres). Flagged overlaps
+    are returned in an "overlaps" field.
+
+    The check runs in the transaction of the save, under the per-owner lock of
+    plots.changes: concurrent writers of the same owner can't both pass it
+    with overlapping plots.
+    """
+
+    overlaps = None
+    overlap_policy = "allow"
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        request = self.context.get("request")
+        if request is None or attrs.get("plot_geometry") is None:
+            return attrs
 
-        except Exception as e:
+        self.overlap_policy = parse_overlap_policy(request.query_params.get("overlap"))
+        self.min_overlap_area = parse_min_area(
+            request.query_params.get("min_overlap_area")
+        )
+        return attrs
+
+    def save(self, **kwargs):
+        if self.overlap_policy == "allow":
+            return super().save(**kwargs)
+
+        owner = self.validated_data.get("plot_owner")
+        owners = {owner.pk} if owner is not None else set()
+        if self.instance is not None:
+            owners.add(self.instance.plot_owner_id)
+        with transaction.atomic():
+            lock_owners(owners)
+            self.check_overlaps(self.validated_data["plot_geometry"])
+            return super().save(**kwargs)
+
+    def check_overlaps(self, geometry):
+        overlaps = find_overlaps(
+            geometry,
+            self.min_overlap_area,
+            exclude_id=self.instance.pk if self.instance else None,
+        )
+        if overlaps and self.overlap_policy == "reject":
             raise serializers.ValidationError(
-                {"detail": "Bad Request"},
-                code=400,
+                {"plot_geometry": [overlaps_message(overlaps)]}
             )
+        self.overlaps = overlaps
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self.overlaps is not None:
+            data["overlaps"] = self.overlaps
+        return data
 
 
-class AreaSerializer(serializers.ModelSerializer):
+class CreatePlotsSerializer(
+    MeasuredSerializerMixin,
+    PlotGeometryValidationMixin,
+    PlotOverlapCheckMixin,
+    serializers.ModelSerializer,
+):
+    class Meta:
+        model = Plots
+        fields = ["plot_name", "plot_geometry", "plot_owner"]
+
+
+class AreaListSerializer(serializers.ListSerializer):
+    """
+    Plot lists as plain dicts built in one step per plot, rather than field by
+    field through OrderedDicts: geometries aside, that machinery took most of
+    the time spent serializing a list.
+    """
+
+    def to_representation(self, data):
+        with metrics.timer("serializer"):
+            return [self.child.plot_representation(plot) for plot in data]
+
+
+class AreaSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     plot_geometry = serializers.SerializerMethodField(method_name="get_plot_geometry")
-    plot_area = serializers.SerializerMethodField(method_name="get_plot_area")
+    plot_area = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Plots
         fields = ["id", "plot_name", "plot_geometry", "plot_area"]
+        list_serializer_class = AreaListSerializer
+
+    def to_representation(self, instance):
+        with metrics.timer("serializer"):
+            return self.plot_representation(instance)
+
+    def plot_representation(self, obj: Plots):
+        return {
+            "id": obj.id,
+            "plot_name": obj.plot_name,
+            "plot_geometry": self.get_plot_geometry(obj),
+            "plot_area": obj.plot_area,
+        }
 
     def get_plot_geometry(self, obj: Plots):
-        return obj.plot_geometry.coords
+        # Geometry already encoded by PostGIS for a binary output format
+        encoded_geometry = getattr(obj, "encoded_geometry", None)
+        if encoded_geometry is not None:
+            return encoded_geometry
+
+        # The view may ask for one of the simplified geometries instead
+        geometry_field = self.context.get("geometry_field", "plot_geometry")
+        geometry = getattr(obj, geometry_field)
+        metrics.add_vertices(geometry.num_points)
+
+        # Coordinates rounded to ?precision= decimals, when asked
+        precision = self.context.get("precision")
+        if precision is None:
+            return geometry.coords
+        return [
+            [(round(x, precision), round(y, precision)) for x, y in ring]
+            for ring in geometry.coords
+        ]
+
+
+class PlotOwnerStatsSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    owner = serializers.CharField(source="owner_id", read_only=True)
+    extent = serializers.ListField(child=serializers.FloatField(), read_only=True)
+
+    class Meta:
+        model = PlotOwnerStats
+        fields = ["owner", "plot_count", "total_area", "extent"]
+
+
+class PlotBatchSerializer(serializers.Serializer):
+    """Plots of a batch request: a list of ids, or filters (see plots.batch)."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, required=False
+    )
+    filter = serializers.DictField(
+        child=serializers.CharField(), allow_empty=False, required=False
+    )
+
+    def validate_filter(self, value):
+        unknown = set(value) - set(FILTERS)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown filters: {', '.join(sorted(unknown))}. "
+                f"Expected {', '.join(FILTERS)}."
+            )
+        return value
+
+    def validate(self, data):
+        if ("ids" in data) == ("filter" in data):
+            raise serializers.ValidationError("Expected either ids or filter.")
+        if "ids" in data:
+            # Once each, in request order
+            data["ids"] = list(dict.fromkeys(data["ids"]))
+        return data
+
+
+class PlotBatchUpdateSerializer(PlotBatchSerializer):
+    plot_name = serializers.CharField(max_length=255)
+
+
+class PlotImportSerializer(serializers.ModelSerializer):
+    owner = serializers.CharField(source="owner_id", read_only=True)
+    file = serializers.FileField(write_only=True)
+
+    def validate_file(self, value):
+        try:
+            file_type(value.name)
+        except PlotImportError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    class Meta:
+        model = PlotImport
+        fields = [
+            "id",
+            "owner",
+            "file",
+            "name_field",
+            "srid",
+            "status",
+            "features_total",
+            "features_read",
+            "plots_created",
+            "plots_rejected",
+            "errors",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = [
+            "status",
+            "features_total",
+            "features_read",
+            "plots_created",
+            "plots_rejected",
+            "errors",
+            "started_at",
+            "finished_at",
+        ]
+
+
+class PlotExportSerializer(serializers.ModelSerializer):
+    owner = serializers.CharField(source="owner_id", read_only=True)
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PlotExport
+        fields = [
+            "id",
+            "owner",
+            "format",
+            "status",
+            "seq",
+            "plots_exported",
+            "size",
+            "sha256",
+            "errors",
+            "download",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = [
+            "status",
+            "seq",
+            "plots_exported",
+            "size",
+            "sha256",
+            "errors",
+            "started_at",
+            "finished_at",
+        ]
 
-    def get_plot_area(self, obj: Plots):
-        return obj.plot_geometry.area
+    def get_download(self, export):
+        if export.status != "done":
+            return None
+        return self.context["request"].build_absolute_uri(
+            reverse("plots_export_download", args=[export.id])
+        )
 
 
-class UpdateDeletePlotsSerializer(serializers.ModelSerializer):
+class UpdateDeletePlotsSerializer(
+    MeasuredSerializerMixin,
+    PlotGeometryValidationMixin,
+    PlotOverlapCheckMixin,
+    serializers.ModelSerializer,
+):
     class Meta:
         model = Plots
         fields = ["id", "plot_name", "plot_geometry", "plot_owner"]
@@ -0,0 +1,178 @@
+"""
+Change notifications for plots.
+
+Every write path reports the plots it touched through the `plots_modified`
+signal, with a list of PlotChange records: single-instance saves and deletes
+(API views, admin) through the model signal receivers below, set-based paths
+(bulk ingestion, ...) by sending it themselves. It is sent in the transaction
+of the change, which the change log is written in.
+
+Cache invalidations run at once, for the rest of the transaction, and again
+once it is committed: readers may cache the data they read before the commit
+in between.
+"""
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.db.models import DEFERRED
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from rest_framework.authtoken.models import Token
+
+from . import (
+    aggregation,
+    authentication,
+    caching,
+    changes as change_log,
+    locate,
+    metrics,
+    routers,
+    stats,
+    tiles,
+)
+from .models import Plots
+
+# action is "created", "updated" or "deleted"; extents are (xmin, ymin, xmax, ymax)
+# and areas in square metres. Previous values and areas are None when unknown.
+PlotChange = namedtuple(
+    "PlotChange",
+    [
+        "action",
+        "plot_id",
+        "owner",
+        "extent",
+        "previous_owner",
+        "previous_extent",
+        "area",
+        "previous_area",
+    ],
+    defaults=[None, None, None, None],
+)
+
+plots_modified = Signal()
+
+
+def now_and_on_commit(function, *args):
+    function(*args)
+    transaction.on_commit(lambda: function(*args))
+
+
+@receiver(post_save, sender=Plots)
+def plot_saved(sender, instance, created, **kwargs):
+    previous = {
+        field: value
+        for field, value in getattr(instance, "_loaded_values", {}).items()
+        if value is not DEFERRED
+    }
+    previous_geometry = previous.get("plot_geometry")
+    change = PlotChange(
+        "created" if created else "updated",
+        instance.pk,
+        instance.plot_owner_id,
+        instance.plot_geometry.extent,
+        previous.get("plot_owner_id"),
+        previous_geometry.extent if previous_geometry else None,
+        instance.plot_area,
+        previous.get("plot_area"),
+    )
+    instance.remember_loaded_values()
+    plots_modified.send(sender=Plots, changes=[change])
+
+
+@receiver(post_delete, sender=Plots)
+def plot_deleted(sender, instance, **kwargs):
+    change = PlotChange(
+        "deleted",
+        instance.pk,
+        instance.plot_owner_id,
+        instance.plot_geometry.extent,
+        area=None
+        if "plot_area" in instance.get_deferred_fields()
+        else instance.plot_area,
+    )
+    plots_modified.send(sender=Plots, changes=[change])
+
+
+@receiver(plots_modified)
+def invalidate_tiles(sender, changes, **kwargs):
+    now_and_on_commit(tiles.invalidate, changes)
+
+
+@receiver(plots_modified)
+def invalidate_aggregates(sender, changes, **kwargs):
+    now_and_on_commit(aggregation.invalidate, changes)
+
+
+@receiver(plots_modified)
+def update_owner_stats(sender, changes, **kwargs):
+    stats.apply_changes(changes)
+
+
+def changed_owners(changes):
+    owners = {change.owner for change in changes}
+    owners.update(change.previous_owner for change in changes if change.previous_owner)
+    return owners
+
+
+@receiver(plots_modified)
+def bump_list_versions(sender, changes, **kwargs):
+    now_and_on_commit(caching.bump_versions, changed_owners(changes))
+
+
+@receiver(plots_modified)
+def invalidate_locate_indexes(sender, changes, **kwargs):
+    locate.indexes.invalidate(changed_owners(changes))
+
+
+@receiver(plots_modified)
+def pin_reads_to_primary(sender, changes, **kwargs):
+    routers.pin_to_primary([*changed_owners(changes), routers.TILES_PIN])
+
+
+# Connected last: the change log lock is then held for the rest of the
+# transaction only
+@receiver(plots_modified)
+def record_change_log(sender, changes, **kwargs):
+    change_log.record(changes)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_list_version(sender, instance, created=True, **kwargs):
+    # A (re)created or deleted user must not see a cached listing of a
+    # previous user of the same name, even without plots
+    if created:
+        now_and_on_commit(caching.bump_versions, [instance.username])
+        routers.pin_to_primary([instance.username])
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_cached_token(sender, instance, **kwargs):
+    authentication.forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user_tokens(sender, instance, created=False, **kwargs):
+    # Deactivated users, or users whose password changed, must authenticate again
+    if not created:
+        authentication.forget_user(
+            instance.pk,
+            list(
+                Token.objects.filter(user_id=instance.pk).values_list("key", flat=True)
+            ),
+        )
+
+
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    # Sent again on every reconnection of the same connection wrapper
+    if not any(
+        isinstance(wrapper, metrics.QueryRecorder)
+        for wrapper in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(metrics.QueryRecorder(connection.alias))
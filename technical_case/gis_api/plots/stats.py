@@ -0,0 +1,188 @@
+"""
+Per-owner plot statistics, stored in PlotOwnerStats.
+
+Summary rows follow the plots_modified changes: counts and areas by
+increments, extents by growing them. An owner's extent is only recomputed
+from their plots when a removed plot touched its boundary, and their whole
+row when a change lacks the previous values of a plot. rebuild() recomputes
+rows from scratch.
+
+Changes are applied under the per-owner lock of the change log
+(plots.changes.lock_owners): writers of the same owner apply theirs one
+after the other, so the first plots of an owner created at once are counted
+in a single row.
+"""
+from collections import defaultdict
+
+from django.contrib.gis.db.models import Extent
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .changes import lock_owners
+from .models import PlotOwnerStats, Plots
+
+EXTENT_FIELDS = ["xmin", "ymin", "xmax", "ymax"]
+
+
+def summarize(queryset):
+    """Count, total area and extent of the plots of the queryset, per owner."""
+    rows = (
+        queryset.order_by()
+        .values("plot_owner")
+        .annotate(
+            plot_count=Count("id"),
+            total_area=Coalesce(Sum("plot_area"), 0.0),
+            extent=Extent("plot_geometry"),
+        )
+    )
+    return {row["plot_owner"]: row for row in rows}
+
+
+def extent_fields(extent):
+    return dict(zip(EXTENT_FIELDS, extent or [None] * 4))
+
+
+def union(extent, other):
+    if extent is None:
+        return other
+    return (
+        min(extent[0], other[0]),
+        min(extent[1], other[1]),
+        max(extent[2], other[2]),
+        max(extent[3], other[3]),
+    )
+
+
+def touches_boundary(extent, stats):
+    """True when `extent` reaches an edge of the stored extent of `stats`."""
+    return (
+        extent[0] <= stats.xmin
+        or extent[1] <= stats.ymin
+        or extent[2] >= stats.xmax
+        or extent[3] >= stats.ymax
+    )
+
+
+def rebuild(owners=None):
+    """
+    Recompute the summary rows of `owners`, or of every owner when None, from
+    the plots table. Returns the number of owners having plots.
+    """
+    queryset = Plots.objects.all()
+    stale = PlotOwnerStats.objects.exclude(owner__in=Plots.objects.values("plot_owner"))
+    if owners is not None:
+        queryset = queryset.filter(plot_owner__in=owners)
+        stale = stale.filter(owner__in=owners)
+
+    rows = [
+        PlotOwnerStats(
+            owner_id=owner,
+            plot_count=row["plot_count"],
+            total_area=row["total_area"],
+            **extent_fields(row["extent"]),
+        )
+        for owner, row in summarize(queryset).items()
+    ]
+    with transaction.atomic():
+        stale.delete()
+        # Upserted: rows may be inserted meanwhile by writers of other owners
+        PlotOwnerStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["owner"],
+            update_fields=["plot_count", "total_area", *EXTENT_FIELDS],
+        )
+    return len(rows)
+
+
+def refresh_extent(owner):
+    """Recompute the extent of `owner` from their plots, in one query."""
+    extent = Plots.objects.filter(plot_owner=owner).aggregate(
+        extent=Extent("plot_geometry")
+    )["extent"]
+    PlotOwnerStats.objects.filter(owner_id=owner).update(**extent_fields(extent))
+
+
+def apply_changes(changes):
+    """Update the summary rows of the owners of the changed plots."""
+    deltas = defaultdict(lambda: {"count": 0, "area": 0.0, "extent": None})
+    removed_extents = defaultdict(list)
+    to_rebuild = set()
+    # Plots added without their area (bulk paths): summed from the table
+    unmeasured_ids = []
+
+    for change in changes:
+        if change.action == "deleted":
+            removed = (change.owner, change.area, change.extent)
+        elif change.action == "updated":
+            removed = (
+                change.previous_owner,
+                change.previous_area,
+                change.previous_extent,
+            )
+        else:
+            removed = None
+
+        if removed is not None:
+            owner, area, extent = removed
+            if None in removed:
+                to_rebuild.add(owner or change.owner)
+            else:
+                deltas[owner]["count"] -= 1
+                deltas[owner]["area"] -= area
+                removed_extents[owner].append(extent)
+
+        if change.action != "deleted":
+            if change.area is None:
+                unmeasured_ids.append(change.plot_id)
+            else:
+                delta = deltas[change.owner]
+                delta["count"] += 1
+                delta["area"] += change.area
+                delta["extent"] = union(delta["extent"], change.extent)
+
+    if unmeasured_ids:
+        for owner, row in summarize(
+            Plots.objects.filter(pk__in=unmeasured_ids)
+        ).items():
+            delta = deltas[owner]
+            delta["count"] += row["plot_count"]
+            delta["area"] += row["total_area"]
+            delta["extent"] = union(delta["extent"], row["extent"])
+
+    with transaction.atomic():
+        lock_owners({*deltas, *to_rebuild})
+        for owner, delta in deltas.items():
+            if owner in to_rebuild:
+                continue
+            values = {
+                "plot_count": F("plot_count") + delta["count"],
+                "total_area": F("total_area") + delta["area"],
+            }
+            if delta["extent"] is not None:
+                for field, value, function in zip(
+                    EXTENT_FIELDS, delta["extent"], [Least, Least, Greatest, Greatest]
+                ):
+                    values[field] = function(Coalesce(field, Value(value)), value)
+
+            if not PlotOwnerStats.objects.filter(owner_id=owner).update(**values):
+                # First plots of the owner, or an owner being deleted
+                if delta["count"] > 0:
+                    PlotOwnerStats.objects.create(
+                        owner_id=owner,
+                        plot_count=delta["count"],
+                        total_area=delta["area"],
+                        **extent_fields(delta["extent"]),
+                    )
+            elif removed_extents[owner]:
+                stats = PlotOwnerStats.objects.get(owner_id=owner)
+                if stats.plot_count <= 0:
+                    stats.delete()
+                elif stats.extent is None or any(
+                    touches_boundary(extent, stats) for extent in removed_extents[owner]
+                ):
+                    refresh_extent(owner)
+
+        if to_rebuild:
+            rebuild(to_rebuild)
@@ -1,7 +1,49 @@
+import base64
+import gzip
+import hashlib
+import io
+import json
+import re
+import sqlite3
+import struct
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry, Point, Polygon
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, router, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
-from plots.models import Plots, User
+from plots import (
+    authentication,
+    caching,
+    changes,
+    compression,
+    imports,
+    locate,
+    metrics,
+)
+from plots.benchmarks import generate_plots, polygon_coords
+from plots.filters import spatial_filter
+from plots.overlaps import CONFLICTS_SQL
+from plots.routers import TILES_PIN, replica_reads
+from plots import urls as plots_urls
+from plots.models import PlotExport, PlotImport, PlotOwnerStats, Plots, User
+from plots.tiles import (
+    simplify_level as tile_simplify_level,
+    tile_cache_key,
+    tile_range,
+)
 
 
 class CreatePlotTests(APITestCase):
@@ -70,6 +112,244 @@ class CreatePlotTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_plot_geometry_formats(self):
+        """
+        Ensure plot geometries are accepted as GeoJSON, WKT, hex and base64 WKB
+        """
+        polygon = Polygon(
+            ((0.0, 0.0), (0.1, 0.0), (0.1, 0.1), (0.0, 0.1), (0.0, 0.0)), srid=4326
+        )
+        geometries = [
+            json.loads(polygon.geojson),
+            polygon.geojson,
+            polygon.wkt,
+            polygon.ewkt,
+            polygon.hexewkb.decode(),
+            base64.b64encode(bytes(polygon.wkb)).decode(),
+        ]
+        for geometry in geometries:
+            data = {
+                "plot_name": "plot1",
+                "plot_geometry": geometry,
+                "plot_owner": "user1",
+            }
+            response = self.client.post("/plots/", data=data, format="json")
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            created = Plots.objects.latest("id")
+            self.assertTrue(created.plot_geometry.equals_exact(polygon))
+            self.assertEqual(created.plot_geometry.srid, 4326)
+
+    def test_create_plot_with_invalid_geometry_messages(self):
+        """
+        Ensure invalid geometries are rejected with a message telling why
+        """
+        geometries = {
+            "(0 0, 1 1, 1 0, 0 1, 0 0)": "Self-intersection",
+            "(0 0, 1 0, 1 1, 0 1)": "must be closed",
+            "POINT (0 0)": "must be a Polygon",
+            "SRID=3857;POLYGON ((0 0, 1 0, 1 1, 0 0))": "SRID must be 4326",
+            '{"type": "Polygon", "coordinates": [[[0, 0], [1, 0], [1, 1]]]}': (
+                "at least 4 positions"
+            ),
+        }
+        for geometry, message in geometries.items():
+            data = {
+                "plot_name": "plot1",
+                "plot_geometry": geometry,
+                "plot_owner": "user1",
+            }
+            response = self.client.post("/plots/", data=data, format="json")
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(message, response.data["plot_geometry"][0])
+        self.assertFalse(Plots.objects.exists())
+
+    def test_create_plot_with_too_many_vertices(self):
+        """
+        Ensure polygons with more than PLOTS_MAX_VERTICES vertices are rejected
+        """
+        data = {
+            "plot_name": "plot1",
+            "plot_geometry": "(0 0, 0.1 0, 0.1 0.1, 0 0.1, 0 0)",
+            "plot_owner": "user1",
+        }
+        with self.settings(PLOTS_MAX_VERTICES=4):
+            response = self.client.post("/plots/", data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("more than the 4 allowed", response.data["plot_geometry"][0])
+
+    def test_create_plot_with_repaired_geometry(self):
+        """
+        Ensure invalid polygons are repaired when PLOTS_REPAIR_INVALID_GEOMETRIES is set
+        """
+        data = {
+            "plot_name": "plot1",
+            # Square with a spike going out of its top edge and back
+            "plot_geometry": "(0 0, 1 0, 1 1, 0.5 1, 0.5 2, 0.5 1, 0 1, 0 0)",
+            "plot_owner": "user1",
+        }
+        with self.settings(PLOTS_REPAIR_INVALID_GEOMETRIES=True):
+            response = self.client.post("/plots/", data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        plot = Plots.objects.get()
+        self.assertTrue(plot.plot_geometry.valid)
+        self.assertAlmostEqual(plot.plot_geometry.area, 1.0)
+
+    def test_create_plot_with_collinear_ring(self):
+        """
+        Ensure a ring of collinear points, that can't be repaired, is rejected
+        """
+        data = {
+            "plot_name": "plot1",
+            "plot_geometry": "(0 0, 1 0, 2 0, 0 0)",
+            "plot_owner": "user1",
+        }
+        with self.settings(PLOTS_REPAIR_INVALID_GEOMETRIES=True):
+            response = self.client.post("/plots/", data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("can't be repaired", response.data["plot_geometry"][0])
+        self.assertFalse(Plots.objects.exists())
+
+
+class BulkCreatePlotsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        self.user.set_password("password_1234")
+        self.user.save()
+
+    @staticmethod
+    def feature(plot_name, plot_owner="user1", size=0.1):
+        return {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [[0.0, 0.0], [size, 0.0], [size, size], [0.0, size], [0.0, 0.0]]
+                ],
+            },
+            "properties": {"plot_name": plot_name, "plot_owner": plot_owner},
+        }
+
+    def test_bulk_create_from_feature_collection(self):
+        """
+        Ensure every feature of a FeatureCollection is inserted and reported
+        """
+        data = {
+            "type": "FeatureCollection",
+            "features": [self.feature(f"plot{i}") for i in range(5)],
+        }
+        response = self.client.post("/plots/bulk/", data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 5)
+        self.assertEqual(Plots.objects.filter(plot_owner="user1").count(), 5)
+        self.assertEqual(
+            [result["index"] for result in response.data["results"]], list(range(5))
+        )
+
+    def test_bulk_create_from_ndjson_reports_invalid_items(self):
+        """
+        Ensure invalid NDJSON items are reported without blocking valid ones
+        """
+        lines = [
+            json.dumps(self.feature("plot1")),
+            json.dumps(self.feature("plot2", plot_owner="unknown")),
+            "{not json",
+            json.dumps(self.feature("plot3")),
+        ]
+        response = self.client.post(
+            "/plots/bulk/",
+            data="\n".join(lines),
+            content_type="application/x-ndjson",
+        )
+
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(statuses, ["created", "error", "error", "created"])
+        self.assertIn("plot_owner", response.data["results"][1]["errors"])
+        self.assertEqual(Plots.objects.count(), 2)
+
+    def test_bulk_create_overlap_policy(self):
+        """
+        Ensure ?overlap= rejects or flags features overlapping existing plots
+        or earlier features of the request
+        """
+        existing = Plots.objects.create(
+            plot_name="existing",
+            plot_geometry=Polygon.from_bbox((0, 0, 0.1, 0.1)),
+            plot_owner=self.user,
+        )
+        away = self.feature("away")
+        away["geometry"]["coordinates"] = [
+            [[1.0, 1.0], [1.1, 1.0], [1.1, 1.1], [1.0, 1.1], [1.0, 1.0]]
+        ]
+        data = {
+            "type": "FeatureCollection",
+            "features": [self.feature("overlapping"), away, away],
+        }
+        response = self.client.post(
+            "/plots/bulk/?overlap=reject", data=data, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data["results"]
+        self.assertEqual(
+            [result["status"] for result in results], ["error", "created", "error"]
+        )
+        self.assertIn(
+            f"Overlaps existing plots: {existing.id} (",
+            results[0]["errors"]["plot_geometry"][0],
+        )
+        self.assertEqual(
+            results[2]["errors"]["plot_geometry"],
+            ["Overlaps features of this request: 1."],
+        )
+        self.assertEqual(Plots.objects.count(), 2)
+
+        data = {"type": "FeatureCollection", "features": [self.feature("flagged")]}
+        response = self.client.post(
+            "/plots/bulk/?overlap=flag", data=data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [overlap["id"] for overlap in response.data["results"][0]["overlaps"]],
+            [existing.id],
+        )
+
+    def test_bulk_create_stores_derived_fields(self):
+        """
+        Ensure bulk inserted plots get their area (in square metres) and
+        simplified geometries computed
+        """
+        data = {
+            "type": "FeatureCollection",
+            "features": [self.feature("plot1", size=1.0)],
+        }
+        self.client.post("/plots/bulk/", data=data, format="json")
+
+        plot = Plots.objects.get()
+        self.assertAlmostEqual(plot.plot_area, 1.2309e10, delta=1e8)
+        self.assertIsNotNone(plot.plot_geometry_lod3)
+
+    def test_bulk_create_uses_one_insert_per_chunk(self):
+        """
+        Ensure plots are inserted in batches rather than one query per plot
+        """
+        data = {
+            "type": "FeatureCollection",
+            "features": [self.feature(f"plot{i}") for i in range(50)],
+        }
+        with self.settings(PLOTS_BULK_CHUNK_SIZE=25):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post("/plots/bulk/", data=data, format="json")
+
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 2)
+
 
 class ListPlotsTests(APITestCase):
     def setUp(self):
@@ -89,6 +369,22 @@ class ListPlotsTests(APITestCase):
             plot_owner=User.objects.filter(username="user1")[0],
         )
 
+    def test_created_plot_area_is_geodesic(self):
+        """
+        Ensure plot area is stored in square metres, not square degrees
+        """
+        plot = Plots.objects.get(plot_name="plot2")
+        self.assertAlmostEqual(plot.plot_area, 1.2309e10, delta=1e8)
+
+    def test_listed_plot_area_is_read_from_stored_column(self):
+        """
+        Ensure list endpoint returns the stored area without recomputing it
+        """
+        Plots.objects.filter(plot_name="plot1").update(plot_area=42.0)
+
+        response = self.client.get("/plots/user1")
+        self.assertEqual(response.data[0]["plot_area"], 42.0)
+
     def test_returned_plot_list_length(self):
         """
         Ensure that plot list endpoints returns ALL plots in DB for a specific user
@@ -99,124 +395,2510 @@ class ListPlotsTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
 
+    def test_plot_list_is_paginated_by_keyset(self):
+        """
+        Ensure pages can be walked through the Link header without gaps or duplicates
+        """
+        for i in range(3, 8):
+            Plots.objects.create(
+                plot_name=f"plot{i}",
+                plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
+                plot_owner=self.user,
+            )
 
-class UpdateDeletePlotTests(APITestCase):
-    def setUp(self):
-        self.user = User.objects.create(username="user1")
-        self.user.set_password("password_1234")
-        self.user.save()
+        ids = []
+        url = "/plots/user1?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data), 3)
+            ids += [plot["id"] for plot in response.data]
+            next_links = [
+                link.split(";")[0].strip(" <>")
+                for link in response.get("Link", "").split(",")
+                if 'rel="next"' in link
+            ]
+            url = next_links[0] if next_links else None
 
-        self.user = User.objects.create(username="user2")
-        self.user.set_password("password_abcd")
-        self.user.save()
+        self.assertEqual(ids, sorted(Plots.objects.values_list("id", flat=True)))
 
-        Plots.objects.create(
-            plot_name="plot1",
-            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
-            plot_owner=User.objects.filter(username="user1")[0],
-        )
+    def test_plot_list_runs_a_single_query(self):
+        """
+        Ensure the owner existence check does not cost an extra query
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/plots/user1")
 
-        Plots.objects.create(
-            plot_name="plot11",
-            plot_geometry="POLYGON ((0.0 0.0,  1.0 0.0, 1.0 1.0, 0.0 1.0, 0.0 0.0))",
-            plot_owner=User.objects.filter(username="user1")[0],
-        )
+        self.assertEqual(len(queries), 1)
 
-        Plots.objects.create(
-            plot_name="plot2",
-            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
-            plot_owner=User.objects.filter(username="user2")[0],
+    def test_plot_list_of_user_without_plots_is_empty(self):
+        """
+        Ensure an existing user without plots gets an empty list, not a 404
+        """
+        User.objects.create(username="user2")
+
+        response = self.client.get("/plots/user2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_plot_list_streams_ndjson_features(self):
+        """
+        Ensure ?format=ndjson streams one GeoJSON Feature per plot
+        """
+        response = self.client.get("/plots/user1?format=ndjson")
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        features = [json.loads(line) for line in lines]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [feature["properties"]["plot_name"] for feature in features],
+            ["plot1", "plot2"],
         )
+        self.assertEqual(features[0]["geometry"]["type"], "Polygon")
 
-        Plots.objects.create(
-            plot_name="plot21",
-            plot_geometry="POLYGON ((0.0 0.0,  1.0 0.0, 1.0 1.0, 0.0 1.0, 0.0 0.0))",
-            plot_owner=User.objects.filter(username="user2")[0],
+    def test_plot_list_streams_geojson_feature_collection(self):
+        """
+        Ensure ?format=geojson streams a single, valid FeatureCollection
+        """
+        response = self.client.get("/plots/user1?format=geojson")
+
+        collection = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            response["Content-Type"], "application/geo+json; charset=utf-8"
         )
+        self.assertEqual(collection["type"], "FeatureCollection")
+        self.assertEqual(len(collection["features"]), 2)
 
-    def test_update_plot_name_with_wrong_password_impossible(self):
+    def test_plot_list_of_unknown_user_is_not_found(self):
         """
-        Ensure that updating plot name with wrong password is impossible
+        Ensure listing plots of an unknown user returns a 404
         """
-        url = "/plots/user1/1"
+        response = self.client.get("/plots/unknown")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-        self.user2Token = self.client.post(
-            "/token_delivery/", data={"username": "user2", "password": "password_abcd"}
-        ).data["token"]
+        response = self.client.get("/plots/unknown?format=ndjson")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-        response = self.client.patch(
-            url,
-            HTTP_Authorization=f"Token {self.user2Token}",
+
+class AsyncPlotsListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user1")
+        User.objects.create(username="user2")
+        self.plots = [
+            Plots.objects.create(
+                plot_name=f"plot{i}",
+                plot_geometry=f"POLYGON (({i} 0, {i}.5 0, {i}.5 0.5, {i} 0.5, {i} 0))",
+                plot_owner=self.user,
+            )
+            for i in range(3)
+        ]
+
+    def test_async_list_matches_list(self):
+        """
+        Ensure the async list returns the same plots as /plots/<username>
+        """
+        response = self.client.get("/async/plots/user1?simplify=1")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), self.client.get("/plots/user1?simplify=1").json()
         )
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
-    def test_update_plot_name_with_authenticated_user(self):
+    def test_async_list_pagination(self):
         """
-        Ensure that update plot name and plot_geometry is OK when authenticated
+        Ensure the async list is paginated by keyset with a Link header
+        """
+        response = self.client.get("/async/plots/user1?page_size=2")
+        self.assertEqual(
+            [plot["id"] for plot in response.json()],
+            [self.plots[0].id, self.plots[1].id],
+        )
 
-        plot1 becomes plot100 and plot_geometry becomes "POLYGON((0.0 0.0,  0.2 0.0, 0.2 0.2, 0.0 0.2, 0.0 0.0))"
+        response = self.client.get(response["Link"].split(">")[0][1:])
+        self.assertEqual([plot["id"] for plot in response.json()], [self.plots[2].id])
+        self.assertNotIn("Link", response)
+
+    def test_async_list_errors(self):
+        """
+        Ensure unknown users get a 404 and bad parameters a 400
         """
+        self.assertEqual(self.client.get("/async/plots/user2").json(), [])
+        response = self.client.get("/async/plots/unknown")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get("/async/plots/user1?bbox=1,2")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("bbox", response.json())
 
-        first_plot_id = self.client.get("/plots/user1").data[0]["id"]
+    def test_async_retrieve(self):
+        """
+        Ensure a plot is retrieved from its owner's URL only
+        """
+        plot = self.plots[1]
+        response = self.client.get(f"/async/plots/user1/{plot.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["plot_name"], "plot1")
+        self.assertAlmostEqual(response.json()["plot_area"], plot.plot_area)
 
-        url = f"/plots/user1/{first_plot_id}"
+        response = self.client.get(f"/async/plots/user2/{plot.id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(f"/async/plots/user1/{plot.id}")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
-        self.user1Token = self.client.post(
-            "/token_delivery/", data={"username": "user1", "password": "password_1234"}
-        ).data["token"]
 
-        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.user1Token)
+class BinaryFormatPlotsListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user1")
+        for i in range(3):
+            Plots.objects.create(
+                plot_name=f"plot{i}",
+                plot_geometry=Point(i, i).buffer(0.01, quadsegs=32),
+                plot_owner=self.user,
+            )
 
-        response = self.client.patch(
-            url,
-            data={
-                "plot_name": "plot100",
-                "plot_geometry": "POLYGON((0.0 0.0,  0.2 0.0, 0.2 0.2, 0.0 0.2, 0.0 0.0))",
-            },
-            format="json",
-        )
-        updatedPlot = Plots.objects.filter(id=first_plot_id)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(updatedPlot[0].plot_name, "plot100")
+    @staticmethod
+    def read_records(content):
+        records, offset = [], 0
+        while offset < len(content):
+            plot_id, size = struct.unpack_from("<qI", content, offset)
+            offset += 12
+            records.append((plot_id, content[offset : offset + size]))
+            offset += size
+        return records
+
+    def test_plot_list_as_wkb_records(self):
+        """
+        Ensure ?format=wkb returns every plot as an (id, WKB geometry) record
+        """
+        response = self.client.get("/plots/user1?format=wkb")
+
+        records = self.read_records(response.content)
+        self.assertEqual(response["Content-Type"], "application/vnd.plots.wkb")
         self.assertEqual(
-            updatedPlot[0].plot_geometry,
-            "SRID=4326;POLYGON ((0 0, 0.2 0, 0.2 0.2, 0 0.2, 0 0))",
+            [plot_id for plot_id, _ in records],
+            list(Plots.objects.order_by("id").values_list("id", flat=True)),
         )
+        for plot_id, wkb in records:
+            self.assertTrue(
+                GEOSGeometry(memoryview(wkb)).equals_exact(
+                    Plots.objects.get(id=plot_id).plot_geometry
+                )
+            )
 
-    def test_delete_plot_with_wrong_password_impossible(self):
+    def test_plot_list_as_twkb_is_negotiated_and_smaller(self):
         """
-        Ensure that deleting plot name with wrong password is impossible
+        Ensure TWKB is selected from the Accept header and is more compact than WKB
         """
-        url = "/plots/user2/6"
+        wkb = self.client.get("/plots/user1?format=wkb")
+        twkb = self.client.get("/plots/user1", HTTP_ACCEPT="application/vnd.plots.twkb")
 
-        self.user2Token = self.client.post(
-            "/token_delivery/",
-            data={"username": "user2", "password": "password_abcd"},
-        ).data["token"]
+        self.assertEqual(twkb["Content-Type"], "application/vnd.plots.twkb")
+        self.assertEqual(len(self.read_records(twkb.content)), 3)
+        self.assertLess(len(twkb.content), len(wkb.content) / 2)
 
-        response = self.client.delete(
-            url,
-            HTTP_Authorization=f"Token {self.user2Token}",
+    def test_plot_list_with_hex_wkb_geometries(self):
+        """
+        Ensure ?format=wkb-hex returns the JSON list with hexadecimal WKB geometries
+        """
+        response = self.client.get("/plots/user1?format=wkb-hex")
+
+        plots = json.loads(response.content)
+        self.assertEqual(len(plots), 3)
+        self.assertEqual(GEOSGeometry(plots[0]["plot_geometry"]).geom_type, "Polygon")
+        self.assertEqual(plots[0]["plot_name"], "plot0")
+
+    def test_plot_list_as_flatgeobuf(self):
+        """
+        Ensure ?format=fgb returns a FlatGeobuf file
+        """
+        response = self.client.get("/plots/user1?format=fgb")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/flatgeobuf")
+        self.assertEqual(response.content[:3], b"fgb")
+
+
+class CachedPlotsListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user1")
+        self.user.set_password("password_1234")
+        self.user.save()
+        self.plot = Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
+            plot_owner=self.user,
         )
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
-    def test_delete_plot_empties_plot_attribute_in_db(self):
+    def test_plot_list_is_served_from_cache(self):
         """
-        Ensure that deleting a plot when authenticated is removing it from DB
+        Ensure an unchanged plot list is not queried twice
         """
-        url = "/plots/user2/6"
+        first = self.client.get("/plots/user1")
 
-        original_plots_count = Plots.objects.count()
+        with self.assertNumQueries(0):
+            second = self.client.get("/plots/user1")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
 
-        self.user1Token = self.client.post(
+    def test_plot_list_cache_depends_on_query_parameters(self):
+        """
+        Ensure differently filtered lists are cached separately
+        """
+        self.client.get("/plots/user1")
+        response = self.client.get("/plots/user1?bbox=10,10,11,11")
+
+        self.assertEqual(response.data, [])
+
+    def test_unchanged_plot_list_is_not_modified(self):
+        """
+        Ensure a client sending back the ETag gets a 304
+        """
+        etag = self.client.get("/plots/user1")["ETag"]
+
+        response = self.client.get("/plots/user1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_plot_list_cache_is_invalidated_by_writes(self):
+        """
+        Ensure updating, creating or deleting a plot invalidates the cached list
+        """
+        token = self.client.post(
             "/token_delivery/", data={"username": "user1", "password": "password_1234"}
         ).data["token"]
 
-        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.user1Token)
+        etag = self.client.get("/plots/user1")["ETag"]
+        self.client.patch(
+            f"/plots/user1/{self.plot.id}",
+            data={"plot_name": "renamed"},
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {token}",
+        )
+        response = self.client.get("/plots/user1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["plot_name"], "renamed")
 
-        response = self.client.delete(url)
+        self.client.post(
+            "/plots/",
+            data={
+                "plot_name": "plot2",
+                "plot_geometry": "(0.0 0.0,  0.1 0, 0.1 0.1, 0.0 0.1, 0.0 0.0)",
+                "plot_owner": "user1",
+            },
+            format="json",
+        )
+        self.assertEqual(len(self.client.get("/plots/user1").data), 2)
 
-        current_plots_count = Plots.objects.count()
+        self.plot.delete()
+        self.assertEqual(len(self.client.get("/plots/user1").data), 1)
 
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(current_plots_count, original_plots_count - 1)
+    def test_plot_list_version_bumped_after_commit(self):
+        """
+        Ensure lists cached before a change is committed are invalidated
+        once it is
+        """
+        version = caching.owner_version("user1")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.plot.delete()
+        before_commit = caching.owner_version("user1")
+        self.assertNotEqual(before_commit, version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(caching.owner_version("user1"), before_commit)
+
+    def test_local_cache_refused_with_several_workers(self):
+        """
+        Ensure per-process caches are refused when several processes serve
+        the API
+        """
+        caching.check_shared_caches()
+        with self.settings(PLOTS_WORKERS=4):
+            with self.assertRaises(ImproperlyConfigured):
+                caching.check_shared_caches()
+
+
+class SimplifiedPlotsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        # A disc of 1001 vertices, about 2 km wide
+        self.plot = Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry=Point(0.5, 0.5).buffer(0.01, quadsegs=250),
+            plot_owner=self.user,
+        )
+
+    def test_simplified_geometries_are_stored_on_save(self):
+        """
+        Ensure every level of detail is computed, coarser levels having fewer vertices
+        """
+        plot = Plots.objects.get(id=self.plot.id)
+        vertices = [
+            getattr(plot, field).num_points
+            for field in [
+                "plot_geometry",
+                *[f"plot_geometry_lod{i}" for i in (1, 2, 3)],
+            ]
+        ]
+        self.assertEqual(vertices[0], 1001)
+        self.assertEqual(vertices, sorted(vertices, reverse=True))
+        self.assertLess(vertices[3], 100)
+
+    def test_plot_list_returns_requested_level_of_detail(self):
+        """
+        Ensure ?simplify= selects the simplified geometry
+        """
+        full = self.client.get("/plots/user1").data[0]["plot_geometry"]
+        simplified = self.client.get("/plots/user1?simplify=3").data[0]["plot_geometry"]
+
+        self.assertEqual(len(full[0]), 1001)
+        self.assertLess(len(simplified[0]), 100)
+
+    def test_invalid_level_of_detail_is_bad_request(self):
+        """
+        Ensure unknown levels of detail are rejected
+        """
+        response = self.client.get("/plots/user1?simplify=9")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tiles_use_coarser_geometries_at_low_zoom(self):
+        """
+        Ensure low zoom tiles pick a simplified geometry and high zoom ones the original
+        """
+        self.assertEqual(tile_simplify_level(0), 3)
+        self.assertEqual(tile_simplify_level(16), 0)
+
+
+class SpatialFilterPlotsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+
+        # 100 x 50 grid of 0.01 degree square plots
+        Plots.objects.bulk_create(
+            Plots(
+                plot_name=f"plot{x}_{y}",
+                plot_geometry=Polygon.from_bbox(
+                    (x / 100, y / 100, (x + 1) / 100, (y + 1) / 100)
+                ),
+                plot_owner=self.user,
+            )
+            for x in range(100)
+            for y in range(50)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE plots_plots")
+
+    def test_bbox_filter_returns_intersecting_plots(self):
+        """
+        Ensure only plots intersecting the bbox are listed
+        """
+        response = self.client.get("/plots/user1?bbox=0.105,0.105,0.125,0.115")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(plot["plot_name"] for plot in response.data),
+            [
+                "plot10_10",
+                "plot10_11",
+                "plot11_10",
+                "plot11_11",
+                "plot12_10",
+                "plot12_11",
+            ],
+        )
+
+    def test_dwithin_filter_uses_metres(self):
+        """
+        Ensure dwithin distances are geodesic metres, not degrees
+        """
+        # About 555 m from the centre of plot50_25 to its edges
+        response = self.client.get("/plots/user1?dwithin=0.505,0.255,500")
+        self.assertEqual([plot["plot_name"] for plot in response.data], ["plot50_25"])
+
+        response = self.client.get("/plots/user1?dwithin=0.505,0.255,600")
+        self.assertEqual(len(response.data), 5)
+
+    def test_intersects_filter_accepts_geojson(self):
+        """
+        Ensure a GeoJSON geometry can be used as intersects filter
+        """
+        response = self.client.get(
+            "/plots/user1",
+            {"intersects": '{"type": "Point", "coordinates": [0.505, 0.255]}'},
+        )
+        self.assertEqual([plot["plot_name"] for plot in response.data], ["plot50_25"])
+
+    def test_invalid_spatial_filter_is_bad_request(self):
+        """
+        Ensure malformed filters are rejected
+        """
+        response = self.client.get("/plots/user1?bbox=1,2,3")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_geojson_intersects_is_bad_request(self):
+        """
+        Ensure GeoJSON rejected by OGR is a bad request, not a server error
+        """
+        response = self.client.get("/plots/user1", {"intersects": '{"type": "Foo"}'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("intersects", response.data)
+
+    def test_spatial_filter_query_plan_uses_gist_index(self):
+        """
+        Ensure spatial filters are answered with the plot_geometry GiST index
+        """
+        for params in (
+            {"bbox": "0.105,0.105,0.125,0.115"},
+            {"dwithin": "0.505,0.255,500"},
+        ):
+            queryset = spatial_filter(Plots.objects.filter(plot_owner="user1"), params)
+            plan = queryset.explain()
+            self.assertIn("Index", plan)
+            self.assertIn("plots_plots_plot_geometry_", plan)
+
+
+class PlotTilesTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user1")
+        self.plot = Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry="POLYGON((10.0 10.0,  10.1 10.0, 10.1 10.1, 10.0 10.1, 10.0 10.0))",
+            plot_owner=self.user,
+        )
+
+    def test_tile_contains_plots(self):
+        """
+        Ensure a tile covering a plot is returned as a vector tile
+        """
+        response = self.client.get("/tiles/0/0/0.pbf")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertIn(b"plot1", response.content)
+        self.assertIn("max-age", response["Cache-Control"])
+
+    def test_tile_without_plots_is_empty(self):
+        """
+        Ensure tiles without plots, for the owner filter too, have no content
+        """
+        self.assertEqual(
+            self.client.get("/tiles/4/0/0.pbf").status_code,
+            status.HTTP_204_NO_CONTENT,
+        )
+        self.assertEqual(
+            self.client.get("/tiles/0/0/0.pbf?owner=user2").status_code,
+            status.HTTP_204_NO_CONTENT,
+        )
+
+    def test_out_of_range_tile_is_not_found(self):
+        """
+        Ensure tile coordinates outside of the zoom level grid are rejected
+        """
+        response = self.client.get("/tiles/1/2/0.pbf")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # Rejected before 2**z is computed
+        response = self.client.get("/tiles/100000000/0/0.pbf")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tile_is_served_from_cache(self):
+        """
+        Ensure a tile is only built once by PostGIS
+        """
+        first = self.client.get("/tiles/0/0/0.pbf")
+
+        with self.assertNumQueries(0):
+            second = self.client.get("/tiles/0/0/0.pbf")
+        self.assertEqual(first.content, second.content)
+
+    def test_tile_cache_is_invalidated_when_plot_changes(self):
+        """
+        Ensure cached tiles showing a modified plot are rebuilt
+        """
+        self.client.get("/tiles/0/0/0.pbf")
+        self.client.get("/tiles/0/0/0.pbf?owner=user1")
+
+        self.plot.plot_name = "renamed"
+        self.plot.save()
+
+        for url in ("/tiles/0/0/0.pbf", "/tiles/0/0/0.pbf?owner=user1"):
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertIn(b"renamed", response.content)
+
+    def test_tile_versions_replaced_after_commit(self):
+        """
+        Ensure tiles cached before a change is committed are never read once
+        it is, and tiles away from the plot stay cached
+        """
+        key = tile_cache_key(12, 2162, 1933, None)
+        far_key = tile_cache_key(12, 0, 0, None)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.plot.plot_name = "renamed"
+            self.plot.save()
+        before_commit = tile_cache_key(12, 2162, 1933, None)
+        self.assertNotEqual(before_commit, key)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(tile_cache_key(12, 2162, 1933, None), before_commit)
+        self.assertEqual(tile_cache_key(12, 0, 0, None), far_key)
+
+    def test_tile_range_covers_plot_extent(self):
+        """
+        Ensure invalidation targets the tiles around a plot only
+        """
+        self.assertEqual(tile_range((10.0, 10.0, 10.1, 10.1), 0), ((0, 0), (0, 0)))
+        self.assertEqual(tile_range((10.0, 10.0, 10.1, 10.1), 2), ((2, 2), (1, 1)))
+        self.assertEqual(
+            tile_range((10.0, 10.0, 10.1, 10.1), 10), ((540, 540), (483, 483))
+        )
+
+
+class UpdateDeletePlotTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        self.user.set_password("password_1234")
+        self.user.save()
+
+        self.user = User.objects.create(username="user2")
+        self.user.set_password("password_abcd")
+        self.user.save()
+
+        Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
+            plot_owner=User.objects.filter(username="user1")[0],
+        )
+
+        Plots.objects.create(
+            plot_name="plot11",
+            plot_geometry="POLYGON ((0.0 0.0,  1.0 0.0, 1.0 1.0, 0.0 1.0, 0.0 0.0))",
+            plot_owner=User.objects.filter(username="user1")[0],
+        )
+
+        Plots.objects.create(
+            plot_name="plot2",
+            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
+            plot_owner=User.objects.filter(username="user2")[0],
+        )
+
+        Plots.objects.create(
+            plot_name="plot21",
+            plot_geometry="POLYGON ((0.0 0.0,  1.0 0.0, 1.0 1.0, 0.0 1.0, 0.0 0.0))",
+            plot_owner=User.objects.filter(username="user2")[0],
+        )
+
+    def test_update_plot_name_with_wrong_password_impossible(self):
+        """
+        Ensure that updating plot name with wrong password is impossible
+        """
+        url = "/plots/user1/1"
+
+        self.user2Token = self.client.post(
+            "/token_delivery/", data={"username": "user2", "password": "password_abcd"}
+        ).data["token"]
+
+        response = self.client.patch(
+            url,
+            HTTP_Authorization=f"Token {self.user2Token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_update_plot_name_with_authenticated_user(self):
+        """
+        Ensure that update plot name and plot_geometry is OK when authenticated
+
+        plot1 becomes plot100 and plot_geometry becomes "POLYGON((0.0 0.0,  0.2 0.0, 0.2 0.2, 0.0 0.2, 0.0 0.0))"
+        """
+
+        first_plot_id = self.client.get("/plots/user1").data[0]["id"]
+
+        url = f"/plots/user1/{first_plot_id}"
+
+        self.user1Token = self.client.post(
+            "/token_delivery/", data={"username": "user1", "password": "password_1234"}
+        ).data["token"]
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.user1Token)
+
+        response = self.client.patch(
+            url,
+            data={
+                "plot_name": "plot100",
+                "plot_geometry": "POLYGON((0.0 0.0,  0.2 0.0, 0.2 0.2, 0.0 0.2, 0.0 0.0))",
+            },
+            format="json",
+        )
+        updatedPlot = Plots.objects.filter(id=first_plot_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(updatedPlot[0].plot_area, 4.9235e8, delta=1e7)
+        self.assertEqual(updatedPlot[0].plot_name, "plot100")
+        self.assertEqual(
+            updatedPlot[0].plot_geometry,
+            "SRID=4326;POLYGON ((0 0, 0.2 0, 0.2 0.2, 0 0.2, 0 0))",
+        )
+
+    def test_delete_plot_with_wrong_password_impossible(self):
+        """
+        Ensure that deleting plot name with wrong password is impossible
+        """
+        url = "/plots/user2/6"
+
+        self.user2Token = self.client.post(
+            "/token_delivery/",
+            data={"username": "user2", "password": "password_abcd"},
+        ).data["token"]
+
+        response = self.client.delete(
+            url,
+            HTTP_Authorization=f"Token {self.user2Token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_delete_plot_empties_plot_attribute_in_db(self):
+        """
+        Ensure that deleting a plot when authenticated is removing it from DB
+        """
+        url = "/plots/user2/6"
+
+        original_plots_count = Plots.objects.count()
+
+        self.user1Token = self.client.post(
+            "/token_delivery/", data={"username": "user1", "password": "password_1234"}
+        ).data["token"]
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.user1Token)
+
+        response = self.client.delete(url)
+
+        current_plots_count = Plots.objects.count()
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(current_plots_count, original_plots_count - 1)
+
+
+class OverlapPlotsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        self.user.set_password("password_1234")
+        self.user.save()
+        User.objects.create(username="user2")
+
+        self.square = Plots.objects.create(
+            plot_name="square",
+            plot_geometry="POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))",
+            plot_owner=self.user,
+        )
+        self.overlapping = Plots.objects.create(
+            plot_name="overlapping",
+            plot_geometry="POLYGON ((0.5 0.5, 1.5 0.5, 1.5 1.5, 0.5 1.5, 0.5 0.5))",
+            plot_owner_id="user2",
+        )
+        # Shares an edge with square, overlaps nothing
+        self.touching = Plots.objects.create(
+            plot_name="touching",
+            plot_geometry="POLYGON ((1 0, 2 0, 2 0.4, 1 0.4, 1 0))",
+            plot_owner=self.user,
+        )
+
+    def create(self, geometry, **params):
+        return self.client.post(
+            "/plots/?" + "&".join(f"{key}={value}" for key, value in params.items()),
+            data={"plot_name": "new", "plot_geometry": geometry, "plot_owner": "user1"},
+            format="json",
+        )
+
+    def test_overlapping_plot_rejected(self):
+        """
+        Ensure ?overlap=reject refuses plots overlapping existing ones, but not
+        plots only sharing an edge with them
+        """
+        response = self.create(
+            "(0.9 0.9, 3 0.9, 3 3, 0.9 3, 0.9 0.9)", overlap="reject"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(
+            f"Overlaps existing plots: {self.square.id} (",
+            response.data["plot_geometry"][0],
+        )
+
+        response = self.create("(2 0, 3 0, 3 1, 2 1, 2 0)", overlap="reject")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_overlapping_plot_flagged(self):
+        """
+        Ensure ?overlap=flag creates the plot and reports what it overlaps
+        """
+        response = self.create("(0 0, 0.2 0, 0.2 0.2, 0 0.2, 0 0)", overlap="flag")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [overlap["id"] for overlap in response.data["overlaps"]], [self.square.id]
+        )
+        self.assertAlmostEqual(
+            response.data["overlaps"][0]["overlap_area"], 4.9e8, delta=1e7
+        )
+
+    def test_overlap_below_threshold_allowed(self):
+        """
+        Ensure overlaps smaller than ?min_overlap_area= are not considered
+        """
+        response = self.create(
+            "(-0.5 0, 0.001 0, 0.001 0.001, -0.5 0.001, -0.5 0)",
+            overlap="reject",
+            min_overlap_area=100000,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.create("(0 0, 1 0, 1 1, 0 0)", overlap="everything")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_overlap_checked_on_update(self):
+        """
+        Ensure updates are checked against every plot but the updated one
+        """
+        token = self.client.post(
+            "/token_delivery/", data={"username": "user1", "password": "password_1234"}
+        ).data["token"]
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token)
+        url = f"/plots/user1/{self.square.id}?overlap=reject"
+
+        response = self.client.patch(
+            url,
+            data={"plot_geometry": "(0 0, 0.4 0, 0.4 0.4, 0 0.4, 0 0)"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(
+            url,
+            data={"plot_geometry": "(0 0, 1.2 0, 1.2 0.3, 0 0.3, 0 0)"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_conflicts_report(self):
+        """
+        Ensure /plots/conflicts/ lists every overlapping pair once, by pages
+        """
+        small = Plots.objects.create(
+            plot_name="small",
+            plot_geometry="POLYGON ((0 0, 0.2 0, 0.2 0.2, 0 0.2, 0 0))",
+            plot_owner=self.user,
+        )
+
+        response = self.client.get("/plots/conflicts/")
+        self.assertEqual(
+            [
+                (conflict["plot_id"], conflict["other_plot_id"])
+                for conflict in response.data
+            ],
+            [(self.square.id, self.overlapping.id), (self.square.id, small.id)],
+        )
+        self.assertEqual(response.data[0]["other_plot_owner"], "user2")
+
+        response = self.client.get("/plots/conflicts/?page_size=1")
+        self.assertEqual(response.data[0]["other_plot_id"], self.overlapping.id)
+        response = self.client.get(response["Link"].split(">")[0][1:])
+        self.assertEqual(response.data[0]["other_plot_id"], small.id)
+        self.assertNotIn("Link", response)
+
+        response = self.client.get("/plots/conflicts/?min_overlap_area=1e9")
+        self.assertEqual(len(response.data), 1)
+
+    def test_conflicts_query_plan_uses_gist_index(self):
+        """
+        Ensure the conflicts self-join scans plots in id order up to the page
+        size, looking their candidates up with the GiST index
+        """
+        # 100 x 50 grid of 0.01 degree square plots
+        Plots.objects.bulk_create(
+            Plots(
+                plot_name=f"plot{x}_{y}",
+                plot_geometry=Polygon.from_bbox(
+                    (x / 100, y / 100, (x + 1) / 100, (y + 1) / 100)
+                ),
+                plot_owner=self.user,
+            )
+            for x in range(100)
+            for y in range(50)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE plots_plots")
+            cursor.execute(
+                "EXPLAIN " + CONFLICTS_SQL,
+                {"after_id": 0, "after_other_id": 0, "min_area": 0, "limit": 100},
+            )
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+
+        self.assertIn("Limit", plan)
+        self.assertIn("plots_plots_plot_geometry_", plan)
+        self.assertNotIn("Seq Scan", plan)
+
+
+class OwnerStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        self.user.set_password("password_1234")
+        self.user.save()
+        User.objects.create(username="user2")
+
+        self.small = Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry="POLYGON ((0 0, 0.1 0, 0.1 0.1, 0 0.1, 0 0))",
+            plot_owner=self.user,
+        )
+        self.large = Plots.objects.create(
+            plot_name="plot2",
+            plot_geometry="POLYGON ((1 1, 2 1, 2 2, 1 2, 1 1))",
+            plot_owner=self.user,
+        )
+
+    def expected_stats(self, owner):
+        plots = Plots.objects.filter(plot_owner=owner)
+        return {
+            "plot_count": plots.count(),
+            "total_area": sum(plot.plot_area for plot in plots),
+        }
+
+    def assertStatsMatchPlots(self, owner, extent):
+        response = self.client.get(f"/plots/{owner}/stats")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = self.expected_stats(owner)
+        self.assertEqual(response.data["plot_count"], expected["plot_count"])
+        self.assertAlmostEqual(response.data["total_area"], expected["total_area"])
+        self.assertEqual(response.data["extent"], extent)
+
+    def test_owner_stats(self):
+        """
+        Ensure an owner's stats hold their plot count, total area and extent
+        """
+        self.assertStatsMatchPlots("user1", [0.0, 0.0, 2.0, 2.0])
+
+    def test_owner_stats_read_in_one_query(self):
+        """
+        Ensure stats are read from the summary table, not computed from plots
+        """
+        with self.assertNumQueries(1):
+            self.client.get("/plots/user1/stats")
+
+    def test_owner_stats_without_plots_or_user(self):
+        """
+        Ensure an owner without plots gets zeros and an unknown user a 404
+        """
+        response = self.client.get("/plots/user2/stats")
+        self.assertEqual(
+            response.data,
+            {"owner": "user2", "plot_count": 0, "total_area": 0.0, "extent": None},
+        )
+
+        response = self.client.get("/plots/unknown/stats")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_owner_stats_follow_updates_and_deletes(self):
+        """
+        Ensure stats follow plot updates, owner changes and deletes, shrinking
+        the extent when a plot on its boundary goes away
+        """
+        self.large.plot_geometry = "POLYGON ((1 1, 3 1, 3 3, 1 3, 1 1))"
+        self.large.save()
+        self.assertStatsMatchPlots("user1", [0.0, 0.0, 3.0, 3.0])
+
+        self.large.plot_owner_id = "user2"
+        self.large.save()
+        self.assertStatsMatchPlots("user1", [0.0, 0.0, 0.1, 0.1])
+        self.assertStatsMatchPlots("user2", [1.0, 1.0, 3.0, 3.0])
+
+        self.small.delete()
+        self.assertStatsMatchPlots("user1", None)
+
+    def test_owner_stats_extent_shrunk_without_rebuild(self):
+        """
+        Ensure removing a plot on the boundary of the extent only recomputes
+        the extent, and removing the last plot drops the owner's stats
+        """
+        with mock.patch("plots.stats.rebuild") as rebuild:
+            self.large.delete()
+            self.assertStatsMatchPlots("user1", [0.0, 0.0, 0.1, 0.1])
+            self.small.delete()
+        rebuild.assert_not_called()
+        self.assertFalse(PlotOwnerStats.objects.filter(owner="user1").exists())
+
+    def test_owner_stats_follow_api_writes(self):
+        """
+        Ensure plots created one by one or in bulk and deleted through the API
+        are counted
+        """
+        self.client.post(
+            "/plots/",
+            data={
+                "plot_name": "plot3",
+                "plot_geometry": "(-1 -1, 0 -1, 0 0, -1 0, -1 -1)",
+                "plot_owner": "user1",
+            },
+            format="json",
+        )
+        feature = {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[4, 4], [5, 4], [5, 5], [4, 5], [4, 4]]],
+            },
+            "properties": {"plot_name": "plot4", "plot_owner": "user1"},
+        }
+        self.client.post(
+            "/plots/bulk/",
+            data={"type": "FeatureCollection", "features": [feature, feature]},
+            format="json",
+        )
+        self.assertStatsMatchPlots("user1", [-1.0, -1.0, 5.0, 5.0])
+
+        token = self.client.post(
+            "/token_delivery/", data={"username": "user1", "password": "password_1234"}
+        ).data["token"]
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token)
+        self.client.delete(f"/plots/user1/{self.large.id}")
+        self.assertStatsMatchPlots("user1", [-1.0, -1.0, 5.0, 5.0])
+
+    def test_all_owners_stats(self):
+        """
+        Ensure /plots/stats/ lists the stats of every owner having plots
+        """
+        Plots.objects.create(
+            plot_name="plot3",
+            plot_geometry="POLYGON ((0 0, 0.1 0, 0.1 0.1, 0 0.1, 0 0))",
+            plot_owner_id="user2",
+        )
+        response = self.client.get("/plots/stats/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(stats["owner"], stats["plot_count"]) for stats in response.data],
+            [("user1", 2), ("user2", 1)],
+        )
+
+    def test_rebuild_plot_stats_command(self):
+        """
+        Ensure the rebuild_plot_stats command recomputes stats from the plots
+        """
+        PlotOwnerStats.objects.filter(owner="user1").update(plot_count=42, xmin=None)
+
+        call_command("rebuild_plot_stats", stdout=io.StringIO())
+
+        self.assertStatsMatchPlots("user1", [0.0, 0.0, 2.0, 2.0])
+
+
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user1")
+        cache.clear()
+
+    def test_reads_opt_in_to_replicas(self):
+        """
+        Ensure only reads in replica_reads() go to a replica, and writes never
+        """
+        with self.settings(REPLICA_DATABASES=["replica1"]):
+            self.assertEqual(router.db_for_read(Plots), "default")
+            with replica_reads("user1"):
+                self.assertEqual(router.db_for_read(Plots), "replica1")
+                self.assertEqual(router.db_for_write(Plots), "default")
+            self.assertEqual(router.db_for_read(Plots), "default")
+
+        with replica_reads("user1"):
+            self.assertEqual(router.db_for_read(Plots), "default")
+
+    def test_reads_pinned_to_primary_after_write(self):
+        """
+        Ensure an owner's reads, and tiles, go to the primary right after they
+        changed a plot, while other owners still read from replicas
+        """
+        with self.settings(REPLICA_DATABASES=["replica1"]):
+            Plots.objects.create(
+                plot_name="plot1",
+                plot_geometry="POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))",
+                plot_owner=self.user,
+            )
+            with replica_reads("user1"):
+                self.assertEqual(router.db_for_read(Plots), "default")
+            with replica_reads(None, TILES_PIN):
+                self.assertEqual(router.db_for_read(Plots), "default")
+            with replica_reads("user2"):
+                self.assertEqual(router.db_for_read(Plots), "replica1")
+
+    def test_replicas_not_migrated(self):
+        """
+        Ensure migrations only run on the primary
+        """
+        with self.settings(REPLICA_DATABASES=["replica1"]):
+            self.assertTrue(router.allow_migrate("default", "plots"))
+            self.assertFalse(router.allow_migrate("replica1", "plots"))
+
+
+class BenchmarkTests(APITestCase):
+    def test_generate_plots_is_reproducible(self):
+        """
+        Ensure the plot generator yields the same valid plots for a seed
+        """
+        plots = list(generate_plots(["user1"], 20, vertices=(5, 9), seed=3))
+        again = list(generate_plots(["user1"], 20, vertices=(5, 9), seed=3))
+
+        self.assertEqual(
+            [plot.plot_geometry.wkt for plot in plots],
+            [plot.plot_geometry.wkt for plot in again],
+        )
+        for plot in plots:
+            self.assertTrue(plot.plot_geometry.valid)
+            self.assertTrue(6 <= plot.plot_geometry.num_points <= 10)
+
+    def test_benchmark_covers_every_endpoint(self):
+        """
+        Ensure the seeded benchmark drives every URL of the API without errors
+        """
+        call_command(
+            "generate_plots",
+            users=2,
+            plots=5,
+            distribution="clustered",
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(Plots.objects.count(), 10)
+        self.assertEqual(PlotOwnerStats.objects.get(owner="bench0000").plot_count, 5)
+
+        output = io.StringIO()
+        call_command("benchmark_api", requests=2, stdout=output)
+        report = json.loads(output.getvalue())
+
+        self.assertEqual(
+            {scenario["url_name"] for scenario in report["scenarios"]},
+            {pattern.name for pattern in plots_urls.urlpatterns},
+        )
+        for scenario in report["scenarios"]:
+            self.assertEqual(scenario["errors"], 0, scenario["name"])
+            self.assertIn("p99_ms", scenario)
+        # Write requests were rolled back
+        self.assertEqual(Plots.objects.count(), 10)
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create(username="user1")
+        Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
+            plot_owner=user,
+        )
+
+    def get_metric(self, line):
+        """Value of a /metrics sample (metrics are process wide), 0 if absent"""
+        for sample in self.client.get("/metrics").content.decode().splitlines():
+            if sample.startswith(line + " "):
+                return float(sample.split()[-1])
+        return 0
+
+    def test_request_metrics_are_exposed(self):
+        """
+        Ensure /metrics exposes per-view histograms of the served requests
+        """
+        requests = self.get_metric('plots_db_queries_count{view="plots_list"}')
+        vertices = self.get_metric('plots_geometry_vertices_sum{view="plots_list"}')
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            "# TYPE plots_request_duration_seconds histogram", response.content.decode()
+        )
+
+        self.client.get("/plots/user1")
+        self.client.get("/plots/user1")
+
+        self.assertEqual(
+            self.get_metric('plots_db_queries_count{view="plots_list"}'), requests + 2
+        )
+        self.assertEqual(
+            self.get_metric('plots_geometry_vertices_sum{view="plots_list"}'),
+            vertices + 10,
+        )
+        self.assertGreater(
+            self.get_metric('plots_db_queries_sum{view="plots_list"}'), 0
+        )
+        self.assertGreater(
+            self.get_metric(
+                'plots_request_duration_seconds_count{view="plots_list",method="GET",status="200"}'
+            ),
+            0,
+        )
+
+    def test_streamed_response_size_is_recorded(self):
+        """
+        Ensure the size of streamed responses is recorded once sent
+        """
+        sizes = self.get_metric('plots_response_size_bytes_sum{view="plots_list"}')
+
+        response = self.client.get("/plots/user1?format=ndjson")
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content)
+
+        self.assertEqual(
+            self.get_metric('plots_response_size_bytes_sum{view="plots_list"}'),
+            sizes + len(body),
+        )
+
+    def test_slow_requests_are_logged_with_query_plan(self):
+        """
+        Ensure requests over PLOTS_SLOW_REQUEST_SECONDS are logged with the
+        plan of their slowest query
+        """
+        with self.settings(PLOTS_SLOW_REQUEST_SECONDS=0):
+            with self.assertLogs("plots.slow_requests", "WARNING") as logs:
+                self.client.get("/plots/user1")
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Slow request GET /plots/user1 (plots_list)", logs.output[0])
+        self.assertIn("Scan", logs.output[0])
+
+    def test_queries_counted_once_after_reconnections(self):
+        """
+        Ensure queries are counted once on connections that reconnected
+        """
+        other = connection.copy()
+        self.addCleanup(other.close)
+        for _ in range(3):
+            other.connect()
+            other.close()
+
+        with metrics.request_metrics(None) as request_metrics:
+            with other.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        self.assertEqual(request_metrics.queries, 1)
+        self.assertEqual(
+            sum(
+                isinstance(wrapper, metrics.QueryRecorder)
+                for wrapper in other.execute_wrappers
+            ),
+            1,
+        )
+
+    def test_no_metrics_outside_requests(self):
+        """
+        Ensure instrumented code runs outside of a request without metrics
+        """
+        self.assertIsNone(metrics.current())
+        with metrics.timer("serializer"):
+            metrics.add_vertices(5)
+        self.assertEqual(Plots.objects.count(), 1)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        authentication.local_tokens.clear()
+        self.user = User.objects.create(username="user1")
+        self.user.set_password("password_1234")
+        self.user.save()
+        self.plot = Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
+            plot_owner=self.user,
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def rename(self, name, token=None):
+        return self.client.patch(
+            f"/plots/user1/{self.plot.id}",
+            data={"plot_name": name},
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {token or self.token.key}",
+        )
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.rename("renamed")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query for query in queries if "authtoken_token" in query["sql"]]
+
+    def test_token_is_read_from_cache(self):
+        """
+        Ensure only the first request with a token queries it from the database
+        """
+        self.assertEqual(len(self.token_queries()), 1)
+        self.assertEqual(self.token_queries(), [])
+
+    def test_deleted_token_is_rejected(self):
+        """
+        Ensure a deleted (or rotated) token stops authenticating at once
+        """
+        self.assertEqual(self.rename("renamed").status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        new_token = Token.objects.create(user=self.user)
+
+        self.assertEqual(self.rename("again").status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            self.rename("again", new_token.key).status_code, status.HTTP_200_OK
+        )
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Ensure the cached tokens of a deactivated user stop authenticating
+        """
+        self.assertEqual(self.rename("renamed").status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.rename("again").status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_shared_cache(self):
+        """
+        Ensure tokens cached by another worker in the shared cache are used
+        and invalidated there too
+        """
+        with self.settings(PLOTS_AUTH_CACHE="default"):
+            self.assertEqual(len(self.token_queries()), 1)
+            # Another worker process: empty in-process cache
+            authentication.local_tokens.clear()
+            self.assertEqual(self.token_queries(), [])
+
+            self.token.delete()
+            authentication.local_tokens.clear()
+            self.assertEqual(
+                self.rename("again").status_code, status.HTTP_403_FORBIDDEN
+            )
+
+    def test_expired_tokens_are_queried_again(self):
+        """
+        Ensure cache entries expire after PLOTS_AUTH_CACHE_TIMEOUT seconds
+        """
+        with self.settings(PLOTS_AUTH_CACHE_TIMEOUT=0):
+            self.assertEqual(len(self.token_queries()), 1)
+            self.assertEqual(len(self.token_queries()), 1)
+
+
+class BatchUpdateDeletePlotsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        other = User.objects.create(username="user2")
+        self.plots = [
+            Plots.objects.create(
+                plot_name=f"2023-plot{index}",
+                plot_geometry=Polygon.from_bbox((index, 0, index + 0.5, 0.5)),
+                plot_owner=self.user,
+            )
+            for index in range(3)
+        ]
+        self.other_plot = Plots.objects.create(
+            plot_name="2023-plot0",
+            plot_geometry=Polygon.from_bbox((0, 0, 0.5, 0.5)),
+            plot_owner=other,
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}"
+        )
+
+    def test_batch_rename_by_ids(self):
+        """
+        Ensure a batch PATCH renames the owner's plots in one UPDATE and
+        reports ids of other owners or unknown as not found
+        """
+        ids = [self.plots[0].id, self.plots[2].id, self.other_plot.id]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                "/plots/user1/batch",
+                data={"ids": ids, "plot_name": "2024"},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(response.data["not_found"], 1)
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"id": ids[0], "status": "updated"},
+                {"id": ids[1], "status": "updated"},
+                {"id": ids[2], "status": "not_found"},
+            ],
+        )
+        self.assertEqual(
+            len(
+                [
+                    query
+                    for query in queries
+                    if query["sql"].startswith("UPDATE plots_plots ")
+                ]
+            ),
+            1,
+        )
+        self.assertEqual(
+            sorted(Plots.objects.values_list("plot_name", flat=True)),
+            ["2023-plot0", "2023-plot1", "2024", "2024"],
+        )
+        # Listings are invalidated
+        self.assertEqual(
+            sorted(plot["plot_name"] for plot in self.client.get("/plots/user1").data),
+            ["2023-plot1", "2024", "2024"],
+        )
+
+    def test_batch_delete_by_filter(self):
+        """
+        Ensure a batch DELETE removes the owner's plots matching the filters
+        and updates their statistics
+        """
+        response = self.client.delete(
+            "/plots/user1/batch",
+            data={"filter": {"bbox": "0,0,1.2,1", "plot_name_prefix": "2023"}},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["deleted"], 2)
+        self.assertEqual(
+            sorted(result["id"] for result in response.data["results"]),
+            [self.plots[0].id, self.plots[1].id],
+        )
+        self.assertEqual(
+            list(Plots.objects.filter(plot_owner="user1").values_list("id", flat=True)),
+            [self.plots[2].id],
+        )
+        self.assertTrue(Plots.objects.filter(id=self.other_plot.id).exists())
+
+        stats = self.client.get("/plots/user1/stats").data
+        self.assertEqual(stats["plot_count"], 1)
+        self.assertEqual(stats["extent"], [2.0, 0.0, 2.5, 0.5])
+
+    def test_batch_of_other_owner_is_forbidden(self):
+        """
+        Ensure a user can't change the plots of another user in batch
+        """
+        response = self.client.delete(
+            "/plots/user2/batch", data={"ids": [self.other_plot.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials()
+        response = self.client.delete(
+            "/plots/user1/batch", data={"ids": [self.plots[0].id]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Plots.objects.count(), 4)
+
+    def test_invalid_batch(self):
+        """
+        Ensure a batch needs either ids or known filters
+        """
+        for data in [
+            {"plot_name": "2024"},
+            {
+                "ids": [self.plots[0].id],
+                "filter": {"bbox": "0,0,1,1"},
+                "plot_name": "x",
+            },
+            {"filter": {"owner": "user2"}, "plot_name": "2024"},
+            {"filter": {"bbox": "0,0"}, "plot_name": "2024"},
+            {"ids": [self.plots[0].id]},
+        ]:
+            response = self.client.patch("/plots/user1/batch", data=data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+        self.assertEqual(Plots.objects.filter(plot_name="2024").count(), 0)
+
+    def test_invalid_ids_are_reported_by_index(self):
+        """
+        Ensure the errors of invalid ids are returned, keyed by their index
+        """
+        response = self.client.patch(
+            "/plots/user1/batch",
+            data={"ids": [self.plots[0].id, "x"], "plot_name": "2024"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("1", json.loads(response.content)["ids"])
+
+
+class PlotChangesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        User.objects.create(username="user2")
+        self.token = Token.objects.create(user=self.user)
+        self.plot = Plots.objects.create(
+            plot_name="plot1",
+            plot_geometry="POLYGON((0.0 0.0,  0.1 0.0, 0.1 0.1, 0.0 0.1, 0.0 0.0))",
+            plot_owner=self.user,
+        )
+
+    def get_changes(self, since=None, **params):
+        if since is not None:
+            params["since"] = since
+        response = self.client.get("/plots/user1/changes", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_changes_since_cursor(self):
+        """
+        Ensure clients get the changes made since their cursor, the last one
+        of each plot only
+        """
+        response = self.get_changes()
+        self.assertEqual(
+            [(change["action"], change["id"]) for change in response.data["changes"]],
+            [("created", self.plot.id)],
+        )
+        self.assertEqual(response.data["changes"][0]["plot"]["plot_name"], "plot1")
+        cursor = response.data["cursor"]
+
+        self.client.patch(
+            f"/plots/user1/{self.plot.id}",
+            data={"plot_name": "renamed"},
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        other = Plots.objects.create(
+            plot_name="plot2",
+            plot_geometry="POLYGON((1.0 1.0,  1.1 1.0, 1.1 1.1, 1.0 1.1, 1.0 1.0))",
+            plot_owner=self.user,
+        )
+        other.plot_name = "plot2 renamed"
+        other.save()
+        other.delete()
+
+        response = self.get_changes(cursor)
+        self.assertEqual(
+            [
+                (
+                    change["action"],
+                    change["id"],
+                    change["plot"] and change["plot"]["plot_name"],
+                )
+                for change in response.data["changes"]
+            ],
+            [("updated", self.plot.id, "renamed"), ("deleted", other.id, None)],
+        )
+        self.assertGreater(response.data["cursor"], cursor)
+
+        # Nothing new
+        response = self.get_changes(response.data["cursor"])
+        self.assertEqual(response.data["changes"], [])
+
+    def test_changes_are_paginated(self):
+        """
+        Ensure a Link header points to the next changes when a page is full
+        """
+        for index in range(3):
+            Plots.objects.create(
+                plot_name=f"plot{index + 2}",
+                plot_geometry="POLYGON((1.0 1.0,  1.1 1.0, 1.1 1.1, 1.0 1.1, 1.0 1.0))",
+                plot_owner=self.user,
+            )
+
+        response = self.get_changes(page_size=3)
+        self.assertEqual(len(response.data["changes"]), 3)
+        self.assertIn(f"since={response.data['cursor']}", response["Link"])
+
+        response = self.get_changes(response.data["cursor"], page_size=3)
+        self.assertEqual(len(response.data["changes"]), 1)
+        self.assertFalse(response.has_header("Link"))
+
+    def test_plot_given_to_another_owner(self):
+        """
+        Ensure a plot given to another owner is deleted from the previous
+        owner's changes and created in the new owner's ones
+        """
+        cursor = self.get_changes().data["cursor"]
+
+        self.plot.plot_owner_id = "user2"
+        self.plot.save()
+
+        self.assertEqual(
+            self.get_changes(cursor).data["changes"],
+            [
+                {
+                    "seq": cursor + 1,
+                    "action": "deleted",
+                    "id": self.plot.id,
+                    "plot": None,
+                }
+            ],
+        )
+        changes = self.client.get("/plots/user2/changes").data["changes"]
+        self.assertEqual(
+            [(change["action"], change["id"]) for change in changes],
+            [("created", self.plot.id)],
+        )
+
+    def test_change_log_locks_the_owners_only(self):
+        """
+        Ensure change log writers lock the owners they write entries of, not
+        the whole change log
+        """
+        with transaction.atomic():
+            self.plot.plot_owner_id = "user2"
+            self.plot.save()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT objid::int FROM pg_locks WHERE locktype = 'advisory' "
+                    "AND pid = pg_backend_pid() AND classid = %s AND objsubid = 2",
+                    [changes.LOCK_KEY],
+                )
+                locked = sorted(row[0] for row in cursor.fetchall())
+                cursor.execute("SELECT hashtext('user1'), hashtext('user2')")
+                self.assertEqual(locked, sorted(cursor.fetchone()))
+
+    def test_change_log_is_written_in_the_change_transaction(self):
+        """
+        Ensure a plot change is rolled back when its log entry can't be written
+        """
+        with mock.patch("plots.changes.record", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                Plots.objects.create(
+                    plot_name="plot2",
+                    plot_geometry="POLYGON((1.0 1.0,  1.1 1.0, 1.1 1.1, 1.0 1.1, 1.0 1.0))",
+                    plot_owner=self.user,
+                )
+
+        self.assertEqual(Plots.objects.count(), 1)
+
+    def test_compaction(self):
+        """
+        Ensure compaction keeps the last entry of every plot and sends clients
+        older than the removed deletions back to a full sync
+        """
+        cursor = self.get_changes().data["cursor"]
+        self.plot.plot_name = "renamed"
+        self.plot.save()
+        other = Plots.objects.create(
+            plot_name="plot2",
+            plot_geometry="POLYGON((1.0 1.0,  1.1 1.0, 1.1 1.1, 1.0 1.1, 1.0 1.0))",
+            plot_owner=self.user,
+        )
+        other.delete()
+
+        output = io.StringIO()
+        call_command("compact_plot_changes", retention_days=1, stdout=output)
+        self.assertIn("Removed 2 change log entries.", output.getvalue())
+        # Full sync: every existing plot, in its last state
+        self.assertEqual(
+            [
+                (change["action"], change["id"])
+                for change in self.get_changes().data["changes"]
+            ],
+            [("updated", self.plot.id), ("deleted", other.id)],
+        )
+
+        call_command("compact_plot_changes", retention_days=0, stdout=output)
+        self.assertEqual(
+            self.client.get("/plots/user1/changes", {"since": cursor}).status_code,
+            status.HTTP_410_GONE,
+        )
+        self.assertEqual(
+            [
+                (change["action"], change["id"])
+                for change in self.get_changes().data["changes"]
+            ],
+            [("updated", self.plot.id)],
+        )
+
+    def test_unknown_user_changes(self):
+        """
+        Ensure the changes of an unknown user are not found
+        """
+        response = self.client.get("/plots/nobody/changes")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get("/plots/user1/changes", {"since": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PlotImportTests(APITestCase):
+    # A degree of longitude / latitude at the equator in Web Mercator metres
+    LON = 111319.49
+    LAT = 111325.14
+
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        self.token = Token.objects.create(user=self.user)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def feature(self, name, geometry):
+        return {
+            "type": "Feature",
+            "properties": {"name": name},
+            "geometry": geometry,
+        }
+
+    def square(self, x, y, size=1):
+        return {
+            "type": "Polygon",
+            "coordinates": [
+                [
+                    [x * self.LON, y * self.LAT],
+                    [(x + size) * self.LON, y * self.LAT],
+                    [(x + size) * self.LON, (y + size) * self.LAT],
+                    [x * self.LON, (y + size) * self.LAT],
+                    [x * self.LON, y * self.LAT],
+                ]
+            ],
+        }
+
+    def geojson(self):
+        """Web Mercator GeoJSON: 2 plots and 3 invalid features"""
+        bowtie = self.square(5, 0)
+        bowtie["coordinates"][0][1:3] = bowtie["coordinates"][0][2:0:-1]
+        features = [
+            self.feature("plot1", self.square(0, 0)),
+            self.feature("", self.square(2, 0)),
+            self.feature("bowtie", bowtie),
+            self.feature(
+                "point", {"type": "Point", "coordinates": [self.LON, self.LAT]}
+            ),
+            self.feature(
+                "plot2",
+                {
+                    "type": "MultiPolygon",
+                    "coordinates": [self.square(3, 3)["coordinates"]],
+                },
+            ),
+        ]
+        return json.dumps(
+            {
+                "type": "FeatureCollection",
+                "crs": {"type": "name", "properties": {"name": "EPSG:3857"}},
+                "features": features,
+            }
+        ).encode()
+
+    def write_file(self):
+        path = Path(self.directory.name) / "plots.geojson"
+        path.write_bytes(self.geojson())
+        return str(path)
+
+    def test_import_command(self):
+        """
+        Ensure a file is imported with its features reprojected to SRID 4326
+        and its invalid features reported
+        """
+        output = io.StringIO()
+        with self.settings(PLOTS_IMPORT_CHUNK_SIZE=2):
+            call_command(
+                "import_plots",
+                self.write_file(),
+                owner="user1",
+                name_field="name",
+                stdout=output,
+                stderr=io.StringIO(),
+            )
+
+        self.assertIn("Imported 2 plots, rejected 3 features", output.getvalue())
+        plot1 = Plots.objects.get(plot_name="plot1")
+        for coordinate, expected in zip(plot1.plot_geometry.extent, [0, 0, 1, 1]):
+            self.assertAlmostEqual(coordinate, expected, places=6)
+        self.assertAlmostEqual(plot1.plot_area, 1.2309e10, delta=1e8)
+        self.assertIsNotNone(plot1.plot_geometry_lod3)
+        self.assertEqual(
+            Plots.objects.get(plot_name="plot2").plot_geometry.geom_type, "Polygon"
+        )
+
+        plot_import = PlotImport.objects.get()
+        self.assertEqual(plot_import.status, "done")
+        self.assertEqual(
+            (plot_import.features_total, plot_import.features_read), (5, 5)
+        )
+        self.assertEqual([error["index"] for error in plot_import.errors], [1, 2, 3])
+        self.assertEqual(
+            plot_import.errors[0]["errors"], {"plot_name": ["This field is required."]}
+        )
+        self.assertTrue(
+            plot_import.errors[1]["errors"]["plot_geometry"][0].startswith(
+                "Invalid polygon"
+            )
+        )
+        self.assertEqual(
+            plot_import.errors[2]["errors"],
+            {"plot_geometry": ["Geometry must be a Polygon, not a Point."]},
+        )
+        # Statistics and change log follow
+        self.assertEqual(PlotOwnerStats.objects.get(owner="user1").plot_count, 2)
+        self.assertEqual(
+            len(self.client.get("/plots/user1/changes").data["changes"]), 2
+        )
+
+    def test_import_rejects_overlaps(self):
+        """
+        Ensure features overlapping existing plots are rejected with the
+        "reject" overlap policy
+        """
+        with self.settings(PLOTS_IMPORT_CHUNK_SIZE=2, PLOTS_OVERLAP_POLICY="reject"):
+            for _ in range(2):
+                call_command(
+                    "import_plots",
+                    self.write_file(),
+                    owner="user1",
+                    name_field="name",
+                    stdout=io.StringIO(),
+                    stderr=io.StringIO(),
+                )
+
+        self.assertEqual(Plots.objects.count(), 2)
+        plot_import = PlotImport.objects.latest("id")
+        self.assertEqual(plot_import.plots_created, 0)
+        self.assertEqual(plot_import.plots_rejected, 5)
+        self.assertEqual(
+            plot_import.errors[-1],
+            {
+                "index": 4,
+                "errors": {
+                    "plot_geometry": [
+                        "Overlaps existing plots or earlier features of the file."
+                    ]
+                },
+            },
+        )
+
+    def test_upload_imported_by_worker(self):
+        """
+        Ensure uploaded files are imported by the background worker, with
+        their progress readable by their owner only
+        """
+        with self.settings(MEDIA_ROOT=self.directory.name):
+            response = self.client.post(
+                "/plots/imports/",
+                data={
+                    "file": SimpleUploadedFile("plots.geojson", self.geojson()),
+                    "name_field": "name",
+                },
+                format="multipart",
+                HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data["status"], "pending")
+            location = response["Location"]
+
+            call_command("process_plot_imports", once=True, stdout=io.StringIO())
+
+        response = self.client.get(
+            location, HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(response.data["plots_created"], 2)
+        self.assertEqual(response.data["plots_rejected"], 3)
+        self.assertEqual(Plots.objects.filter(plot_owner="user1").count(), 2)
+
+        other = Token.objects.create(user=User.objects.create(username="user2"))
+        response = self.client.get(location, HTTP_AUTHORIZATION=f"Token {other.key}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_imports_of_stopped_workers_taken_back(self):
+        """
+        Ensure imports without heartbeat are queued again while copying, and
+        failed while merging
+        """
+        stale = timezone.now() - timedelta(seconds=settings.PLOTS_JOB_LEASE_SECONDS + 1)
+        copying = PlotImport.objects.create(
+            owner=self.user, status="copying", features_read=10, heartbeat_at=stale
+        )
+        merging = PlotImport.objects.create(
+            owner=self.user, status="merging", plots_created=5, heartbeat_at=stale
+        )
+        running = PlotImport.objects.create(
+            owner=self.user, status="merging", heartbeat_at=timezone.now()
+        )
+
+        claimed = imports.claim_next()
+        self.assertEqual(claimed.pk, copying.pk)
+        self.assertEqual(claimed.status, "copying")
+        self.assertEqual(claimed.features_read, 0)
+        self.assertGreater(claimed.heartbeat_at, stale)
+
+        merging.refresh_from_db()
+        self.assertEqual(merging.status, "failed")
+        self.assertIn("stopped", merging.errors[0]["detail"])
+        running.refresh_from_db()
+        self.assertEqual(running.status, "merging")
+        self.assertIsNone(imports.claim_next())
+
+    def test_upload_needs_authentication(self):
+        """
+        Ensure anonymous users can't upload files
+        """
+        response = self.client.post(
+            "/plots/imports/",
+            data={"file": SimpleUploadedFile("plots.geojson", self.geojson())},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(PlotImport.objects.exists())
+
+    def test_only_known_formats_are_imported(self):
+        """
+        Ensure files of other formats (VRT...), which may reference server
+        files or URLs, are rejected, whatever their extension
+        """
+        vrt = (
+            b'<OGRVRTDataSource><OGRVRTLayer name="plots">'
+            b"<SrcDataSource>/etc/passwd</SrcDataSource>"
+            b"</OGRVRTLayer></OGRVRTDataSource>"
+        )
+        response = self.client.post(
+            "/plots/imports/",
+            data={"file": SimpleUploadedFile("plots.vrt", vrt)},
+            format="multipart",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+        self.assertFalse(PlotImport.objects.exists())
+
+        path = Path(self.directory.name) / "plots.geojson"
+        path.write_bytes(vrt)
+        with self.assertRaisesMessage(CommandError, "Not a GeoJSON file"):
+            call_command(
+                "import_plots",
+                str(path),
+                owner="user1",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+        self.assertEqual(PlotImport.objects.get().status, "failed")
+
+    def test_failed_import(self):
+        """
+        Ensure an import fails with its reason when the file lacks the name field
+        """
+        with self.assertRaisesMessage(Exception, 'No "plot_name" field'):
+            call_command(
+                "import_plots",
+                self.write_file(),
+                owner="user1",
+                stdout=io.StringIO(),
+                stderr=io.StringIO(),
+            )
+        self.assertEqual(PlotImport.objects.get().status, "failed")
+        self.assertFalse(Plots.objects.exists())
+
+
+class PlotExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="user1")
+        self.token = Token.objects.create(user=self.user)
+        for index in range(3):
+            Plots.objects.create(
+                plot_name=f"plot{index}",
+                plot_geometry=Polygon.from_bbox((index, 0, index + 1, 1)),
+                plot_owner=self.user,
+            )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = self.settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def submit(self, format):
+        return self.client.post(
+            "/plots/exports/",
+            {"format": format},
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+    def get(self, url, **headers):
+        return self.client.get(
+            url, HTTP_AUTHORIZATION=f"Token {self.token.key}", **headers
+        )
+
+    def export(self, format):
+        """Submit an export, run the worker and return the finished export."""
+        location = self.submit(format)["Location"]
+        call_command(
+            "process_plot_exports", once=True, processes=0, stdout=io.StringIO()
+        )
+        return self.get(location).data
+
+    def download(self, export, **headers):
+        response = self.get(export["download"], **headers)
+        return response, b"".join(response.streaming_content)
+
+    def test_export_written_by_worker(self):
+        """
+        Ensure submitted exports are written by the background worker, with
+        their progress and file readable by their owner only
+        """
+        response = self.submit("geojsonseq")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "pending")
+        self.assertIsNone(response.data["download"])
+
+        call_command(
+            "process_plot_exports", once=True, processes=0, stdout=io.StringIO()
+        )
+        export = self.get(response["Location"]).data
+        self.assertEqual(export["status"], "done")
+        self.assertEqual(export["plots_exported"], 3)
+
+        response, content = self.download(export)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/geo+json-seq")
+        self.assertEqual(response["Content-Length"], str(export["size"]))
+        self.assertEqual(response["ETag"], f'"{export["sha256"]}"')
+        self.assertEqual(hashlib.sha256(content).hexdigest(), export["sha256"])
+        records = content.split(b"\x1e")[1:]
+        self.assertEqual(
+            [json.loads(record)["properties"]["plot_name"] for record in records],
+            ["plot0", "plot1", "plot2"],
+        )
+
+        other = Token.objects.create(user=User.objects.create(username="user2"))
+        for url in [f"/plots/exports/{export['id']}", export["download"]]:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Token {other.key}")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_reused_until_plots_change(self):
+        """
+        Ensure a finished export is reused while the plots of its owner don't
+        change, and expires once a newer export is written
+        """
+        export = self.export("fgb")
+        response = self.submit("fgb")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], export["id"])
+        # Other formats are exported separately
+        self.assertEqual(self.submit("gpkg").status_code, status.HTTP_202_ACCEPTED)
+
+        Plots.objects.filter(plot_name="plot0").delete()
+        newer = self.export("fgb")
+        self.assertNotEqual(newer["id"], export["id"])
+        self.assertGreater(newer["seq"], export["seq"])
+        self.assertEqual(newer["plots_exported"], 2)
+
+        previous = PlotExport.objects.get(id=export["id"])
+        self.assertEqual(previous.status, "expired")
+        self.assertFalse(previous.file)
+        response = self.get(export["download"])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_download_range(self):
+        """
+        Ensure downloads resume with Range requests, uncompressed
+        """
+        export = self.export("fgb")
+        response, content = self.download(export, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(content[:3], b"fgb")
+        size = len(content)
+
+        response, part = self.download(export, HTTP_RANGE="bytes=3-9")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response["Content-Range"], f"bytes 3-9/{size}")
+        self.assertEqual(part, content[3:10])
+
+        response, part = self.download(export, HTTP_RANGE="bytes=-10")
+        self.assertEqual(part, content[-10:])
+
+        response, part = self.download(
+            export, HTTP_RANGE="bytes=10-", HTTP_IF_RANGE=f'"{export["sha256"]}"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(part, content[10:])
+
+        # Another file: the whole of it
+        response, part = self.download(
+            export, HTTP_RANGE="bytes=10-", HTTP_IF_RANGE='"outdated"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(part, content)
+
+        response = self.get(export["download"], HTTP_RANGE=f"bytes={size}-")
+        self.assertEqual(
+            response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response["Content-Range"], f"bytes */{size}")
+
+    def test_flatgeobuf_chunks(self):
+        """
+        Ensure FlatGeobuf files written in several chunks have a single header
+        """
+        with self.settings(PLOTS_EXPORT_CHUNK_SIZE=2):
+            export = self.export("fgb")
+        self.assertEqual(export["plots_exported"], 3)
+        _, content = self.download(export)
+        self.assertEqual(content.count(b"fgb\x03fgb"), 1)
+
+    def test_geopackage(self):
+        """
+        Ensure GeoPackage exports hold every plot with its attributes
+        """
+        export = self.export("gpkg")
+        path = PlotExport.objects.get(id=export["id"]).file.path
+        database = sqlite3.connect(path)
+        self.addCleanup(database.close)
+        self.assertEqual(
+            database.execute(
+                "SELECT table_name, data_type FROM gpkg_contents"
+            ).fetchall(),
+            [("plots", "features")],
+        )
+        rows = database.execute(
+            "SELECT plot_name, plot_area, geom FROM plots ORDER BY fid"
+        ).fetchall()
+        self.assertEqual([row[0] for row in rows], ["plot0", "plot1", "plot2"])
+        self.assertAlmostEqual(
+            rows[0][1], Plots.objects.get(plot_name="plot0").plot_area
+        )
+        self.assertEqual(rows[0][2][:2], b"GP")
+        self.assertEqual(
+            GEOSGeometry(memoryview(rows[0][2][8:])).extent, (0.0, 0.0, 1.0, 1.0)
+        )
+
+    def test_exports_of_stopped_workers_queued_again(self):
+        """
+        Ensure exports without heartbeat are written by the next worker
+        """
+        stale = timezone.now() - timedelta(seconds=settings.PLOTS_JOB_LEASE_SECONDS + 1)
+        export = PlotExport.objects.create(
+            owner=self.user, format="geojsonseq", status="running", heartbeat_at=stale
+        )
+
+        call_command(
+            "process_plot_exports", once=True, processes=0, stdout=io.StringIO()
+        )
+        export.refresh_from_db()
+        self.assertEqual(export.status, "done")
+        self.assertEqual(export.plots_exported, 3)
+
+    def test_export_needs_authentication(self):
+        """
+        Ensure anonymous users can't export plots
+        """
+        response = self.client.post("/plots/exports/", {"format": "fgb"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.submit("shp").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PlotExport.objects.exists())
+
+
+class LocatePlotsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        locate.indexes.clear()
+        self.user = User.objects.create(username="user1")
+        other = User.objects.create(username="user2")
+        self.plots = [
+            Plots.objects.create(
+                plot_name=f"plot{index}",
+                plot_geometry=Polygon.from_bbox((index, 0, index + 1, 1)),
+                plot_owner=self.user,
+            )
+            for index in range(2)
+        ]
+        self.other_plot = Plots.objects.create(
+            plot_name="plot0",
+            plot_geometry=Polygon.from_bbox((0, 0, 0.5, 0.5)),
+            plot_owner=other,
+        )
+        # Inside plot0, on the border of plot0 and plot1, and outside any plot
+        self.points = [[0.25, 0.25], [1, 0.5], [5, 5]]
+
+    def test_locate_plots_of_every_owner(self):
+        """
+        Ensure the plots containing each point are returned, in point order
+        """
+        response = self.client.post(
+            "/plots/locate/", data={"points": self.points}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["plot_ids"],
+            [
+                [self.plots[0].id, self.other_plot.id],
+                [self.plots[0].id, self.plots[1].id],
+                [],
+            ],
+        )
+
+    def test_locate_plots_of_an_owner_from_memory(self):
+        """
+        Ensure lookups of an owner looked up before are answered, with the
+        same results, from the in-memory index without querying the database
+        """
+        expected = [[self.plots[0].id], [self.plots[0].id, self.plots[1].id], []]
+
+        cold = self.client.post(
+            "/plots/locate/?owner=user1", data={"points": self.points}, format="json"
+        )
+        self.client.post(
+            "/plots/locate/?owner=user1", data={"points": self.points}, format="json"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            hot = self.client.post(
+                "/plots/locate/?owner=user1",
+                data={"points": self.points},
+                format="json",
+            )
+
+        self.assertEqual(cold.data["plot_ids"], expected)
+        self.assertEqual(hot.data["plot_ids"], expected)
+        self.assertEqual(len(queries), 0)
+
+    def test_locate_index_is_invalidated_by_writes(self):
+        """
+        Ensure plot changes are seen by the lookups following them
+        """
+        for _ in range(2):
+            locate.locate(self.points, owner="user1")
+
+        self.plots[1].delete()
+        moved = Plots.objects.create(
+            plot_name="plot2",
+            plot_geometry=Polygon.from_bbox((4, 4, 6, 6)),
+            plot_owner=self.user,
+        )
+
+        self.assertEqual(
+            locate.locate(self.points, owner="user1"),
+            [[self.plots[0].id], [self.plots[0].id], [moved.id]],
+        )
+
+    def test_locate_index_reloaded_once_too_old(self):
+        """
+        Ensure indexes are reloaded after PLOTS_LOCATE_INDEX_MAX_AGE seconds,
+        even when a write didn't reach the cache
+        """
+        for _ in range(2):
+            locate.locate(self.points, owner="user1")
+        # No plots_modified: the version token is unchanged
+        Plots.objects.filter(id=self.plots[1].id).update(
+            plot_geometry=Polygon.from_bbox((4, 4, 6, 6))
+        )
+
+        with self.settings(PLOTS_LOCATE_INDEX_MAX_AGE=0):
+            self.assertEqual(
+                locate.locate(self.points, owner="user1"),
+                [[self.plots[0].id], [self.plots[0].id], [self.plots[1].id]],
+            )
+
+    def test_locate_binary_points(self):
+        """
+        Ensure points can be sent as little-endian float64 pairs
+        """
+        body = struct.pack("<6d", *(value for point in self.points for value in point))
+
+        response = self.client.post(
+            "/plots/locate/?owner=user1",
+            data=body,
+            content_type="application/octet-stream",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["plot_ids"],
+            [[self.plots[0].id], [self.plots[0].id, self.plots[1].id], []],
+        )
+
+    def test_locate_invalid_points(self):
+        """
+        Ensure malformed, out of range or truncated points are rejected
+        """
+        for data in [{}, {"points": [[1, 2, 3]]}, {"points": [[200, 0]]}]:
+            response = self.client.post("/plots/locate/", data=data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("points", response.data)
+
+        response = self.client.post(
+            "/plots/locate/",
+            data=struct.pack("<3d", 0, 0, 0),
+            content_type="application/octet-stream",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PartitionedPlotsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user1")
+        other = User.objects.create(username="user2")
+        self.plots = [
+            Plots.objects.create(
+                plot_name=f"plot{index}",
+                plot_geometry=Polygon.from_bbox((index, 0, index + 0.5, 0.5)),
+                plot_owner=owner,
+            )
+            for index, owner in enumerate([self.user, self.user, other])
+        ]
+        call_command("partition_plots", partitions=4, stdout=io.StringIO())
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}"
+        )
+
+    def assertPrunedToOnePartition(self, queries):
+        """Assert every plots query of `queries` only reads one partition."""
+        statements = [
+            query["sql"]
+            for query in queries
+            if query["sql"].split()[0] in ("SELECT", "UPDATE", "DELETE")
+            and '"plots_plots"' in query["sql"]
+        ]
+        self.assertTrue(statements)
+        for sql in statements:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {sql}")
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+            self.assertEqual(
+                len(set(re.findall(r"plots_plots_p\d+", plan))), 1, f"{sql}\n{plan}"
+            )
+
+    def test_partitioning_keeps_plots(self):
+        """
+        Ensure existing plots are copied into the partitions, and new plots
+        get new ids
+        """
+        self.assertEqual(
+            sorted(Plots.objects.values_list("id", flat=True)),
+            sorted(plot.id for plot in self.plots),
+        )
+        plot = Plots.objects.create(
+            plot_name="plot3",
+            plot_geometry=Polygon.from_bbox((3, 0, 3.5, 0.5)),
+            plot_owner=self.user,
+        )
+        self.assertGreater(plot.id, max(plot.id for plot in self.plots))
+
+        with self.assertRaises(CommandError):
+            call_command("partition_plots", stdout=io.StringIO())
+
+    def test_plot_list_is_pruned(self):
+        """
+        Ensure plot lists, filtered or not, only read the owner's partition
+        """
+        for url in ["/plots/user1", "/plots/user1?bbox=0,0,0.7,0.7&simplify=2"]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertPrunedToOnePartition(queries)
+
+    def test_plot_update_is_pruned(self):
+        """
+        Ensure a plot update only reads and writes the owner's partition
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f"/plots/user1/{self.plots[0].id}", data={"plot_name": "renamed"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Plots.objects.get(id=self.plots[0].id).plot_name, "renamed")
+        self.assertPrunedToOnePartition(queries)
+
+    def test_plot_delete_is_pruned(self):
+        """
+        Ensure a plot deletion only reads and writes the owner's partition
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f"/plots/user1/{self.plots[0].id}")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Plots.objects.filter(id=self.plots[0].id).exists())
+        self.assertPrunedToOnePartition(queries)
+
+
+class CompressedResponsesTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username="user1")
+        User.objects.create(username="user2")
+        for index in range(20):
+            Plots.objects.create(
+                plot_name=f"plot{index}",
+                plot_geometry=Polygon(polygon_coords(index, 45.0, 0.01, 64), srid=4326),
+                plot_owner=user,
+            )
+
+    def test_plot_list_is_compressed(self):
+        """
+        Ensure plot lists are compressed with an encoding accepted by the client
+        """
+        plain = self.client.get("/plots/user1?nocache=1")
+        response = self.client.get("/plots/user1", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+
+    def test_streamed_plot_list_is_compressed(self):
+        """
+        Ensure streamed plot lists are compressed chunk by chunk
+        """
+        plain = self.client.get("/plots/user1?format=ndjson")
+        response = self.client.get(
+            "/plots/user1?format=ndjson", HTTP_ACCEPT_ENCODING="gzip"
+        )
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)),
+            b"".join(plain.streaming_content),
+        )
+
+    def test_small_responses_are_not_compressed(self):
+        """
+        Ensure responses below PLOTS_COMPRESSION_MIN_SIZE are sent as they are
+        """
+        response = self.client.get("/plots/user2", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_compressed_plot_list_is_not_modified(self):
+        """
+        Ensure the weak ETag of a compressed list still gets a 304
+        """
+        etag = self.client.get("/plots/user1", HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+
+        response = self.client.get(
+            "/plots/user1", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_encoding_negotiation(self):
+        """
+        Ensure the client preferences come first, then the server's order
+        """
+        self.assertEqual(compression.negotiate("gzip, br, zstd"), "zstd")
+        self.assertEqual(compression.negotiate("gzip, br"), "br")
+        self.assertEqual(compression.negotiate("zstd;q=0.5, gzip"), "gzip")
+        self.assertEqual(compression.negotiate("*"), "zstd")
+        self.assertIsNone(compression.negotiate("identity"))
+        self.assertIsNone(compression.negotiate("gzip;q=0, *;q=0"))
+
+    def test_plot_list_coordinates_precision(self):
+        """
+        Ensure ?precision= rounds the listed coordinates, on sync and async views
+        """
+        for url in ["/plots/user1?precision=3", "/async/plots/user1?precision=3"]:
+            ring = self.client.get(url).json()[0]["plot_geometry"][0]
+            for x, y in ring:
+                self.assertEqual((x, y), (round(x, 3), round(y, 3)))
+
+
+class AggregatePlotsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="user1")
+        other = User.objects.create(username="user2")
+        # Cells of resolution 8 are 1.40625 degrees wide
+        self.plots = [
+            Plots.objects.create(
+                plot_name=f"plot{index}",
+                plot_geometry=Polygon.from_bbox(bbox),
+                plot_owner=owner,
+            )
+            for index, (bbox, owner) in enumerate(
+                [
+                    ((0.1, 0.1, 0.2, 0.2), self.user),
+                    ((0.3, 0.3, 0.4, 0.4), self.user),
+                    ((2.0, 2.0, 2.1, 2.1), other),
+                ]
+            )
+        ]
+
+    def test_aggregate_square_grid(self):
+        """
+        Ensure plots are counted in the square cell of their centroid
+        """
+        response = self.client.get("/plots/aggregate/?bbox=0,0,3,3&resolution=8")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cell_size"], 1.40625)
+        cells = response.data["cells"]
+        self.assertEqual([cell["cell"] for cell in cells], [[0, 0], [1, 1]])
+        self.assertEqual([cell["count"] for cell in cells], [2, 1])
+        self.assertAlmostEqual(
+            cells[0]["area"], self.plots[0].plot_area + self.plots[1].plot_area
+        )
+        self.assertAlmostEqual(cells[0]["centroid"][0], 0.25)
+        self.assertAlmostEqual(cells[0]["centroid"][1], 0.25)
+
+    def test_aggregate_plots_of_an_owner(self):
+        """
+        Ensure ?owner= only counts the plots of that user
+        """
+        response = self.client.get(
+            "/plots/aggregate/?bbox=0,0,3,3&resolution=8&owner=user2"
+        )
+        self.assertEqual(
+            [(cell["cell"], cell["count"]) for cell in response.data["cells"]],
+            [([1, 1], 1)],
+        )
+
+    def test_aggregate_hex_grid_and_clusters(self):
+        """
+        Ensure hexagonal cells and clusters count every plot once
+        """
+        hexagons = self.client.get(
+            "/plots/aggregate/?bbox=0,0,3,3&resolution=8&grid=hex"
+        ).data["cells"]
+        clusters = self.client.get(
+            "/plots/aggregate/?bbox=0,0,3,3&resolution=8&grid=cluster"
+        ).data["cells"]
+
+        self.assertEqual(sum(cell["count"] for cell in hexagons), 3)
+        self.assertEqual(sorted(cluster["count"] for cluster in clusters), [1, 2])
+        self.assertNotIn("cell", clusters[0])
+
+    def test_aggregate_is_cached_until_plots_change(self):
+        """
+        Ensure aggregates are served from cache, and recomputed after a change
+        """
+        url = "/plots/aggregate/?bbox=0,0,3,3&resolution=8"
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        Plots.objects.create(
+            plot_name="plot3",
+            plot_geometry=Polygon.from_bbox((0.5, 0.5, 0.6, 0.6)),
+            plot_owner=self.user,
+        )
+        self.assertEqual(self.client.get(url).data["cells"][0]["count"], 3)
+
+    def test_aggregate_versions_replaced_after_commit(self):
+        """
+        Ensure aggregates cached before a change is committed are recomputed
+        once it is, and aggregates away from the plot stay cached
+        """
+        url = "/plots/aggregate/?bbox=0,0,3,3&resolution=8"
+        far_url = "/plots/aggregate/?bbox=100,40,103,43&resolution=8"
+        self.client.get(far_url)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Plots.objects.create(
+                plot_name="plot3",
+                plot_geometry=Polygon.from_bbox((0.5, 0.5, 0.6, 0.6)),
+                plot_owner=self.user,
+            )
+            self.client.get(url)
+        for callback in callbacks:
+            callback()
+
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(far_url)
+
+    def test_invalid_aggregate_parameters(self):
+        """
+        Ensure missing or invalid parameters and too many cells are rejected
+        """
+        for params in [
+            "resolution=8",
+            "bbox=0,0,3,3",
+            "bbox=3,3,0,0&resolution=8",
+            "bbox=0,0,3,3&resolution=21",
+            "bbox=0,0,3,3&resolution=8&grid=triangle",
+            "bbox=-180,-90,180,90&resolution=20",
+        ]:
+            response = self.client.get(f"/plots/aggregate/?{params}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
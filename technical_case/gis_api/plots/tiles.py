@@ -0,0 +1,206 @@
+"""
+Mapbox Vector Tiles of plots, built by PostGIS and cached per tile.
+Low zoom levels use the simplified plot geometries.
+
+Tile cache keys hold version tokens, replaced when plots in their extent
+change (see plots.signals), so that cached tiles showing them are never read
+again, even those rendered from data read before the change was committed.
+Tiles share the token of the tile of zoom level PLOTS_TILE_VERSION_ZOOM
+holding them (their own below that level), per owner: a change replaces a few
+tokens per zoom level up to PLOTS_TILE_VERSION_ZOOM, or the generation of the
+levels where it covers too many tiles.
+"""
+import math
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router
+
+from .caching import get_versions
+from .models import SIMPLIFY_TOLERANCES, Plots, geometry_field_name
+
+# Half the width of the Web Mercator world, in metres
+MERCATOR_HALF_WIDTH = 20037508.342789244
+MERCATOR_MAX_LATITUDE = 85.0511287798066
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 256
+
+TILE_SQL = """
+WITH bounds AS (
+    SELECT
+        ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom,
+        ST_Transform(
+            ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => %(margin)s), 4326
+        ) AS filter_geom
+)
+SELECT ST_AsMVT(tile, 'plots', %(extent)s, 'geom') FROM (
+    SELECT
+        plots.id,
+        plots.plot_name,
+        plots.plot_owner_id AS plot_owner,
+        plots.plot_area,
+        ST_AsMVTGeom(
+            ST_Transform(plots.{geometry_column}, 3857),
+            bounds.geom,
+            %(extent)s,
+            %(buffer)s
+        ) AS geom
+    FROM plots_plots AS plots, bounds
+    WHERE plots.plot_geometry && bounds.filter_geom {owner_filter}
+) AS tile
+"""
+
+
+def cache():
+    return caches[settings.PLOTS_TILE_CACHE]
+
+
+def generation_key(level):
+    return f"plots:tile-generation:{level}"
+
+
+def version_key(level, x, y, owner):
+    return f"plots:tile-version:{level}:{x}:{y}:{owner or '*'}"
+
+
+def version_tile(z, x, y):
+    """Tile (level, x, y) whose version tokens cover the tile (z, x, y)."""
+    level = min(z, settings.PLOTS_TILE_VERSION_ZOOM)
+    return level, x >> (z - level), y >> (z - level)
+
+
+def tile_cache_key(z, x, y, owner):
+    level, version_x, version_y = version_tile(z, x, y)
+    tokens = get_versions(
+        cache(),
+        [generation_key(level), version_key(level, version_x, version_y, owner)],
+    )
+    return f"plots:tile:{z}:{x}:{y}:{owner or '*'}:{':'.join(tokens.values())}"
+
+
+def simplify_level(z):
+    """
+    Coarsest level of detail whose simplification stays below the size of a
+    tile unit at zoom level z, so that it does not show on the map.
+    """
+    unit = 360 / (TILE_EXTENT * 2**z)
+    return max(
+        (
+            level
+            for level, tolerance in SIMPLIFY_TOLERANCES.items()
+            if tolerance <= unit
+        ),
+        default=0,
+    )
+
+
+def render_tile(z, x, y, owner=None):
+    params = {
+        "z": z,
+        "x": x,
+        "y": y,
+        "owner": owner,
+        "extent": TILE_EXTENT,
+        "buffer": TILE_BUFFER,
+        "margin": TILE_BUFFER / TILE_EXTENT,
+    }
+    owner_filter = "AND plots.plot_owner_id = %(owner)s" if owner else ""
+    with connections[router.db_for_read(Plots)].cursor() as cursor:
+        cursor.execute(
+            TILE_SQL.format(
+                geometry_column=geometry_field_name(simplify_level(z)),
+                owner_filter=owner_filter,
+            ),
+            params,
+        )
+        return bytes(cursor.fetchone()[0] or b"")
+
+
+def get_tile(z, x, y, owner=None):
+    """Return the MVT bytes of a tile, from cache when possible."""
+    if z > settings.PLOTS_TILE_MAX_CACHED_ZOOM:
+        return render_tile(z, x, y, owner)
+
+    key = tile_cache_key(z, x, y, owner)
+    tile = cache().get(key)
+    if tile is None:
+        tile = render_tile(z, x, y, owner)
+        cache().set(key, tile, settings.PLOTS_TILE_CACHE_TIMEOUT)
+    return tile
+
+
+def to_mercator(lon, lat):
+    lat = max(-MERCATOR_MAX_LATITUDE, min(MERCATOR_MAX_LATITUDE, lat))
+    x = lon * MERCATOR_HALF_WIDTH / 180
+    y = (
+        math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+        * MERCATOR_HALF_WIDTH
+        / math.pi
+    )
+    return x, y
+
+
+def tile_range(extent, z):
+    """
+    Tiles of zoom level z whose content (buffer included) may show a geometry
+    of the given (xmin, ymin, xmax, ymax) SRID 4326 extent.
+
+    Returns ((x_min, x_max), (y_min, y_max)), bounds included.
+    """
+    tile_count = 2**z
+    tile_size = 2 * MERCATOR_HALF_WIDTH / tile_count
+    margin = tile_size * TILE_BUFFER / TILE_EXTENT
+
+    xmin, ymin = to_mercator(extent[0], extent[1])
+    xmax, ymax = to_mercator(extent[2], extent[3])
+
+    def index(value):
+        return min(tile_count - 1, max(0, int(value // tile_size)))
+
+    return (
+        (
+            index(xmin - margin + MERCATOR_HALF_WIDTH),
+            index(xmax + margin + MERCATOR_HALF_WIDTH),
+        ),
+        (
+            index(MERCATOR_HALF_WIDTH - ymax - margin),
+            index(MERCATOR_HALF_WIDTH - ymin + margin),
+        ),
+    )
+
+
+def invalidate(changes):
+    """Make the cached tiles showing any of the changed plots unreachable."""
+    extents = set()
+    owners = {None}
+    for change in changes:
+        extents.update(e for e in (change.extent, change.previous_extent) if e)
+        owners.update(o for o in (change.owner, change.previous_owner) if o)
+
+    versions = {}
+    last_level = min(
+        settings.PLOTS_TILE_VERSION_ZOOM, settings.PLOTS_TILE_MAX_CACHED_ZOOM
+    )
+    for level in range(last_level + 1):
+        ranges = [tile_range(extent, level) for extent in extents]
+        tile_count = sum(
+            (x_max - x_min + 1) * (y_max - y_min + 1)
+            for (x_min, x_max), (y_min, y_max) in ranges
+        )
+
+        if tile_count * len(owners) > settings.PLOTS_TILE_INVALIDATION_LIMIT:
+            versions[generation_key(level)] = uuid.uuid4().hex
+            continue
+
+        versions.update(
+            {
+                version_key(level, x, y, owner): uuid.uuid4().hex
+                for (x_min, x_max), (y_min, y_max) in ranges
+                for x in range(x_min, x_max + 1)
+                for y in range(y_min, y_max + 1)
+                for owner in owners
+            }
+        )
+    cache().set_many(versions, None)
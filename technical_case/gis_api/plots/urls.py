@@ -2,15 +2,72 @@ from django.urls import path, re_path
 
 from rest_framework.authtoken import views
 
+from . import asyncviews
+from .views import metrics_view
 from .apiviews import (
+    PlotAggregate,
     PlotCreate,
+    PlotBulkCreate,
+    PlotBatchUpdateDelete,
+    PlotChanges,
+    PlotExportCreate,
+    PlotExportDetail,
+    PlotExportDownload,
+    PlotImportCreate,
+    PlotImportDetail,
+    PlotLocate,
+    PlotConflicts,
     PlotsListByUser,
+    PlotOwnerStatsDetail,
+    PlotOwnerStatsList,
     PlotUpdateDelete,
+    PlotTile,
 )
 
 urlpatterns = [
+    path("metrics", metrics_view, name="metrics"),
     path("token_delivery/", views.obtain_auth_token, name="token_delivery"),
     path("plots/", PlotCreate.as_view(), name="plot_create"),
+    path("plots/bulk/", PlotBulkCreate.as_view(), name="plots_bulk_create"),
+    path("plots/conflicts/", PlotConflicts.as_view(), name="plots_conflicts"),
+    path("plots/imports/", PlotImportCreate.as_view(), name="plots_imports"),
+    path("plots/imports/<int:pk>", PlotImportDetail.as_view(), name="plots_import"),
+    path("plots/exports/", PlotExportCreate.as_view(), name="plots_exports"),
+    path("plots/exports/<int:pk>", PlotExportDetail.as_view(), name="plots_export"),
+    path(
+        "plots/exports/<int:pk>/download",
+        PlotExportDownload.as_view(),
+        name="plots_export_download",
+    ),
+    re_path("^plots/aggregate/?$", PlotAggregate.as_view(), name="plots_aggregate"),
+    re_path("^plots/locate/?$", PlotLocate.as_view(), name="plots_locate"),
+    path("plots/stats/", PlotOwnerStatsList.as_view(), name="plots_stats"),
+    re_path(
+        "^plots/(?P<username>[^/]+)/stats/?$",
+        PlotOwnerStatsDetail.as_view(),
+        name="plots_owner_stats",
+    ),
+    path(
+        "async/plots/<str:username>",
+        asyncviews.plots_list,
+        name="async_plots_list",
+    ),
+    path(
+        "async/plots/<str:username>/<int:id>",
+        asyncviews.plot_detail,
+        name="async_plot_detail",
+    ),
+    path(
+        "plots/<str:username>/batch",
+        PlotBatchUpdateDelete.as_view(),
+        name="plots_batch",
+    ),
+    path(
+        "plots/<str:username>/changes",
+        PlotChanges.as_view(),
+        name="plots_changes",
+    ),
+    path("tiles/<int:z>/<int:x>/<int:y>.pbf", PlotTile.as_view(), name="plots_tile"),
     re_path(
         "^plots/(?P<username>.+)/(?P<id>.+)",
         PlotUpdateDelete.as_view(),
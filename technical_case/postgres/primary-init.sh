@@ -0,0 +1,3 @@
+#!/bin/bash
+# Let the read replica (postgis-replica in docker-compose.yml) stream the WAL
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"